@@ -10,6 +10,7 @@ from django.contrib.auth import get_user_model
 
 from ...core.tests import utils
 from . import views as category_views
+from ...comment.models import Comment
 from ..models import Category
 from .forms import CategoryForm
 
@@ -75,6 +76,20 @@ class AdminViewTest(TestCase):
         response = self.client.get(reverse('spirit:admin:category:update', kwargs={"category_id": self.category.pk, }))
         self.assertEqual(response.status_code, 200)
 
+    def test_category_update_sync_visibility(self):
+        """
+        Removing a category should hide its comments
+        """
+        utils.login(self)
+        subcategory = utils.create_subcategory(self.category)
+        comment = utils.create_comment(topic=utils.create_topic(subcategory))
+        form_data = {"parent": "", "title": "foo", "description": "",
+                     "is_closed": False, "is_removed": True, "is_global": True}
+        response = self.client.post(reverse('spirit:admin:category:update', kwargs={"category_id": self.category.pk, }),
+                                    form_data)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Comment.objects.get(pk=comment.pk).is_visible)
+
 
 class AdminFormTest(TestCase):
 
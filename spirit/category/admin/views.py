@@ -7,8 +7,10 @@ from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
 from django.contrib import messages
 from django.utils.translation import ugettext as _
+from django.db.models import Q
 
 from ...core.utils.decorators import administrator_required
+from ...comment.models import Comment
 from ..models import Category
 from .forms import CategoryForm
 
@@ -46,7 +48,10 @@ def update(request, category_id):
         form = CategoryForm(data=request.POST, instance=category)
 
         if form.is_valid():
-            form.save()
+            category = form.save()
+            Comment.sync_visibility(
+                Comment.objects.filter(Q(topic__category=category) | Q(topic__category__parent=category))
+            )
             messages.info(request, _("The category has been updated!"))
             return redirect(reverse("spirit:admin:category:index"))
     else:
@@ -10,3 +10,9 @@ class SpiritCategoryConfig(AppConfig):
     name = 'spirit.category'
     verbose_name = "Spirit Category"
     label = 'spirit_category'
+
+    def ready(self):
+        self.register_signals()
+
+    def register_signals(self):
+        from . import signals
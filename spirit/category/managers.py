@@ -5,18 +5,19 @@ from __future__ import unicode_literals
 from django.db import models
 from django.db.models import Q
 
+from .utils import get_tree
+
 
 class CategoryQuerySet(models.QuerySet):
 
     def unremoved(self):
-        return self.filter(Q(parent=None) | Q(parent__is_removed=False),
-                           is_removed=False)
+        return self.filter(pk__in=get_tree().unremoved_ids)
 
     def public(self):
-        return self.filter(is_private=False)
+        return self.filter(pk__in=get_tree().public_ids)
 
     def visible(self):
-        return self.unremoved().public()
+        return self.filter(pk__in=get_tree().visible_ids)
 
     def opened(self):
         return self.filter(Q(parent=None) | Q(parent__is_closed=False),
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.db.models.signals import post_save, post_delete
+
+from .models import Category
+from .utils import invalidate_tree
+
+
+def category_changed(sender, **kwargs):
+    invalidate_tree()
+
+
+post_save.connect(category_changed, sender=Category, dispatch_uid=__name__)
+post_delete.connect(category_changed, sender=Category, dispatch_uid=__name__)
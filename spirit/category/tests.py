@@ -16,6 +16,7 @@ from ..core.tests import utils
 from ..topic.models import Topic
 from ..comment.bookmark.models import CommentBookmark
 from .models import Category
+from . import utils as category_utils
 
 
 class CategoryViewTest(TestCase):
@@ -157,3 +158,91 @@ class CategoryViewTest(TestCase):
         response = self.client.get(reverse('spirit:category:detail', kwargs={'pk': self.category_1.pk,
                                                                              'slug': self.category_1.slug}))
         self.assertEqual(list(response.context['topics']), [topic, ])
+
+
+class CategoryTreeTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = utils.create_category()
+        self.subcategory = utils.create_subcategory(self.category)
+        self.private = utils.create_category(is_private=True)
+        self.not_global = utils.create_category(is_global=False)
+
+    def test_get_tree(self):
+        """
+        Should contain the category ids by state
+        """
+        tree = category_utils.get_tree()
+        self.assertIn(self.category.pk, tree.unremoved_ids)
+        self.assertIn(self.subcategory.pk, tree.visible_ids)
+        self.assertIn(self.private.pk, tree.private_ids)
+        self.assertNotIn(self.private.pk, tree.visible_ids)
+        self.assertIn(self.category.pk, tree.global_ids)
+        self.assertNotIn(self.not_global.pk, tree.global_ids)
+        self.assertFalse(tree.removed_ids)
+
+    def test_get_tree_cached(self):
+        """
+        Should be built once
+        """
+        category_utils.get_tree()
+
+        with self.assertNumQueries(0):
+            category_utils.get_tree()
+            Topic.objects.visible()
+            Category.objects.unremoved()
+
+    def test_get_tree_invalidate_on_save(self):
+        """
+        Should rebuild the tree on category save, a removed parent removes its subcategories
+        """
+        category_utils.get_tree()
+        self.category.is_removed = True
+        self.category.save()
+        tree = category_utils.get_tree()
+        self.assertEqual(tree.removed_ids, {self.category.pk, self.subcategory.pk})
+        self.assertNotIn(self.subcategory.pk, tree.unremoved_ids)
+
+    def test_get_tree_invalidate_on_delete(self):
+        """
+        Should rebuild the tree on category delete
+        """
+        category_utils.get_tree()
+        pk = self.private.pk
+        self.private.delete()
+        tree = category_utils.get_tree()
+        self.assertNotIn(pk, tree.unremoved_ids)
+        self.assertNotIn(pk, tree.private_ids)
+
+    def test_get_tree_once_per_request(self):
+        """
+        Should check the version once per request
+        """
+        category_utils._start_request(sender=None)
+        try:
+            tree = category_utils.get_tree()
+            # Invalidated by another process
+            cache.set(category_utils._get_version_key(), 'foo')
+            self.assertIs(category_utils.get_tree(), tree)
+
+            # Invalidated by this request
+            category_utils.invalidate_tree()
+            tree2 = category_utils.get_tree()
+            self.assertIsNot(tree2, tree)
+            self.assertIs(category_utils.get_tree(), tree2)
+        finally:
+            category_utils._finish_request(sender=None)
+
+        cache.set(category_utils._get_version_key(), 'bar')
+        self.assertIsNot(category_utils.get_tree(), tree2)
+
+    def test_visible_no_join(self):
+        """
+        Should filter by the cached ids
+        """
+        topic = utils.create_topic(self.subcategory)
+        utils.create_topic(self.private)
+        sql = str(Topic.objects.visible().query)
+        self.assertNotIn('JOIN', sql)
+        self.assertEqual(list(Topic.objects.visible()), [topic, ])
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import uuid
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started, request_finished
+
+__all__ = ['get_tree', 'invalidate_tree']
+
+
+CategoryTree = namedtuple('CategoryTree', [
+    'version',
+    'unremoved_ids',
+    'removed_ids',
+    'public_ids',
+    'private_ids',
+    'visible_ids',
+    'global_ids'
+])
+
+# In-process copy of the tree, it's
+# rebuilt when the version changes
+_tree = None
+
+# The version is checked once per request,
+# the cache may be a database round trip
+_request = threading.local()
+
+
+def _get_cache():
+    return caches[settings.ST_CATEGORY_CACHE]
+
+
+def _get_version_key():
+    return '%s:version' % settings.ST_CATEGORY_CACHE_PREFIX
+
+
+def _start_request(sender, **kwargs):
+    _request.is_active = True
+    _request.version = None
+
+
+def _finish_request(sender, **kwargs):
+    _request.is_active = False
+    _request.version = None
+
+
+request_started.connect(_start_request, dispatch_uid=__name__)
+request_finished.connect(_finish_request, dispatch_uid=__name__)
+
+
+def _get_version():
+    version = getattr(_request, 'version', None)
+
+    if version is not None:
+        return version
+
+    cache = _get_cache()
+    version = cache.get(_get_version_key())
+
+    if version is None:
+        cache.add(_get_version_key(), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_get_version_key())
+
+    if getattr(_request, 'is_active', False):
+        _request.version = version
+
+    return version
+
+
+def invalidate_tree():
+    """
+    Must be called whenever a category gets
+    created, updated or deleted. Every process
+    will rebuild its tree on its next request
+    """
+    version = uuid.uuid4().hex
+    _get_cache().set(_get_version_key(), version, timeout=None)
+
+    if getattr(_request, 'is_active', False):
+        _request.version = version
+
+
+def _build_tree(version):
+    from .models import Category  # Avoid circular import
+
+    categories = Category.objects\
+        .order_by()\
+        .values_list('pk', 'parent_id', 'is_removed', 'is_private', 'is_global')
+    categories = list(categories)
+    self_removed_ids = {pk for pk, _, is_removed, _, _ in categories if is_removed}
+    removed_ids = {
+        pk
+        for pk, parent_id, _, _, _ in categories
+        if pk in self_removed_ids or parent_id in self_removed_ids
+    }
+    private_ids = {pk for pk, _, _, is_private, _ in categories if is_private}
+    all_ids = {pk for pk, _, _, _, _ in categories}
+    unremoved_ids = all_ids - removed_ids
+    public_ids = all_ids - private_ids
+
+    return CategoryTree(
+        version=version,
+        unremoved_ids=frozenset(unremoved_ids),
+        removed_ids=frozenset(removed_ids),
+        public_ids=frozenset(public_ids),
+        private_ids=frozenset(private_ids),
+        visible_ids=frozenset(unremoved_ids & public_ids),
+        global_ids=frozenset(pk for pk, _, _, _, is_global in categories if is_global)
+    )
+
+
+def get_tree():
+    """
+    Returns the sets of category ids for the
+    commonly filtered states, a category is removed
+    when either itself or its parent is removed
+    """
+    global _tree
+
+    version = _get_version()
+    tree = _tree
+
+    if tree is None or tree.version != version:
+        tree = _build_tree(version)
+        _tree = tree
+
+    return tree
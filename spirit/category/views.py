@@ -8,7 +8,7 @@ from django.http import HttpResponsePermanentRedirect
 
 from djconfig import config
 
-from ..core.utils.paginator import yt_paginate
+from ..core.utils.paginator import seek_paginate
 from ..topic.models import Topic
 from .models import Category
 
@@ -28,13 +28,15 @@ def detail(request, pk, slug):
         .unremoved()\
         .with_bookmarks(user=request.user)\
         .for_category(category=category)\
-        .order_by('-is_globally_pinned', '-is_pinned', '-last_active')\
         .select_related('category')
 
-    topics = yt_paginate(
+    topics = seek_paginate(
         topics,
         per_page=config.topics_per_page,
-        page_number=request.GET.get('page', 1)
+        page_number=request.GET.get('page', 1),
+        ordering=('-is_globally_pinned', '-is_pinned', '-last_active', '-pk'),
+        uid='category:%s' % category.pk,
+        cursor=request.GET.get('cursor')
     )
 
     context = {
@@ -50,4 +52,6 @@ class IndexView(ListView):
 
     template_name = 'spirit/category/index.html'
     context_object_name = "categories"
-    queryset = Category.objects.visible().parents()
+
+    def get_queryset(self):
+        return Category.objects.visible().parents()
@@ -10,3 +10,9 @@ class SpiritCommentConfig(AppConfig):
     name = 'spirit.comment'
     verbose_name = "Spirit Comment"
     label = 'spirit_comment'
+
+    def ready(self):
+        self.register_signals()
+
+    def register_signals(self):
+        from . import signals
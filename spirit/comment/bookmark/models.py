@@ -9,6 +9,7 @@ from django.conf import settings
 from djconfig import config
 
 from ...core.utils import paginator
+from ...core.utils.db import upsert
 
 
 class CommentBookmark(models.Model):
@@ -48,10 +49,8 @@ class CommentBookmark(models.Model):
         if comment_number is None:
             return
 
-        bookmark, created = cls.objects.update_or_create(
-            user=user,
-            topic=topic,
-            defaults={'comment_number': comment_number, }
+        upsert(
+            cls,
+            lookup={'user': user, 'topic': topic},
+            values={'comment_number': comment_number, }
         )
-
-        return bookmark
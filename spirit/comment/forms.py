@@ -9,7 +9,7 @@ from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
 from ..core import utils
-from ..core.utils.markdown import Markdown
+from ..core.utils.markdown import get_markdown
 from ..topic.models import Topic
 from .poll.models import CommentPoll, CommentPollChoice
 from .models import Comment
@@ -30,7 +30,7 @@ class CommentForm(forms.ModelForm):
         self.fields['comment'].widget.attrs['placeholder'] = _("Write comment...")
 
     def _get_comment_html(self):
-        markdown = Markdown(escape=True, hard_wrap=True)
+        markdown = get_markdown()
         comment_html = markdown.render(self.cleaned_data['comment'])
         self.mentions = markdown.get_mentions()
         self.polls = markdown.get_polls()
@@ -66,6 +66,7 @@ class CommentMoveForm(forms.Form):
 
     def __init__(self, topic, *args, **kwargs):
         super(CommentMoveForm, self).__init__(*args, **kwargs)
+        self.from_topic = topic
         self.fields['comments'] = forms.ModelMultipleChoiceField(
             queryset=Comment.objects.filter(topic=topic),
             widget=forms.CheckboxSelectMultiple
@@ -76,11 +77,18 @@ class CommentMoveForm(forms.Form):
         comments_list = list(comments)
         topic = self.cleaned_data['topic']
         comments.update(topic=topic)
+        Comment.sync_visibility(Comment.objects.filter(pk__in=[c.pk for c in comments_list]))
 
         # Update topic in comment instance
         for c in comments_list:
             c.topic = topic
 
+        Comment.renumber_moved(
+            comments=comments_list,
+            from_topic=self.from_topic,
+            to_topic=topic
+        )
+
         return comments_list
 
 
@@ -20,25 +20,19 @@ class CommentQuerySet(models.QuerySet):
 
     def unremoved(self):
         # TODO: remove action
-        return self.filter(
-            Q(topic__category__parent=None) | Q(topic__category__parent__is_removed=False),
-            topic__category__is_removed=False,
-            topic__is_removed=False,
-            is_removed=False,
-            action=0
-        )
+        return self.filter(is_visible=True, is_removed=False, action=0)
 
     def public(self):
-        return self.filter(topic__category__is_private=False)
+        return self.filter(is_private=False)
 
     def visible(self):
-        return self.unremoved().public()
+        return self.filter(is_visible=True, is_private=False, is_removed=False, action=0)
 
     def for_topic(self, topic):
         return self.filter(topic=topic)
 
     def _access(self, user):
-        return self.filter(Q(topic__category__is_private=False) | Q(topic__topics_private__user=user))
+        return self.filter(Q(is_private=False) | Q(topic__topics_private__user=user))
 
     def with_likes(self, user):
         if not user.is_authenticated():
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations, transaction
+
+
+def number_comments(apps, schema_editor):
+    Topic = apps.get_model('spirit_topic', 'Topic')
+    Comment = apps.get_model('spirit_comment', 'Comment')
+
+    topic_ids = Topic.objects\
+        .order_by('pk')\
+        .values_list('pk', flat=True)
+
+    for topic_id in topic_ids.iterator():
+        comment_ids = Comment.objects\
+            .filter(topic_id=topic_id)\
+            .order_by('date', 'pk')\
+            .values_list('pk', flat=True)
+
+        with transaction.atomic():
+            for number, comment_id in enumerate(comment_ids, start=1):
+                Comment.objects\
+                    .filter(pk=comment_id)\
+                    .update(number=number)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_comment', '0002_auto_20150828_2003'),
+        ('spirit_topic', '0002_auto_20150828_2003'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='number',
+            field=models.PositiveIntegerField(default=0, verbose_name='number'),
+        ),
+        migrations.RunPython(number_comments),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_topic', '0002_auto_20150828_2003'),
+        ('spirit_comment', '0003_comment_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentFanOut',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('mentions', models.TextField(verbose_name='mentions', blank=True)),
+                ('date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('comment', models.ForeignKey(to='spirit_comment.Comment')),
+                ('topic', models.ForeignKey(to='spirit_topic.Topic')),
+            ],
+            options={
+                'verbose_name': 'comment fan-out',
+                'verbose_name_plural': 'comments fan-out',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Min, Max
+
+CHUNK_SIZE = 10000
+
+
+def sync_visibility(apps, schema_editor):
+    # This is Comment.sync_visibility() on the historical
+    # models, the new fields default to visible and public
+    Category = apps.get_model('spirit_category', 'Category')
+    Comment = apps.get_model('spirit_comment', 'Comment')
+
+    categories = list(
+        Category.objects
+        .order_by()
+        .values_list('pk', 'parent_id', 'is_removed', 'is_private')
+    )
+    self_removed_ids = {pk for pk, _, is_removed, _ in categories if is_removed}
+    unremoved_ids = [
+        pk
+        for pk, parent_id, _, _ in categories
+        if pk not in self_removed_ids and parent_id not in self_removed_ids
+    ]
+    private_ids = [pk for pk, _, _, is_private in categories if is_private]
+    ids = Comment.objects.aggregate(min=Min('pk'), max=Max('pk'))
+
+    if ids['min'] is None:
+        return
+
+    for start in range(ids['min'], ids['max'] + 1, CHUNK_SIZE):
+        comments = Comment.objects.filter(pk__gte=start, pk__lt=start + CHUNK_SIZE)
+        comments\
+            .exclude(topic__is_removed=False, topic__category_id__in=unremoved_ids)\
+            .update(is_visible=False)
+        comments\
+            .filter(topic__category_id__in=private_ids)\
+            .update(is_private=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_category', '0003_category_is_global'),
+        ('spirit_comment', '0004_commentfanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='is_private',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='is_visible',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(sync_visibility),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_comment', '0005_comment_visibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentfanout',
+            name='claim',
+            field=models.CharField(max_length=32, blank=True, db_index=True),
+        ),
+    ]
@@ -2,13 +2,16 @@
 
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import ugettext_lazy as _
 from django.core.urlresolvers import reverse
 from django.conf import settings
-from django.db.models import F
+from django.db.models import F, Q
 from django.utils import timezone
 
+from ..core.utils import counters
+from ..category.utils import get_tree
+from ..topic.models import Topic
 from .managers import CommentQuerySet
 
 
@@ -37,10 +40,15 @@ class Comment(models.Model):
     date = models.DateTimeField(default=timezone.now)
     is_removed = models.BooleanField(default=False)
     is_modified = models.BooleanField(default=False)
+    # Denormalized state of the topic and
+    # its category, see sync_visibility()
+    is_visible = models.BooleanField(default=True)
+    is_private = models.BooleanField(default=False)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
 
     modified_count = models.PositiveIntegerField(_("modified count"), default=0)
     likes_count = models.PositiveIntegerField(_("likes count"), default=0)
+    number = models.PositiveIntegerField(_("number"), default=0)
 
     objects = CommentQuerySet.as_manager()
 
@@ -61,28 +69,198 @@ class Comment(models.Model):
         except (AttributeError, IndexError):
             return
 
+    def _previous(self):
+        return Comment.objects\
+            .filter(topic_id=self.topic_id)\
+            .filter(Q(date__lt=self.date) | Q(date=self.date, pk__lt=self.pk))\
+            .order_by('-date', '-pk')
+
+    def _next(self):
+        return Comment.objects\
+            .filter(topic_id=self.topic_id)\
+            .filter(Q(date__gt=self.date) | Q(date=self.date, pk__gt=self.pk))\
+            .order_by('date', 'pk')
+
+    def update_number(self):
+        """
+        Set the position of the comment within the topic,
+        it's used to find the comment page. The topic row
+        is locked, so concurrent posts get numbered one at
+        a time. Returns whether the comments placed after
+        this one had to be shifted, ie: they were posted
+        concurrently and got numbered first
+        """
+        with transaction.atomic():
+            Topic.objects\
+                .select_for_update()\
+                .filter(pk=self.topic_id)\
+                .exists()
+
+            previous_number = self._previous()\
+                .values_list('number', flat=True)\
+                .first()
+
+            if previous_number is None:
+                number = 1
+            elif previous_number:
+                number = previous_number + 1
+            else:
+                # Previous comment has not been numbered yet
+                number = self._previous().count() + 1
+
+            Comment.objects\
+                .filter(pk=self.pk)\
+                .update(number=number)
+
+            self.number = number
+
+            next_number = self._next()\
+                .exclude(number=0)\
+                .values_list('number', flat=True)\
+                .first()
+
+            if next_number is None or next_number > number:
+                return False
+
+            self._next()\
+                .exclude(number=0)\
+                .update(number=F('number') + 1)
+
+            return True
+
     def increase_modified_count(self):
         Comment.objects\
             .filter(pk=self.pk)\
             .update(modified_count=F('modified_count') + 1)
 
     def increase_likes_count(self):
-        Comment.objects\
-            .filter(pk=self.pk)\
-            .update(likes_count=F('likes_count') + 1)
+        counters.incr(Comment, pk=self.pk, field='likes_count')
 
     def decrease_likes_count(self):
-        Comment.objects\
-            .filter(pk=self.pk)\
-            .update(likes_count=F('likes_count') - 1)
+        counters.incr(Comment, pk=self.pk, field='likes_count', delta=-1)
+
+    def set_visibility(self):
+        tree = get_tree()
+        self.is_visible = (
+            not self.topic.is_removed and
+            self.topic.category_id in tree.unremoved_ids
+        )
+        self.is_private = self.topic.category_id in tree.private_ids
+
+    @classmethod
+    def sync_visibility(cls, comments):
+        """
+        Update the denormalized topic state of the
+        comments. Must be called after removing,
+        restoring or moving a topic or a category.
+        Only the rows that changed get written.
+        Returns the number of changed flags
+        """
+        tree = get_tree()
+        visible = Q(topic__is_removed=False, topic__category_id__in=tree.unremoved_ids)
+        private = Q(topic__category_id__in=tree.private_ids)
+        return (
+            comments.filter(visible, is_visible=False).update(is_visible=True) +
+            comments.filter(~visible, is_visible=True).update(is_visible=False) +
+            comments.filter(private, is_private=False).update(is_private=True) +
+            comments.filter(~private, is_private=True).update(is_private=False)
+        )
 
     @classmethod
     def create_moderation_action(cls, user, topic, action):
         # TODO: better comment_html text (map to actions), use default language
-        return cls.objects.create(
+        comment = cls.objects.create(
             user=user,
             topic=topic,
             action=action,
             comment="action",
             comment_html="action"
         )
+        comment.update_number()
+        return comment
+
+    @classmethod
+    def renumber_moved(cls, comments, from_topic, to_topic):
+        """
+        Fix the numbers of both topics after moving the comments.
+        The comments must contain the numbers they had in the old topic.
+
+        Numbers are shifted by ranges, so this takes a few
+        queries per moved comment regardless of the topic size
+        """
+        comments = sorted(comments, key=lambda c: (c.date, c.pk))
+        moved_pks = [c.pk for c in comments]
+
+        with transaction.atomic():
+            # Close the gaps left in the old topic
+            old_numbers = sorted(c.number for c in comments) + [None, ]
+
+            for shift, (number, next_number) in enumerate(zip(old_numbers, old_numbers[1:]), start=1):
+                remaining = cls.objects.filter(topic=from_topic, number__gt=number)
+
+                if next_number is not None:
+                    remaining = remaining.filter(number__lt=next_number)
+
+                remaining.update(number=F('number') - shift)
+
+            # Open a gap before each comment in the new topic,
+            # *after* is the number of the comment right before it
+            after_numbers = []
+
+            for comment in comments:
+                after_number = comment._previous()\
+                    .exclude(pk__in=moved_pks)\
+                    .values_list('number', flat=True)\
+                    .first()
+                after_numbers.append(after_number or 0)
+
+            ranges = list(zip(after_numbers, after_numbers[1:] + [None, ]))
+
+            for shift, (number, next_number) in reversed(list(enumerate(ranges, start=1))):
+                existing = cls.objects\
+                    .filter(topic=to_topic, number__gt=number)\
+                    .exclude(pk__in=moved_pks)
+
+                if next_number is not None:
+                    existing = existing.filter(number__lte=next_number)
+
+                existing.update(number=F('number') + shift)
+
+            for shift, (comment, number) in enumerate(zip(comments, after_numbers), start=1):
+                cls.objects\
+                    .filter(pk=comment.pk)\
+                    .update(number=number + shift)
+                comment.number = number + shift
+
+
+class CommentFanOut(models.Model):
+    """
+    Posted comments waiting for their notifications
+    to be sent, these are processed in bursts per topic
+    """
+    topic = models.ForeignKey('spirit_topic.Topic')
+    comment = models.ForeignKey(Comment)
+
+    mentions = models.TextField(_("mentions"), blank=True)  # Comma separated user ids
+    date = models.DateTimeField(default=timezone.now)
+    # Set by the worker processing the row,
+    # only within its transaction
+    claim = models.CharField(max_length=32, blank=True, db_index=True)
+
+    class Meta:
+        ordering = ['pk', ]
+        verbose_name = _("comment fan-out")
+        verbose_name_plural = _("comments fan-out")
+
+    @property
+    def mention_ids(self):
+        return [int(pk) for pk in self.mentions.split(',') if pk]
+
+    @classmethod
+    def create(cls, comment, mentions=None):
+        mentions = mentions or {}
+        return cls.objects.create(
+            topic_id=comment.topic_id,
+            comment=comment,
+            mentions=','.join(str(user.pk) for user in mentions.values())
+        )
@@ -86,13 +86,8 @@ class PollVoteManyForm(forms.Form):
         if not self.poll.is_multiple_choice:
             choices = [choices, ]
 
-        CommentPollVote.objects\
-            .filter(voter=self.user, choice__poll=self.poll)\
-            .update(is_removed=True)
-
-        for choice_id in choices:
-            CommentPollVote.objects.update_or_create(
-                voter=self.user,
-                choice_id=choice_id,
-                defaults={'is_removed': False}
-            )
+        CommentPollVote.vote(
+            poll=self.poll,
+            voter=self.user,
+            choice_ids=choices
+        )
@@ -40,12 +40,6 @@ class CommentPollChoiceQuerySet(models.QuerySet):
             choice_votes__is_removed=False
         )
 
-    def for_vote(self, poll, voter):
-        return self \
-            .for_poll(poll) \
-            .for_voter(voter) \
-            .unremoved()
-
 
 class CommentPollVoteQuerySet(models.QuerySet):
 
@@ -7,12 +7,21 @@ from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
 from django.utils import timezone
 from django.utils.functional import cached_property
-from django.db.models import F
+from django.db.models import F, Case, When
 
 from ...core.utils import get_query_string
+from ...core.utils.db import update_many
 from .managers import CommentPollQuerySet, CommentPollChoiceQuerySet, CommentPollVoteQuerySet
 
 
+def _get_changes(obj, values):
+    return {
+        field: value
+        for field, value in values.items()
+        if getattr(obj, field) != value
+    }
+
+
 class PollMode(object):
 
     DEFAULT, SECRET = range(2)
@@ -95,9 +104,17 @@ class CommentPoll(models.Model):
 
     @classmethod
     def update_or_create_many(cls, comment, polls_raw):
-        cls.objects \
-            .for_comment(comment) \
-            .update(is_removed=True)
+        """
+        Sync the comment polls with the parsed ones,
+        the missing polls are marked as removed.
+        Only the changed polls are written
+        """
+        if not polls_raw:
+            cls.objects \
+                .for_comment(comment) \
+                .unremoved() \
+                .update(is_removed=True)
+            return
 
         default_fields = [
             'title',
@@ -107,23 +124,40 @@ class CommentPoll(models.Model):
             'mode'
         ]
 
-        if not polls_raw:  # Avoid the later transaction.atomic()
-            return
+        polls = {poll.name: poll for poll in cls.objects.for_comment(comment)}
+        names = set()
+        changes = {}
+        new_polls = []
+
+        for poll_raw in polls_raw:
+            values = {
+                field: poll_raw[field]
+                for field in default_fields
+                if field in poll_raw
+            }
+            values.update({'is_removed': False})
+            name = poll_raw['name']
+            names.add(name)
+
+            if name not in polls:
+                new_polls.append(cls(comment=comment, name=name, **values))
+                continue
+
+            poll_changes = _get_changes(polls[name], values)
+
+            if poll_changes:
+                changes[polls[name].pk] = poll_changes
+
+        for name, poll in polls.items():
+            if name not in names and not poll.is_removed:
+                changes[poll.pk] = {'is_removed': True}
 
-        with transaction.atomic():  # Speedup
-            for poll in polls_raw:
-                defaults = {
-                    field: poll[field]
-                    for field in default_fields
-                    if field in poll
-                }
-                defaults.update({'is_removed': False})
+        if not changes and not new_polls:  # Avoid the later transaction.atomic()
+            return
 
-                cls.objects.update_or_create(
-                    comment=comment,
-                    name=poll['name'],
-                    defaults=defaults
-                )
+        with transaction.atomic():
+            update_many(cls, changes)
+            cls.objects.bulk_create(new_polls)
 
 
 class CommentPollChoice(models.Model):
@@ -160,24 +194,40 @@ class CommentPollChoice(models.Model):
             return 0
 
     @classmethod
-    def increase_vote_count(cls, poll, voter):
-        cls.objects\
-            .for_vote(poll=poll, voter=voter)\
-            .update(vote_count=F('vote_count') + 1)
+    def update_vote_count(cls, increased, decreased):
+        """
+        Add a vote to the *increased* choices and
+        remove one from the *decreased* ones, at once
+        """
+        if not increased and not decreased:
+            return
+
+        if not increased:
+            vote_count = F('vote_count') - 1
+        elif not decreased:
+            vote_count = F('vote_count') + 1
+        else:
+            vote_count = Case(
+                When(pk__in=list(increased), then=F('vote_count') + 1),
+                default=F('vote_count') - 1,
+                output_field=models.PositiveIntegerField())
 
-    @classmethod
-    def decrease_vote_count(cls, poll, voter):
         cls.objects\
-            .for_vote(poll=poll, voter=voter)\
-            .update(vote_count=F('vote_count') - 1)
+            .filter(pk__in=list(increased) + list(decreased))\
+            .unremoved()\
+            .update(vote_count=vote_count)
 
     @classmethod
     def update_or_create_many(cls, comment, choices_raw):
-        cls.objects \
-            .for_comment(comment) \
-            .update(is_removed=True)
-
-        if not choices_raw:  # Avoid the later transaction.atomic()
+        """
+        Sync the comment poll choices with the parsed ones,
+        the polls must be synced first
+        """
+        if not choices_raw:
+            cls.objects \
+                .for_comment(comment) \
+                .unremoved() \
+                .update(is_removed=True)
             return
 
         poll_ids_by_name = dict(
@@ -186,17 +236,42 @@ class CommentPollChoice(models.Model):
                 .unremoved()
                 .values_list('name', 'id')
         )
+        choices = {
+            (choice.poll_id, choice.number): choice
+            for choice in cls.objects.for_comment(comment)
+        }
+        keys = set()
+        changes = {}
+        new_choices = []
+
+        for choice_raw in choices_raw:
+            key = (poll_ids_by_name[choice_raw['poll_name']], choice_raw['number'])
+            keys.add(key)
+            values = {
+                'description': choice_raw['description'],
+                'is_removed': False
+            }
+
+            if key not in choices:
+                poll_id, number = key
+                new_choices.append(cls(poll_id=poll_id, number=number, **values))
+                continue
+
+            choice_changes = _get_changes(choices[key], values)
+
+            if choice_changes:
+                changes[choices[key].pk] = choice_changes
+
+        for key, choice in choices.items():
+            if key not in keys and not choice.is_removed:
+                changes[choice.pk] = {'is_removed': True}
+
+        if not changes and not new_choices:  # Avoid the later transaction.atomic()
+            return
 
-        with transaction.atomic():  # Speedup
-            for choice in choices_raw:
-                cls.objects.update_or_create(
-                    poll_id=poll_ids_by_name[choice['poll_name']],
-                    number=choice['number'],
-                    defaults={
-                        'description': choice['description'],
-                        'is_removed': False
-                    }
-                )
+        with transaction.atomic():
+            update_many(cls, changes)
+            cls.objects.bulk_create(new_choices)
 
 
 class CommentPollVote(models.Model):
@@ -214,3 +289,43 @@ class CommentPollVote(models.Model):
         ordering = ['-pk', ]
         verbose_name = _("poll vote")
         verbose_name_plural = _("poll votes")
+
+    @classmethod
+    def vote(cls, poll, voter, choice_ids):
+        """
+        Replace the voter choices and update the
+        choices vote count within a transaction.
+        The poll row is locked, so votes sent at
+        the same time don't skew the counts
+        """
+        choice_ids = set(int(pk) for pk in choice_ids)
+
+        with transaction.atomic():
+            locked = CommentPoll.objects\
+                .select_for_update()\
+                .filter(pk=poll.pk)\
+                .values_list('pk', flat=True)
+            list(locked)
+
+            votes = cls.objects\
+                .for_voter(voter)\
+                .filter(choice__poll=poll)
+            votes = list(votes)
+            voted = set(v.choice_id for v in votes if not v.is_removed)
+            new_ids = choice_ids - set(v.choice_id for v in votes)
+            changes = {}
+
+            for vote in votes:
+                is_removed = vote.choice_id not in choice_ids
+
+                if vote.is_removed != is_removed:
+                    changes[vote.pk] = {'is_removed': is_removed}
+
+            update_many(cls, changes)
+            cls.objects.bulk_create([
+                cls(voter=voter, choice_id=choice_id)
+                for choice_id in sorted(new_ids)
+            ])
+            CommentPollChoice.update_vote_count(
+                increased=choice_ids - voted,
+                decreased=voted - choice_ids)
@@ -3,6 +3,8 @@
 from __future__ import unicode_literals
 
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.core.urlresolvers import reverse
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
@@ -15,6 +17,7 @@ from .models import CommentPoll, CommentPollChoice, CommentPollVote, PollMode
 from .forms import PollVoteManyForm
 from .utils.render_static import post_render_static_polls
 from .utils import render
+from ..models import Comment
 
 User = get_user_model()
 
@@ -245,7 +248,8 @@ class PollFormTest(TestCase):
         # Single choice
         self.poll = CommentPoll.objects.create(comment=self.comment, name='foo')
 
-        self.poll_choice = CommentPollChoice.objects.create(poll=self.poll, number=1, description="op1")
+        self.poll_choice = CommentPollChoice.objects.create(
+            poll=self.poll, number=1, description="op1", vote_count=2)
         self.poll_choice2 = CommentPollChoice.objects.create(poll=self.poll, number=2, description="op2")
 
         self.poll_vote = CommentPollVote.objects.create(voter=self.user, choice=self.poll_choice)
@@ -258,8 +262,10 @@ class PollFormTest(TestCase):
         # Multi choice
         self.poll_multi = CommentPoll.objects.create(comment=self.comment2, name='bar', choice_max=2)
 
-        self.poll_multi_choice = CommentPollChoice.objects.create(poll=self.poll_multi, number=1, description="op1")
-        self.poll_multi_choice2 = CommentPollChoice.objects.create(poll=self.poll_multi, number=2, description="op2")
+        self.poll_multi_choice = CommentPollChoice.objects.create(
+            poll=self.poll_multi, number=1, description="op1", vote_count=2)
+        self.poll_multi_choice2 = CommentPollChoice.objects.create(
+            poll=self.poll_multi, number=2, description="op2", vote_count=1)
         self.poll_multi_choice3 = CommentPollChoice.objects.create(poll=self.poll_multi, number=3, description="op3")
 
         self.poll_multi_vote = CommentPollVote.objects.create(voter=self.user, choice=self.poll_multi_choice)
@@ -269,7 +275,8 @@ class PollFormTest(TestCase):
         # ...poor man prefetch
         self.poll_multi_choice.votes = [self.poll_multi_vote]
         self.poll_multi_choice2.votes = [self.poll_multi_vote2]
-        self.poll_multi.choices = [self.poll_multi_choice, self.poll_multi_choice2]
+        self.poll_multi_choice3.votes = []
+        self.poll_multi.choices = [self.poll_multi_choice, self.poll_multi_choice2, self.poll_multi_choice3]
 
     def test_vote_load_initial_single(self):
         """
@@ -379,6 +386,28 @@ class PollFormTest(TestCase):
         form.save_m2m()
         self.assertEqual(len(CommentPollVote.objects.filter(choice=self.poll_choice2, is_removed=False)), 1)
         self.assertEqual(len(CommentPollVote.objects.filter(choice=self.poll_choice, is_removed=False)), 1)
+        self.assertEqual(CommentPollChoice.objects.get(pk=self.poll_choice.pk).vote_count, 1)
+        self.assertEqual(CommentPollChoice.objects.get(pk=self.poll_choice2.pk).vote_count, 1)
+
+    def test_update_vote_multi(self):
+        """
+        Should replace the voter choices and update the counts
+        """
+        form_data = {'choices': [self.poll_multi_choice2.pk, self.poll_multi_choice3.pk], }
+        form = PollVoteManyForm(user=self.user, poll=self.poll_multi, data=form_data)
+        self.assertTrue(form.is_valid())
+        form.save_m2m()
+        self.assertEqual(
+            list(CommentPollVote.objects
+                 .filter(voter=self.user, choice__poll=self.poll_multi, is_removed=False)
+                 .order_by('choice__number')
+                 .values_list('choice_id', flat=True)),
+            [self.poll_multi_choice2.pk, self.poll_multi_choice3.pk])
+        self.assertEqual(
+            list(CommentPollChoice.objects
+                 .for_poll(self.poll_multi)
+                 .values_list('vote_count', flat=True)),
+            [1, 1, 1])
 
 
 class CommentPollTemplateTagsTest(TestCase):
@@ -418,8 +447,112 @@ class CommentPollTemplateTagsTest(TestCase):
             self.assertIsInstance(context['poll'], CommentPoll)
             self.assertEqual(context['user'], self.user)
             self.assertEqual(context['comment'], self.user_comment_with_polls)
-            self.assertEqual(context['request'], self.request)
-            self.assertEqual(context['csrf_token'], 'csrf_token_foo')
+            self.assertEqual(context['request'].path, self.request.path)
+            self.assertEqual(context['request'].user, self.user)
+            self.assertEqual(context['csrf_token'], render.CSRF_TOKEN_PLACEHOLDER)
+        finally:
+            render.render_to_string = org_render_to_string
+
+    def test_render_polls_cache(self):
+        """
+        Should cache the rendered polls and fill in the csrf token
+        """
+        res = []
+
+        def mock_render_to_string(tlt, ctx):
+            res.append(tlt)
+            return '<form>%s</form>' % ctx['csrf_token']
+
+        org_render_to_string, render.render_to_string = render.render_to_string, mock_render_to_string
+        try:
+            out = render.render_polls(self.user_comment_with_polls, self.request, 'csrf_token_foo')
+            self.assertEqual(out, '<form>csrf_token_foo</form>')
+            self.assertEqual(len(res), 1)
+
+            out = render.render_polls(self.user_comment_with_polls, self.request, 'csrf_token_bar')
+            self.assertEqual(out, '<form>csrf_token_bar</form>')
+            self.assertEqual(len(res), 1)
+        finally:
+            render.render_to_string = org_render_to_string
+
+    def test_render_polls_cache_invalidate(self):
+        """
+        Should render the polls again on comment update, vote or for other viewers
+        """
+        res = []
+
+        def mock_render_to_string(tlt, ctx):
+            res.append(tlt)
+            return ''
+
+        def get_comment(user):
+            return Comment.objects\
+                .filter(pk=self.user_comment.pk)\
+                .with_polls(user)\
+                .first()
+
+        org_render_to_string, render.render_to_string = render.render_to_string, mock_render_to_string
+        try:
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 1)
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 1)
+
+            # Comment updated
+            self.user_comment.increase_modified_count()
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 2)
+
+            # Poll voted
+            choice = CommentPollChoice.objects.create(poll=self.user_poll, number=1, description='foo')
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 3)
+            CommentPollVote.vote(poll=self.user_poll, voter=self.user, choice_ids=[choice.pk, ])
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 4)
+
+            # Poll closed
+            CommentPoll.objects.filter(pk=self.user_poll.pk).update(close_at=timezone.now())
+            render.render_polls(get_comment(self.user), self.request, 'csrf_token')
+            self.assertEqual(len(res), 5)
+
+            # Another viewer
+            request = RequestFactory().get('/')
+            request.user = utils.create_user()
+            render.render_polls(get_comment(request.user), request, 'csrf_token')
+            self.assertEqual(len(res), 6)
+
+            # Another page
+            request = RequestFactory().get('/?page=2')
+            request.user = self.user
+            render.render_polls(get_comment(self.user), request, 'csrf_token')
+            self.assertEqual(len(res), 7)
+        finally:
+            render.render_to_string = org_render_to_string
+
+    def test_render_polls_cache_query_string(self):
+        """
+        Should ignore the query string params other than the page and the shown poll
+        """
+        res = []
+
+        def mock_render_to_string(tlt, ctx):
+            res.append(ctx['request'].GET.urlencode())
+            return ''
+
+        org_render_to_string, render.render_to_string = render.render_to_string, mock_render_to_string
+        try:
+            for query_string in ('?page=2', '?page=2&foo=bar', '?foo=baz&page=2&show_poll=999'):
+                request = RequestFactory().get('/' + query_string)
+                request.user = self.user
+                render.render_polls(self.user_comment_with_polls, request, 'csrf_token')
+
+            self.assertEqual(res, ['page=2'])
+
+            request = RequestFactory().get('/?page=2&foo=bar&show_poll=%s' % self.user_poll.pk)
+            request.user = self.user
+            render.render_polls(self.user_comment_with_polls, request, 'csrf_token')
+            self.assertEqual(res, ['page=2', 'page=2&show_poll=%s' % self.user_poll.pk])
         finally:
             render.render_to_string = org_render_to_string
 
@@ -666,6 +799,30 @@ class PollModelsTest(TestCase):
         self.assertEqual(poll.pk, poll_updated.pk)
         self.assertFalse(poll_updated.is_removed)
 
+    def test_poll_update_or_create_many_unchanged(self):
+        """
+        Should not write the polls when they are unchanged
+        """
+        polls_raw = [{'name': 'foo', 'title': 'foo'}, {'name': 'bar', 'choice_max': 2}]
+        CommentPoll.update_or_create_many(comment=self.comment, polls_raw=polls_raw)
+        self.assertEqual(CommentPoll.objects.get(pk=self.poll.pk).title, 'foo')
+        self.assertEqual(CommentPoll.objects.get(comment=self.comment, name='bar').choice_max, 2)
+
+        with self.assertNumQueries(1):
+            CommentPoll.update_or_create_many(comment=self.comment, polls_raw=polls_raw)
+
+    def test_poll_update_or_create_many_remove(self):
+        """
+        Should mark the missing polls as removed
+        """
+        poll = CommentPoll.objects.create(comment=self.comment, name='bar')
+        CommentPoll.update_or_create_many(comment=self.comment, polls_raw=[{'name': 'bar'}])
+        self.assertTrue(CommentPoll.objects.get(pk=self.poll.pk).is_removed)
+        self.assertFalse(CommentPoll.objects.get(pk=poll.pk).is_removed)
+
+        CommentPoll.update_or_create_many(comment=self.comment, polls_raw=[])
+        self.assertTrue(CommentPoll.objects.get(pk=poll.pk).is_removed)
+
     def test_poll_choice_vote(self):
         """
         Should return the user vote for a given choice
@@ -694,49 +851,30 @@ class PollModelsTest(TestCase):
         poll.total_votes = 0
         self.assertEqual(choice.votes_percentage, 0)
 
-    def test_poll_choice_increase_vote_count(self):
+    def test_poll_choice_update_vote_count(self):
         """
-        Should increase the vote count of all choices for a given user and poll
+        Should increase and decrease the vote count of the choices at once
         """
-        poll = CommentPoll.objects.create(comment=self.comment, name='percentage')
-        choice = CommentPollChoice.objects.create(poll=poll, number=1, description="foobar")
-        choice2 = CommentPollChoice.objects.create(poll=poll, number=2, description="foobar")
-        CommentPollVote.objects.create(choice=choice, voter=self.user)
-        CommentPollVote.objects.create(choice=choice2, voter=self.user)
-        user2 = utils.create_user()
-        CommentPollVote.objects.create(choice=choice, voter=user2)
-
-        CommentPollChoice.increase_vote_count(poll, self.user)
-        self.assertEqual(CommentPollChoice.objects.get(pk=self.choice.pk).vote_count, 0)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice.pk).vote_count, 1)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice2.pk).vote_count, 1)
+        choice = CommentPollChoice.objects.create(poll=self.poll, number=2, description="foo", vote_count=1)
+        choice2 = CommentPollChoice.objects.create(poll=self.poll, number=3, description="bar", vote_count=1)
 
-        CommentPollChoice.objects.filter(pk=choice.pk).update(is_removed=True)
-        CommentPollChoice.increase_vote_count(poll, self.user)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice.pk).vote_count, 1)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice2.pk).vote_count, 2)
+        with self.assertNumQueries(1):
+            CommentPollChoice.update_vote_count(increased={self.choice.pk, choice.pk}, decreased={choice2.pk})
 
-    def test_poll_choice_decrease_vote_count(self):
-        """
-        Should decrease the vote count of all choices for a given user and poll
-        """
-        poll = CommentPoll.objects.create(comment=self.comment, name='percentage')
-        choice = CommentPollChoice.objects.create(poll=poll, number=1, description="foobar", vote_count=2)
-        choice2 = CommentPollChoice.objects.create(poll=poll, number=2, description="foobar", vote_count=2)
-        CommentPollVote.objects.create(choice=choice, voter=self.user)
-        CommentPollVote.objects.create(choice=choice2, voter=self.user)
-        user2 = utils.create_user()
-        CommentPollVote.objects.create(choice=choice, voter=user2)
-
-        CommentPollChoice.decrease_vote_count(poll, self.user)
-        self.assertEqual(CommentPollChoice.objects.get(pk=self.choice.pk).vote_count, 0)
+        self.assertEqual(CommentPollChoice.objects.get(pk=self.choice.pk).vote_count, 1)
+        self.assertEqual(CommentPollChoice.objects.get(pk=choice.pk).vote_count, 2)
+        self.assertEqual(CommentPollChoice.objects.get(pk=choice2.pk).vote_count, 0)
+
+        CommentPollChoice.update_vote_count(increased=set(), decreased={choice.pk})
         self.assertEqual(CommentPollChoice.objects.get(pk=choice.pk).vote_count, 1)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice2.pk).vote_count, 1)
 
+        # Removed choices are left alone
         CommentPollChoice.objects.filter(pk=choice.pk).update(is_removed=True)
-        CommentPollChoice.decrease_vote_count(poll, self.user)
+        CommentPollChoice.update_vote_count(increased={choice.pk}, decreased=set())
         self.assertEqual(CommentPollChoice.objects.get(pk=choice.pk).vote_count, 1)
-        self.assertEqual(CommentPollChoice.objects.get(pk=choice2.pk).vote_count, 0)
+
+        with self.assertNumQueries(0):
+            CommentPollChoice.update_vote_count(increased=set(), decreased=set())
 
     def test_poll_choice_update_or_create_many(self):
         """
@@ -771,6 +909,84 @@ class PollModelsTest(TestCase):
         self.assertRaises(KeyError, CommentPollChoice.update_or_create_many,
                           comment=self.comment, choices_raw=[choice_raw])
 
+    def test_poll_choice_update_or_create_many_unchanged(self):
+        """
+        Should not write the choices when they are unchanged
+        """
+        choices_raw = [
+            {'poll_name': 'foo', 'number': 1, 'description': '1'},
+            {'poll_name': 'foo', 'number': 2, 'description': '2'}]
+        CommentPollChoice.update_or_create_many(comment=self.comment, choices_raw=choices_raw)
+        self.assertEqual(CommentPollChoice.objects.for_poll(self.poll).unremoved().count(), 2)
+
+        with self.assertNumQueries(2):
+            CommentPollChoice.update_or_create_many(comment=self.comment, choices_raw=choices_raw)
+
+    def test_poll_choice_update_or_create_many_remove(self):
+        """
+        Should mark the missing choices as removed
+        """
+        choices_raw = [
+            {'poll_name': 'foo', 'number': 2, 'description': '2'},
+            {'poll_name': 'foo', 'number': 3, 'description': '3'}]
+        CommentPollChoice.update_or_create_many(comment=self.comment, choices_raw=choices_raw)
+        self.assertTrue(CommentPollChoice.objects.get(pk=self.choice.pk).is_removed)
+        self.assertEqual(
+            list(CommentPollChoice.objects.for_poll(self.poll).unremoved().values_list('number', flat=True)),
+            [2, 3])
+
+        CommentPollChoice.update_or_create_many(comment=self.comment, choices_raw=[])
+        self.assertFalse(CommentPollChoice.objects.for_poll(self.poll).unremoved().exists())
+
+    def test_poll_vote(self):
+        """
+        Should replace the voter choices and update the vote counts
+        """
+        # Count the vote of the fixture
+        CommentPollChoice.objects.filter(pk=self.choice.pk).update(vote_count=1)
+        choice = CommentPollChoice.objects.create(poll=self.poll, number=2, description="foo")
+        choice2 = CommentPollChoice.objects.create(poll=self.poll, number=3, description="bar")
+
+        CommentPollVote.vote(poll=self.poll, voter=self.user, choice_ids=[self.choice.pk, str(choice.pk)])
+        self.assertEqual(
+            list(CommentPollChoice.objects.for_poll(self.poll).values_list('vote_count', flat=True)),
+            [1, 1, 0])
+
+        CommentPollVote.vote(poll=self.poll, voter=self.user, choice_ids=[choice.pk, choice2.pk])
+        self.assertEqual(
+            list(CommentPollChoice.objects.for_poll(self.poll).values_list('vote_count', flat=True)),
+            [0, 1, 1])
+        self.assertTrue(CommentPollVote.objects.get(voter=self.user, choice=self.choice).is_removed)
+
+        # Restore the removed vote
+        CommentPollVote.vote(poll=self.poll, voter=self.user, choice_ids=[self.choice.pk])
+        self.assertEqual(
+            list(CommentPollChoice.objects.for_poll(self.poll).values_list('vote_count', flat=True)),
+            [1, 0, 0])
+        self.assertEqual(
+            list(CommentPollVote.objects
+                 .filter(voter=self.user, is_removed=False)
+                 .values_list('choice_id', flat=True)),
+            [self.choice.pk])
+        self.assertEqual(CommentPollVote.objects.filter(voter=self.user).count(), 3)
+
+    def test_poll_vote_unchanged(self):
+        """
+        Should not write anything when the voter choices are unchanged
+        """
+        CommentPollChoice.objects.filter(pk=self.choice.pk).update(vote_count=1)
+        CommentPollVote.vote(poll=self.poll, voter=self.user, choice_ids=[self.choice.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            CommentPollVote.vote(poll=self.poll, voter=self.user, choice_ids=[self.choice.pk])
+
+        writes = [
+            query['sql']
+            for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(CommentPollChoice.objects.get(pk=self.choice.pk).vote_count, 1)
+
 
 class PollUtilsTest(TestCase):
 
@@ -2,8 +2,16 @@
 
 from __future__ import unicode_literals
 import re
+import copy
+import hashlib
 
 from django.template.loader import render_to_string
+from django.http import QueryDict
+from django.core.cache import caches
+from django.conf import settings
+from django.utils import translation
+from django.utils import timezone
+from django.utils.encoding import force_text
 
 from ..forms import PollVoteManyForm
 
@@ -13,6 +21,10 @@ __all__ = ['PATTERN', 'render_polls']
 
 PATTERN = re.compile(r'(?:<poll\s+name=(?P<name>[\w\-_]+)>)')
 
+# The fragment is shared among users, the
+# CSRF token gets filled in at serve time
+CSRF_TOKEN_PLACEHOLDER = 'st_csrf_token_placeholder'
+
 
 def _render_form(poll, comment, request, csrf_token):
     form = PollVoteManyForm(poll=poll)
@@ -65,10 +77,74 @@ def _evaluate(polls_by_name, comment, request, csrf_token):
     return evaluate
 
 
-def render_polls(comment, request, csrf_token):
-    if not comment.polls:
-        return comment.comment_html
+def _get_voted_choices(poll):
+    # *choices* is dynamically created by comments.with_polls()
+    try:
+        return [c.pk for c in poll.choices if c.vote]
+    except AttributeError:
+        return []
+
+
+def _get_poll_state(poll):
+    try:
+        choices = [(c.pk, c.vote_count) for c in poll.choices]
+    except AttributeError:
+        choices = []
+
+    return (
+        poll.pk,
+        poll.close_at,
+        bool(poll.is_closed),
+        bool(poll.has_user_voted),
+        _get_voted_choices(poll),
+        choices
+    )
+
+
+def _get_render_request(comment, request):
+    """
+    The fragment links keep the current page and the shown
+    poll only, so other query string params (ie: tracking
+    ones or any junk) don't create new cache entries
+    """
+    query_dict = QueryDict('', mutable=True)
+    page = request.GET.get('page')
+    show_poll = request.GET.get('show_poll')
+
+    if page:
+        query_dict['page'] = page
+
+    if show_poll in [str(poll.pk) for poll in comment.polls]:
+        query_dict['show_poll'] = show_poll
+
+    render_request = copy.copy(request)
+    render_request.GET = query_dict
+    return render_request
+
+
+def _make_cache_key(comment, request):
+    """
+    Everything the rendered polls depend on. Votes
+    and edits change the vote counts and the
+    modified_count, so those get a new key
+    """
+    user = request.user
+    state = (
+        comment.pk,
+        comment.modified_count,
+        request.path,
+        request.GET.urlencode(),
+        user.is_authenticated(),
+        user.pk == comment.user_id,  # Author can open/close the polls
+        translation.get_language(),
+        timezone.get_current_timezone_name(),
+        [_get_poll_state(poll) for poll in comment.polls]
+    )
+    key_hash = hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+    return '%s:%s' % (settings.ST_COMMENT_RENDER_CACHE_PREFIX, key_hash)
+
 
+def _render_polls(comment, request, csrf_token):
     evaluate = _evaluate(
         polls_by_name={poll.name: poll for poll in comment.polls},
         comment=comment,
@@ -76,3 +152,19 @@ def render_polls(comment, request, csrf_token):
         csrf_token=csrf_token
     )
     return re.sub(PATTERN, evaluate, comment.comment_html)
+
+
+def render_polls(comment, request, csrf_token):
+    if not comment.polls:
+        return comment.comment_html
+
+    request = _get_render_request(comment, request)
+    cache = caches[settings.ST_COMMENT_RENDER_CACHE]
+    cache_key = _make_cache_key(comment, request)
+    html = cache.get(cache_key)
+
+    if html is None:
+        html = _render_polls(comment, request, csrf_token=CSRF_TOKEN_PLACEHOLDER)
+        cache.set(cache_key, html, timeout=settings.ST_COMMENT_RENDER_CACHE_TIMEOUT)
+
+    return html.replace(CSRF_TOKEN_PLACEHOLDER, force_text(csrf_token))
@@ -54,9 +54,7 @@ def vote(request, pk):
     form = PollVoteManyForm(user=request.user, poll=poll, data=request.POST)
 
     if form.is_valid():
-        CommentPollChoice.decrease_vote_count(poll=poll, voter=request.user)
         form.save_m2m()
-        CommentPollChoice.increase_vote_count(poll=poll, voter=request.user)
         return redirect(request.POST.get('next', poll.get_absolute_url()))
 
     messages.error(request, utils.render_form_errors(form))
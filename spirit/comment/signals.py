@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.db.models.signals import pre_save, post_delete
+
+from ..core.utils.paginator import keyset_paginator
+from .models import Comment
+from .utils import get_comments_page_index_uid
+
+
+def set_visibility(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk:
+        return
+
+    instance.set_visibility()
+
+
+pre_save.connect(set_visibility, sender=Comment, dispatch_uid=__name__)
+
+
+def invalidate_page_index(sender, instance, **kwargs):
+    # Comments are hard deleted along with their user or topic
+    keyset_paginator.invalidate(get_comments_page_index_uid(instance.topic_id))
+
+
+post_delete.connect(invalidate_page_index, sender=Comment, dispatch_uid=__name__)
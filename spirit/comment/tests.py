@@ -5,6 +5,7 @@ from __future__ import unicode_literals
 import os
 import json
 import shutil
+import datetime
 
 from django.test import TestCase, RequestFactory
 from django.core.cache import cache
@@ -16,19 +17,26 @@ from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test.utils import override_settings
 from django.utils.six import BytesIO
+from django.utils import timezone
+
+from djconfig.utils import override_djconfig
 
 from ..core.tests import utils
-from .models import Comment
+from .models import Comment, CommentFanOut
 from .forms import CommentForm, CommentMoveForm, CommentImageForm
 from .tags import render_comments_form
 from ..core.utils import markdown
 from .views import delete as comment_delete
 from ..topic.models import Topic
 from ..category.models import Category
+from ..category.utils import invalidate_tree
 from ..user.models import UserProfile
 from .history.models import CommentHistory
-from .utils import comment_posted, pre_comment_update, post_comment_update
-from ..topic.notification.models import TopicNotification, MENTION
+from .utils import comment_posted, comments_fan_out, pending_comments_fan_out, pre_comment_update, \
+    post_comment_update, get_comments_page_index_uid
+from ..core.utils.paginator import keyset_paginator
+from ..core import tasks
+from ..topic.notification.models import TopicNotification, MENTION, COMMENT
 from ..topic.unread.models import TopicUnread
 from .poll.models import CommentPoll
 from . import views
@@ -349,6 +357,44 @@ class CommentViewTest(TestCase):
         self.assertEqual(Comment.objects.filter(topic=self.topic.pk).count(), 0)
         self.assertEqual(Topic.objects.get(pk=self.topic.pk).comment_count, 0)
 
+    def test_comment_move_page_index(self):
+        """
+        Should invalidate the comments page index of both topics
+        """
+        utils.login(self)
+        self.user.st.is_moderator = True
+        self.user.save()
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        to_topic = utils.create_topic(category=self.category)
+        response = self.client.get(self.topic.get_absolute_url())
+        self.assertEqual(list(response.context['comments']), [comment, ])
+        response = self.client.get(to_topic.get_absolute_url())
+        self.assertEqual(list(response.context['comments']), [])
+
+        form_data = {'topic': to_topic.pk,
+                     'comments': [comment.pk, ], }
+        self.client.post(reverse('spirit:comment:move', kwargs={'topic_id': self.topic.pk, }),
+                         form_data)
+        response = self.client.get(self.topic.get_absolute_url())
+        self.assertEqual(response.context['comments'].paginator.count, 0)
+        response = self.client.get(to_topic.get_absolute_url())
+        self.assertEqual(response.context['comments'].paginator.count, 1)
+
+    @override_djconfig(comments_per_page=1)
+    def test_comment_delete_page_index(self):
+        """
+        Should invalidate the comments page index on hard delete
+        """
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        comment2 = utils.create_comment(user=self.user, topic=self.topic)
+        response = self.client.get(self.topic.get_absolute_url())
+        self.assertEqual(response.context['comments'].paginator.count, 2)
+
+        comment.delete()
+        response = self.client.get(self.topic.get_absolute_url())
+        self.assertEqual(response.context['comments'].paginator.count, 1)
+        self.assertEqual(list(response.context['comments']), [comment2, ])
+
     def test_comment_find(self):
         """
         comment absolute and lazy url
@@ -358,6 +404,21 @@ class CommentViewTest(TestCase):
         expected_url = comment.topic.get_absolute_url() + "#c%d" % comment.pk
         self.assertRedirects(response, expected_url, status_code=302)
 
+    @override_djconfig(comments_per_page=2)
+    def test_comment_find_number(self):
+        """
+        Should use the comment number instead of counting
+        """
+        utils.create_comment(user=self.user, topic=self.topic)  # comment1
+        utils.create_comment(user=self.user, topic=self.topic)  # comment2
+        comment = utils.create_comment(user=self.user, topic=self.topic, number=3)
+
+        with self.assertNumQueries(2):  # djconfig and the comment
+            response = self.client.get(reverse('spirit:comment:find', kwargs={'pk': comment.pk, }))
+
+        expected_url = self.topic.get_absolute_url() + "?page=2#c3"
+        self.assertRedirects(response, expected_url, status_code=302)
+
     def test_comment_image_upload(self):
         """
         comment image upload
@@ -436,6 +497,159 @@ class CommentModelsTest(TestCase):
         Comment.create_moderation_action(user=self.user, topic=self.topic, action=1)
         self.assertEqual(Comment.objects.filter(user=self.user, topic=self.topic, action=1).count(), 1)
 
+    def test_comment_create_moderation_action_number(self):
+        """
+        Should number the moderation action
+        """
+        utils.create_comment(topic=self.topic, number=1)
+        comment = Comment.create_moderation_action(user=self.user, topic=self.topic, action=1)
+        self.assertEqual(comment.number, 2)
+        self.assertEqual(Comment.objects.get(pk=comment.pk).number, 2)
+
+    def test_comment_update_number(self):
+        """
+        Should set the position of the comment within the topic
+        """
+        comment = utils.create_comment(topic=self.topic)
+        comment.update_number()
+        self.assertEqual(Comment.objects.get(pk=comment.pk).number, 1)
+
+        comment2 = utils.create_comment(topic=self.topic)
+        comment2.update_number()
+        self.assertEqual(Comment.objects.get(pk=comment2.pk).number, 2)
+
+        # Not related to other topics
+        comment3 = utils.create_comment(topic=utils.create_topic(self.category))
+        comment3.update_number()
+        self.assertEqual(Comment.objects.get(pk=comment3.pk).number, 1)
+
+    def test_comment_update_number_previous_not_numbered(self):
+        """
+        Should count the comments when the previous one has no number
+        """
+        utils.create_comment(topic=self.topic)
+        utils.create_comment(topic=self.topic)
+        comment = utils.create_comment(topic=self.topic)
+        comment.update_number()
+        self.assertEqual(Comment.objects.get(pk=comment.pk).number, 3)
+
+    def test_comment_update_number_out_of_order(self):
+        """
+        Should shift the comments placed after
+        the comment that got numbered before it
+        """
+        date = timezone.now() - datetime.timedelta(hours=1)
+        comment = utils.create_comment(topic=self.topic, date=date, number=1)
+        comment3 = utils.create_comment(topic=self.topic, date=date + datetime.timedelta(minutes=2))
+        self.assertFalse(comment3.update_number())
+        self.assertEqual(comment3.number, 2)
+
+        comment2 = utils.create_comment(topic=self.topic, date=date + datetime.timedelta(minutes=1))
+        self.assertTrue(comment2.update_number())
+        self.assertListEqual(
+            list(Comment.objects.filter(topic=self.topic).order_by('date').values_list('pk', 'number')),
+            [(comment.pk, 1), (comment2.pk, 2), (comment3.pk, 3)])
+
+    def test_comment_update_number_previous_counted(self):
+        """
+        Should not shift the comments whose
+        number already counted the comment
+        """
+        date = timezone.now() - datetime.timedelta(hours=1)
+        comment = utils.create_comment(topic=self.topic, date=date, number=1)
+        comment2 = utils.create_comment(topic=self.topic, date=date + datetime.timedelta(minutes=1))
+        comment3 = utils.create_comment(topic=self.topic, date=date + datetime.timedelta(minutes=2))
+        comment3.update_number()
+        self.assertEqual(comment3.number, 3)
+
+        self.assertFalse(comment2.update_number())
+        self.assertListEqual(
+            list(Comment.objects.filter(topic=self.topic).order_by('date').values_list('pk', 'number')),
+            [(comment.pk, 1), (comment2.pk, 2), (comment3.pk, 3)])
+
+    def test_comment_renumber_moved(self):
+        """
+        Should close the gaps in the old topic and
+        open gaps for the moved comments in the new one
+        """
+        to_topic = utils.create_topic(category=self.category)
+        date = timezone.now()
+        comments = [
+            utils.create_comment(topic=self.topic, date=date + datetime.timedelta(minutes=m), number=n)
+            for n, m in enumerate([1, 3, 5, 7, 9], start=1)
+        ]
+        to_comments = [
+            utils.create_comment(topic=to_topic, date=date + datetime.timedelta(minutes=m), number=n)
+            for n, m in enumerate([0, 4, 6, 10], start=1)
+        ]
+        moved = [comments[1], comments[3]]  # minutes 3, 7
+        Comment.objects.filter(pk__in=[c.pk for c in moved]).update(topic=to_topic)
+
+        for c in moved:
+            c.topic = to_topic
+
+        Comment.renumber_moved(comments=moved, from_topic=self.topic, to_topic=to_topic)
+        self.assertEqual(
+            list(Comment.objects.filter(topic=self.topic).order_by('date').values_list('pk', 'number')),
+            [(c.pk, n) for n, c in enumerate([comments[0], comments[2], comments[4]], start=1)]
+        )
+        expected = [to_comments[0], moved[0], to_comments[1], to_comments[2], moved[1], to_comments[3]]
+        self.assertEqual(
+            list(Comment.objects.filter(topic=to_topic).order_by('date').values_list('pk', 'number')),
+            [(c.pk, n) for n, c in enumerate(expected, start=1)]
+        )
+        self.assertEqual([c.number for c in moved], [2, 5])
+
+    def test_comment_set_visibility(self):
+        """
+        Should set the topic state on creation
+        """
+        comment = utils.create_comment(topic=self.topic)
+        self.assertTrue(comment.is_visible)
+        self.assertFalse(comment.is_private)
+
+        private = utils.create_private_topic()
+        comment = utils.create_comment(topic=private.topic)
+        self.assertTrue(comment.is_private)
+
+        subcategory = utils.create_subcategory(self.category)
+        Category.objects.filter(pk=self.category.pk).update(is_removed=True)
+        invalidate_tree()
+        comment = utils.create_comment(topic=utils.create_topic(subcategory))
+        self.assertFalse(comment.is_visible)
+
+    def test_comment_sync_visibility(self):
+        """
+        Should update the changed flags only
+        """
+        comment = utils.create_comment(topic=self.topic)
+        comment_other = utils.create_comment(topic=utils.create_topic(self.category))
+        Topic.objects.filter(pk=self.topic.pk).update(is_removed=True)
+        self.assertEqual(Comment.sync_visibility(Comment.objects.all()), 1)
+        self.assertFalse(Comment.objects.get(pk=comment.pk).is_visible)
+        self.assertTrue(Comment.objects.get(pk=comment_other.pk).is_visible)
+        self.assertEqual(list(Comment.objects.visible()), [comment_other, ])
+
+        Topic.objects.filter(pk=self.topic.pk).update(is_removed=False)
+        Category.objects.filter(pk=self.category.pk).update(is_private=True)
+        invalidate_tree()
+        self.assertEqual(Comment.sync_visibility(Comment.objects.filter(pk=comment.pk)), 2)
+        comment = Comment.objects.get(pk=comment.pk)
+        self.assertTrue(comment.is_visible)
+        self.assertTrue(comment.is_private)
+        self.assertEqual(Comment.sync_visibility(Comment.objects.all()), 1)
+
+    def test_comment_move_sync_visibility(self):
+        """
+        Moved comments should take the new topic state
+        """
+        comment = utils.create_comment(topic=self.topic)
+        to_topic = utils.create_topic(self.category, is_removed=True)
+        form = CommentMoveForm(topic=self.topic, data={'topic': to_topic.pk, 'comments': [comment.pk, ]})
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.assertFalse(Comment.objects.get(pk=comment.pk).is_visible)
+
 
 class CommentTemplateTagTests(TestCase):
 
@@ -506,6 +720,23 @@ class CommentFormTest(TestCase):
         self.assertEqual(form.is_valid(), True)
         self.assertEqual(form.save(), list(Comment.objects.filter(topic=to_topic)))
 
+    def test_comments_move_renumber(self):
+        """
+        Should renumber the comments of both topics
+        """
+        comment = utils.create_comment(user=self.user, topic=self.topic, number=1)
+        comment2 = utils.create_comment(user=self.user, topic=self.topic, number=2)
+        to_topic = utils.create_topic(category=self.category)
+        to_comment = utils.create_comment(user=self.user, topic=to_topic, number=1)
+        form_data = {'topic': to_topic.pk,
+                     'comments': [comment.pk, ], }
+        form = CommentMoveForm(topic=self.topic, data=form_data)
+        self.assertEqual(form.is_valid(), True)
+        form.save()
+        self.assertEqual(Comment.objects.get(pk=comment2.pk).number, 1)
+        self.assertEqual(Comment.objects.get(pk=comment.pk).number, 1)
+        self.assertEqual(Comment.objects.get(pk=to_comment.pk).number, 2)
+
     def test_comment_image_upload(self):
         """
         Image upload
@@ -621,6 +852,133 @@ class CommentUtilsTest(TestCase):
         comment_posted(comment=comment, mentions=None)
         self.assertEqual(Topic.objects.get(pk=topic.pk).comment_count, 2)
 
+    def test_comment_posted_number(self):
+        """
+        Should number the comment
+        """
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        comment_posted(comment=comment, mentions=None)
+        self.assertEqual(Comment.objects.get(pk=comment.pk).number, 1)
+        comment2 = utils.create_comment(user=self.user, topic=self.topic)
+        comment_posted(comment=comment2, mentions=None)
+        self.assertEqual(Comment.objects.get(pk=comment2.pk).number, 2)
+
+        # Moved comments are numbered already
+        comment3 = utils.create_comment(user=self.user, topic=self.topic, number=1)
+        comment_posted(comment=comment3, mentions=None)
+        self.assertEqual(Comment.objects.get(pk=comment3.pk).number, 1)
+
+    def test_comment_posted_number_out_of_order(self):
+        """
+        Should invalidate the comments page index
+        when the comment gets numbered out of order
+        """
+        date = timezone.now() - datetime.timedelta(hours=1)
+        utils.create_comment(user=self.user, topic=self.topic, date=date + datetime.timedelta(minutes=2), number=1)
+        cache.set(keyset_paginator._make_cache_key(get_comments_page_index_uid(self.topic.pk)), 'foo')
+        comment = utils.create_comment(user=self.user, topic=self.topic, date=date)
+        comment_posted(comment=comment, mentions=None)
+        self.assertIsNone(cache.get(keyset_paginator._make_cache_key(get_comments_page_index_uid(self.topic.pk))))
+
+    def test_comment_posted_fan_out(self):
+        """
+        Should queue the notifications of the comment
+        """
+        org_delay, tasks.send_notification.delay = tasks.send_notification.delay, lambda **kwargs: None
+        try:
+            mentioned = utils.create_user()
+            comment = utils.create_comment(user=self.user, topic=self.topic)
+            comment_posted(comment=comment, mentions={mentioned.username: mentioned})
+            fan_out = CommentFanOut.objects.get(comment=comment)
+            self.assertEqual(fan_out.topic, self.topic)
+            self.assertEqual(fan_out.mention_ids, [mentioned.pk])
+            self.assertFalse(TopicNotification.objects.all().exists())
+            self.assertEqual(Topic.objects.get(pk=self.topic.pk).comment_count, 0)
+        finally:
+            tasks.send_notification.delay = org_delay
+
+        tasks.send_notification(topic_id=self.topic.pk)
+        self.assertFalse(CommentFanOut.objects.all().exists())
+        self.assertEqual(TopicNotification.objects.get(user=mentioned).action, MENTION)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).comment_count, 1)
+
+    def test_comments_fan_out(self):
+        """
+        Should send the notifications of a burst of comments at once
+        """
+        subscriber = utils.create_user()
+        mentioned = utils.create_user()
+        user = utils.create_user()
+        notification = TopicNotification.objects.create(
+            user=subscriber, topic=self.topic, comment=utils.create_comment(topic=self.topic),
+            is_active=True, is_read=True)
+        user_unread = TopicUnread.objects.create(user=user, topic=self.topic, is_read=True)
+        subscriber_unread = TopicUnread.objects.create(user=subscriber, topic=self.topic, is_read=True)
+
+        comment = utils.create_comment(user=user, topic=self.topic)
+        comment_mention = utils.create_comment(user=self.user, topic=self.topic)
+        comment_last = utils.create_comment(user=user, topic=self.topic)
+        CommentFanOut.create(comment=comment)
+        CommentFanOut.create(comment=comment_mention, mentions={mentioned.username: mentioned})
+        CommentFanOut.create(comment=comment_last)
+
+        with self.assertNumQueries(27):
+            comments_fan_out(topic_id=self.topic.pk)
+
+        self.assertFalse(CommentFanOut.objects.all().exists())
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).comment_count, 3)
+
+        notification = TopicNotification.objects.get(pk=notification.pk)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment_last)
+        self.assertEqual(notification.action, COMMENT)
+
+        notification = TopicNotification.objects.get(user=mentioned)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment_mention)
+        self.assertEqual(notification.action, MENTION)
+
+        # The poster subscribed before the comment by someone else
+        notification = TopicNotification.objects.get(user=user)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment_mention)
+
+        notification = TopicNotification.objects.get(user=self.user)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment_last)
+
+        self.assertFalse(TopicUnread.objects.get(pk=user_unread.pk).is_read)
+        self.assertFalse(TopicUnread.objects.get(pk=subscriber_unread.pk).is_read)
+
+        # Nothing to process
+        with self.assertNumQueries(3):
+            comments_fan_out(topic_id=self.topic.pk)
+
+    def test_comments_fan_out_claimed(self):
+        """
+        Should skip the rows claimed by another worker
+        """
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        CommentFanOut.create(comment=comment)
+        CommentFanOut.objects.update(claim='foo')
+        comments_fan_out(topic_id=self.topic.pk)
+        self.assertEqual(CommentFanOut.objects.count(), 1)
+        self.assertFalse(TopicNotification.objects.all().exists())
+
+    def test_pending_comments_fan_out(self):
+        """
+        Should send the notifications of every topic
+        """
+        topic = utils.create_topic(category=self.category)
+        CommentFanOut.create(comment=utils.create_comment(user=self.user, topic=self.topic))
+        CommentFanOut.create(comment=utils.create_comment(user=self.user, topic=topic))
+        CommentFanOut.create(comment=utils.create_comment(user=self.user, topic=topic))
+        self.assertEqual(pending_comments_fan_out(), 2)
+        self.assertFalse(CommentFanOut.objects.all().exists())
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).comment_count, 1)
+        self.assertEqual(Topic.objects.get(pk=topic.pk).comment_count, 2)
+        self.assertEqual(pending_comments_fan_out(), 0)
+
     def test_pre_comment_update(self):
         """
         * Should render static polls
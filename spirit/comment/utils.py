@@ -2,18 +2,118 @@
 
 from __future__ import unicode_literals
 
+import uuid
+
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from ..core import tasks
+from ..core.utils.paginator import keyset_paginator
 from ..topic.notification.models import TopicNotification, UNDEFINED
 from ..topic.unread.models import TopicUnread
 from .history.models import CommentHistory
 from .poll.utils.render_static import post_render_static_polls
+from .models import CommentFanOut
+
+User = get_user_model()
+
+
+def get_comments_page_index_uid(topic_id):
+    return 'topic:%s:comments' % topic_id
 
 
 def comment_posted(comment, mentions):
-    TopicNotification.create_maybe(user=comment.user, comment=comment, action=UNDEFINED)
-    TopicNotification.notify_new_comment(comment=comment)
-    TopicNotification.notify_new_mentions(comment=comment, mentions=mentions)
-    TopicUnread.unread_new_comment(comment=comment)
-    comment.topic.increase_comment_count()
+    # Moved comments are already numbered
+    if not comment.number and comment.update_number():
+        # Numbered out of order, the
+        # comment may not be on the last page
+        keyset_paginator.invalidate(get_comments_page_index_uid(comment.topic_id))
+
+    CommentFanOut.create(comment=comment, mentions=mentions)
+    tasks.delay_after_request(tasks.send_notification, topic_id=comment.topic_id)
+
+
+def comments_fan_out(topic_id):
+    """
+    Sends the notifications of the comments posted
+    in the topic since the last run, all at once.
+
+    Mentions take precedence over the comment
+    notifications within a burst of comments
+    """
+    claim = uuid.uuid4().hex
+
+    with transaction.atomic():
+        # The rows are claimed by an UPDATE rather than
+        # select_for_update, which is a no-op on SQLite.
+        # Concurrent workers wait for the row locks and
+        # then skip the rows deleted by this one
+        claimed = CommentFanOut.objects\
+            .filter(topic_id=topic_id, claim='')\
+            .update(claim=claim)
+
+        if not claimed:  # Processed by another worker
+            return
+
+        fan_outs = CommentFanOut.objects\
+            .filter(claim=claim)\
+            .select_related('comment__user', 'comment__topic')
+        fan_outs = list(fan_outs)
+        CommentFanOut.objects\
+            .filter(claim=claim)\
+            .delete()
+
+        comments = [fan_out.comment for fan_out in fan_outs]
+        posters = set()
+        new_posters = set()
+
+        for comment in comments:
+            if comment.user_id in posters:
+                continue
+
+            posters.add(comment.user_id)
+            _, created = TopicNotification.create_maybe(user=comment.user, comment=comment, action=UNDEFINED)
+
+            if created:
+                new_posters.add(comment.user_id)
+
+        # Users get notified of the last comment mentioning them
+        mentions_by_user = {}
+
+        for fan_out in fan_outs:
+            for user_id in fan_out.mention_ids:
+                mentions_by_user[user_id] = fan_out.comment
+
+        users = list(User.objects.filter(pk__in=list(mentions_by_user.keys())))
+
+        for comment in comments:
+            mentions = {
+                user.username: user
+                for user in users
+                if mentions_by_user[user.pk] == comment
+            }
+            TopicNotification.notify_new_mentions(comment=comment, mentions=mentions)
+
+        TopicNotification.notify_new_comments(comments=comments, new_posters=new_posters)
+        TopicUnread.unread_new_comments(comments=comments)
+        comments[-1].topic.increase_comment_count(count=len(comments))
+
+
+def pending_comments_fan_out():
+    """
+    Sends the notifications left pending, ie: by a
+    crashed worker. Returns the number of topics
+    """
+    topic_ids = CommentFanOut.objects\
+        .order_by('topic_id')\
+        .values_list('topic_id', flat=True)\
+        .distinct()
+    topic_ids = list(topic_ids)
+
+    for topic_id in topic_ids:
+        comments_fan_out(topic_id=topic_id)
+
+    return len(topic_ids)
 
 
 def pre_comment_update(comment):
@@ -26,3 +126,10 @@ def post_comment_update(comment):
 
     comment.comment_html = post_render_static_polls(comment)
     CommentHistory.create(comment)
+
+
+def comments_moved(from_topic, to_topic):
+    # Moved comments get inserted at some place given
+    # by their date, so the page indexes must be rebuilt
+    keyset_paginator.invalidate(get_comments_page_index_uid(from_topic.pk))
+    keyset_paginator.invalidate(get_comments_page_index_uid(to_topic.pk))
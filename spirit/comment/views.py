@@ -14,9 +14,10 @@ from ..core.utils.ratelimit.decorators import ratelimit
 from ..core.utils.decorators import moderator_required
 from ..core.utils import markdown, paginator, render_form_errors, json_response
 from ..topic.models import Topic
+from ..topic.signals import topics_updated
 from .models import Comment
 from .forms import CommentForm, CommentMoveForm, CommentImageForm
-from .utils import comment_posted, post_comment_update, pre_comment_update
+from .utils import comment_posted, comments_moved, post_comment_update, pre_comment_update
 
 
 @login_required
@@ -80,6 +81,7 @@ def delete(request, pk, remove=True):
         Comment.objects\
             .filter(pk=pk)\
             .update(is_removed=remove)
+        topics_updated.send(sender=Comment, topic_ids=[comment.topic_id, ])
 
         return redirect(comment.get_absolute_url())
 
@@ -96,6 +98,8 @@ def move(request, topic_id):
 
     if form.is_valid():
         comments = form.save()
+        comments_moved(from_topic=topic, to_topic=form.cleaned_data['topic'])
+        topics_updated.send(sender=Comment, topic_ids=[topic.pk, form.cleaned_data['topic'].pk])
 
         for comment in comments:
             comment_posted(comment=comment, mentions=None)
@@ -107,8 +111,12 @@ def move(request, topic_id):
 
 
 def find(request, pk):
-    comment = get_object_or_404(Comment, pk=pk)
-    comment_number = Comment.objects.filter(topic=comment.topic, date__lte=comment.date).count()
+    comment = get_object_or_404(Comment.objects.select_related('topic'), pk=pk)
+    comment_number = comment.number
+
+    if not comment_number:  # Not numbered yet
+        comment_number = Comment.objects.filter(topic=comment.topic, date__lte=comment.date).count()
+
     url = paginator.get_url(comment.topic.get_absolute_url(),
                             comment_number,
                             config.comments_per_page,
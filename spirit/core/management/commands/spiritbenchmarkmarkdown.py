@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...utils.markdown import Markdown, get_markdown
+from ...utils.markdown.utils.emoji import emojis
+from ....comment.models import Comment, COMMENT
+
+
+def _measure(render, comments, repeat):
+    """Return the best comments per second"""
+    best = None
+
+    for _ in range(repeat):
+        start = time.time()
+
+        for comment in comments:
+            render(comment)
+
+        elapsed = max(time.time() - start, 1e-6)
+        best = max(best or 0, len(comments) / elapsed)
+
+    return best
+
+
+def _get_emoji_comments(limit, size=100):
+    """
+    Return comments made of *size* emojis each,
+    the whole emoji set gets used across them
+    """
+    names = sorted(emojis)
+    return [
+        ' '.join(
+            ':%s:' % names[(i * size + j) % len(names)]
+            for j in range(size))
+        for i in range(limit)]
+
+
+class Command(BaseCommand):
+    help = 'Measure the rendering throughput of the latest comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=1000,
+            help='Number of comments rendered.')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of runs, the best one is reported.')
+        parser.add_argument(
+            '--emojis', action='store_true', default=False,
+            help='Render generated emoji-heavy comments instead.')
+
+    def handle(self, *args, **options):
+        if options['emojis']:
+            comments = _get_emoji_comments(options['limit'])
+        else:
+            comments = list(
+                Comment.objects
+                .filter(action=COMMENT)
+                .order_by('-pk')
+                .values_list('comment', flat=True)[:options['limit']])
+
+        if not comments:
+            self.stdout.write('There are no comments to render')
+            return
+
+        new = _measure(
+            lambda text: Markdown(escape=True, hard_wrap=True).render(text),
+            comments,
+            options['repeat'])
+        reused = _measure(
+            lambda text: get_markdown().render(text),
+            comments,
+            options['repeat'])
+
+        self.stdout.write('%s comments rendered' % len(comments))
+        self.stdout.write('new renderer: %.1f comments/s' % new)
+        self.stdout.write('reused renderer: %.1f comments/s' % reused)
+        self.stdout.write('speedup: %.2fx' % (reused / new))
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+import uuid
+import random
+import threading
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from ....category.models import Category
+from ....topic.models import Topic
+from ....comment.models import Comment
+from ....comment.poll.models import CommentPoll, CommentPollChoice, CommentPollVote
+
+User = get_user_model()
+
+
+def _vote(poll, tasks):
+    for voter, choice_ids in tasks:
+        CommentPollVote.vote(poll=poll, voter=voter, choice_ids=choice_ids)
+
+
+def _vote_in_thread(poll, tasks, errors):
+    try:
+        _vote(poll, tasks)
+    except Exception as err:
+        errors.append(err)
+    finally:
+        connection.close()
+
+
+def _create_topic(name, voters_count):
+    """
+    Create the throwaway voters and a removed
+    private topic, with no members, to hold the poll
+    """
+    with transaction.atomic():
+        voters = [
+            User.objects.create_user(username='%s-%s' % (name, number), email='')
+            for number in range(1, voters_count + 1)
+        ]
+        topic = Topic.objects.create(
+            user=voters[0],
+            category=Category.objects.get(pk=settings.ST_TOPIC_PRIVATE_CATEGORY_PK),
+            title=name,
+            is_removed=True)
+        comment = Comment.objects.create(
+            user=voters[0],
+            topic=topic,
+            comment=name,
+            comment_html=name)
+
+    return voters, topic, comment
+
+
+def _is_consistent(poll):
+    """Check the vote counts match the votes"""
+    counts = CommentPollVote.objects\
+        .unremoved()\
+        .filter(choice__poll=poll)\
+        .order_by()\
+        .values_list('choice_id')\
+        .annotate(count=Count('pk'))
+    counts = dict(counts)
+    choices = CommentPollChoice.objects\
+        .for_poll(poll)\
+        .values_list('pk', 'vote_count')
+
+    return all(
+        vote_count == counts.get(pk, 0)
+        for pk, vote_count in choices
+    )
+
+
+class Command(BaseCommand):
+    help = 'Measure the voting throughput of concurrent voters on a multiple choice poll.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--choices', type=int, default=5,
+            help='Number of poll choices.')
+        parser.add_argument(
+            '--choice-max', type=int, default=3,
+            help='Max number of choices per vote.')
+        parser.add_argument(
+            '--voters', type=int, default=10,
+            help='Number of users voting.')
+        parser.add_argument(
+            '--votes', type=int, default=20,
+            help='Number of votes per voter.')
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Number of voting threads, 1 votes in-process.')
+
+    def handle(self, *args, **options):
+        # Everything is created here and deleted
+        # afterwards, the forum data is left untouched
+        name = 'benchmark-%s' % uuid.uuid4().hex[:8]
+        voters, topic, comment = _create_topic(name, voters_count=max(options['voters'], 1))
+
+        try:
+            poll = CommentPoll.objects.create(
+                comment=comment,
+                name=name,
+                choice_max=options['choice_max'])
+            CommentPollChoice.objects.bulk_create([
+                CommentPollChoice(poll=poll, number=number, description='%s' % number)
+                for number in range(1, options['choices'] + 1)
+            ])
+            choice_ids = CommentPollChoice.objects\
+                .for_poll(poll)\
+                .values_list('pk', flat=True)
+            choice_ids = list(choice_ids)
+
+            choice_max = min(options['choice_max'], len(choice_ids))
+            rand = random.Random(1)
+            tasks = [
+                (voter, rand.sample(choice_ids, rand.randint(1, choice_max)))
+                for _ in range(options['votes'])
+                for voter in voters
+            ]
+            threads_count = max(options['threads'], 1)
+            errors = []
+            start = time.time()
+
+            if threads_count == 1:
+                _vote(poll, tasks)
+            else:
+                # The same voter may vote in many threads at once
+                threads = [
+                    threading.Thread(
+                        target=_vote_in_thread,
+                        args=(poll, tasks[i::threads_count], errors))
+                    for i in range(threads_count)
+                ]
+
+                for thread in threads:
+                    thread.start()
+
+                for thread in threads:
+                    thread.join()
+
+            elapsed = max(time.time() - start, 1e-6)
+            is_consistent = _is_consistent(poll)
+        finally:
+            topic.delete()
+            User.objects.filter(pk__in=[voter.pk for voter in voters]).delete()
+
+        self.stdout.write(
+            '%s votes by %s voters in %s threads' % (len(tasks), len(voters), threads_count))
+        self.stdout.write('%.1f votes/s' % (len(tasks) / elapsed))
+
+        for err in errors:
+            self.stderr.write('A voting thread failed: %s' % err)
+
+        if is_consistent:
+            self.stdout.write('vote counts are consistent')
+        else:
+            self.stdout.write('vote counts are skewed')
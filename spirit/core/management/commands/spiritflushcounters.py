@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ...utils import counters
+
+
+class Command(BaseCommand):
+    help = 'Save the buffered view and like counts.'
+
+    def handle(self, *args, **options):
+        count = counters.flush()
+        self.stdout.write('%s counters updated' % count)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import os
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Case, When, Value, F, TextField
+
+from ...utils.markdown import get_markdown
+from ....comment.models import Comment, COMMENT
+
+# Rows per UPDATE, each row takes three query params
+UPDATE_BATCH_SIZE = 100
+
+
+def _render_chunk(rows):
+    """
+    Render a chunk of (pk, comment) rows. Only the html
+    is returned, mentions are not notified and polls
+    are not re-created, those are kept as they are
+    """
+    markdown = get_markdown()
+    return [(pk, markdown.render(comment)) for pk, comment in rows]
+
+
+def _get_chunks(start, chunk_size, count):
+    """
+    Return up to *count* chunks of (pk, comment, comment_html)
+    rows, keyset paginated by pk
+    """
+    chunks = []
+
+    for _ in range(count):
+        rows = list(
+            Comment.objects
+            .filter(pk__gt=start, action=COMMENT)
+            .order_by('pk')
+            .values_list('pk', 'comment', 'comment_html')[:chunk_size])
+
+        if not rows:
+            break
+
+        chunks.append(rows)
+        start = rows[-1][0]
+
+    return chunks
+
+
+def _update(changed):
+    """
+    Save the html of the (pk, comment, comment_html) rows,
+    comments edited since they were read are left alone
+    """
+    for i in range(0, len(changed), UPDATE_BATCH_SIZE):
+        batch = changed[i:i + UPDATE_BATCH_SIZE]
+        Comment.objects\
+            .filter(pk__in=[pk for pk, _, _ in batch])\
+            .update(comment_html=Case(
+                *[When(pk=pk, comment=comment, then=Value(html))
+                  for pk, comment, html in batch],
+                default=F('comment_html'),
+                output_field=TextField()))
+
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+
+    with open(path) as fh:
+        return int(fh.read().strip() or 0)
+
+
+def _write_checkpoint(path, pk):
+    if not path:
+        return
+
+    with open(path, 'w') as fh:
+        fh.write('%s' % pk)
+
+
+class Command(BaseCommand):
+    help = 'Render the stored html of the comments again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of comments rendered per task.')
+        parser.add_argument(
+            '--processes', type=int, default=multiprocessing.cpu_count(),
+            help='Number of rendering processes, 1 renders in-process.')
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Render the comments with a greater id.')
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help='File storing the last rendered id, '
+                 'a stopped run resumes from it.')
+        parser.add_argument(
+            '--dry-run', action='store_true', default=False,
+            help='Count the changed comments without saving them.')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        dry_run = options['dry_run']
+        processes = max(options['processes'], 1)
+        start = _read_checkpoint(checkpoint)
+
+        if start is None:
+            start = options['start_after']
+
+        pool = None
+
+        if processes > 1:
+            # Connections can't be shared with the
+            # forked processes, each one opens its own
+            for connection in connections.all():
+                connection.close()
+
+            pool = multiprocessing.Pool(processes)
+
+        rendered = 0
+        changed_count = 0
+
+        try:
+            while True:
+                chunks = _get_chunks(start, options['chunk_size'], processes)
+
+                if not chunks:
+                    break
+
+                tasks = [[(pk, comment) for pk, comment, _ in rows] for rows in chunks]
+
+                if pool is None:
+                    results = [_render_chunk(rows) for rows in tasks]
+                else:
+                    results = pool.map(_render_chunk, tasks)
+
+                changed = [
+                    (pk, comment, html)
+                    for rows, chunk_results in zip(chunks, results)
+                    for (pk, comment, old_html), (_, html) in zip(rows, chunk_results)
+                    if html != old_html]
+
+                rendered += sum(len(rows) for rows in chunks)
+                changed_count += len(changed)
+                start = chunks[-1][-1][0]
+
+                if dry_run:
+                    continue
+
+                with transaction.atomic():
+                    _update(changed)
+
+                _write_checkpoint(checkpoint, start)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if checkpoint and not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        self.stdout.write('%s comments rendered' % rendered)
+
+        if dry_run:
+            self.stdout.write('%s comments would change' % changed_count)
+            self.stdout.write('%s comments unchanged' % (rendered - changed_count))
+        else:
+            self.stdout.write('%s comments updated' % changed_count)
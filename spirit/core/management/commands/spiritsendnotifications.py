@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ....comment.utils import pending_comments_fan_out
+
+
+class Command(BaseCommand):
+    help = 'Send the pending notifications of the posted comments.'
+
+    def handle(self, *args, **options):
+        count = pending_comments_fan_out()
+        self.stdout.write('%s topics notified' % count)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min, Max
+
+from ....comment.models import Comment
+
+
+class Command(BaseCommand):
+    help = 'Update the visibility state of the comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Number of comments (by id range) updated per query.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        ids = Comment.objects.aggregate(min=Min('pk'), max=Max('pk'))
+        count = 0
+
+        if ids['min'] is not None:
+            for start in range(ids['min'], ids['max'] + 1, chunk_size):
+                count += Comment.sync_visibility(
+                    Comment.objects.filter(pk__gte=start, pk__lt=start + chunk_size)
+                )
+
+        self.stdout.write('%s comments updated' % count)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from ....search.utils import update_index, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Index the topics and comments changed since the last run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of topics or comments committed to the index at once.')
+        parser.add_argument(
+            '--using', default='default',
+            help='The search connection to update.')
+        parser.add_argument(
+            '--rebuild', action='store_true', default=False,
+            help='Index every topic and comment and remove the stale ones.')
+
+    def handle(self, *args, **options):
+        update = rebuild_index if options['rebuild'] else update_index
+        count = update(batch_size=options['batch_size'], using=options['using'])
+        self.stdout.write('%s topics indexed' % count)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterFlush',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('bucket', models.BigIntegerField(verbose_name='bucket', default=0)),
+            ],
+            options={
+                'verbose_name': 'counter flush',
+                'verbose_name_plural': 'counter flushes',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class CounterFlush(models.Model):
+    """
+    Last bucket of buffered counters saved
+    to the database, see utils.counters.
+    There is a single row
+    """
+    bucket = models.BigIntegerField(_("bucket"), default=0)
+
+    class Meta:
+        verbose_name = _("counter flush")
+        verbose_name_plural = _("counter flushes")
@@ -5,11 +5,12 @@ from __future__ import unicode_literals
 from django.template.loader import render_to_string
 from django.core.paginator import Page
 
+from ..utils.paginator.seek_paginator import SeekPage
 from .registry import register
 
 
 @register.simple_tag(takes_context=True)
-def render_paginator(context, page, page_var='page', hashtag=''):
+def render_paginator(context, page, page_var='page', hashtag='', cursor_var='cursor'):
     query_dict = context["request"].GET.copy()
 
     try:
@@ -17,6 +18,12 @@ def render_paginator(context, page, page_var='page', hashtag=''):
     except KeyError:
         pass
 
+    if isinstance(page, SeekPage):
+        try:
+            del query_dict[cursor_var]
+        except KeyError:
+            pass
+
     extra_query = ""
 
     if query_dict:
@@ -34,6 +41,9 @@ def render_paginator(context, page, page_var='page', hashtag=''):
 
     if isinstance(page, Page):
         template = "spirit/utils/paginator/_paginator.html"
+    elif isinstance(page, SeekPage):
+        new_context["cursor_var"] = cursor_var
+        template = "spirit/utils/paginator/_seek_paginator.html"
     else:
         template = "spirit/utils/paginator/_yt_paginator.html"
 
@@ -2,7 +2,13 @@
 
 from __future__ import unicode_literals
 
+import logging
+import threading
+
 from django.conf import settings
+from django.db import connection
+from django.core.signals import request_started, request_finished
+from django.utils.six.moves import queue
 
 try:
     # TODO: remove this try block.
@@ -10,16 +16,133 @@ try:
 except ImportError:
     task = None
 
+logger = logging.getLogger(__name__)
+
+
+class LocalQueue(object):
+    """
+    Runs the tasks within the current process. Tasks
+    are run right away unless ST_TASK_WORKERS is
+    greater than zero, then they are handed to
+    a pool of daemon threads
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def _run(self, f, args, kwargs):
+        try:
+            f(*args, **kwargs)
+        except Exception:
+            logger.exception('Task %s failed', f.__name__)
+        finally:
+            connection.close()
+
+    def _work(self):
+        while True:
+            f, args, kwargs = self.queue.get()
+            self._run(f, args, kwargs)
+            self.queue.task_done()
+
+    def _start_workers(self):
+        with self.lock:
+            for _ in range(settings.ST_TASK_WORKERS - len(self.workers)):
+                worker = threading.Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def put(self, f, *args, **kwargs):
+        if not settings.ST_TASK_WORKERS:
+            return f(*args, **kwargs)
+
+        if len(self.workers) < settings.ST_TASK_WORKERS:
+            self._start_workers()
+
+        self.queue.put((f, args, kwargs))
+
+
+local_queue = LocalQueue()
+
 
 if not hasattr(settings, 'BROKER_URL'):
     def task(f):
-        f.delay = f
+        def delay(*args, **kwargs):
+            return local_queue.put(f, *args, **kwargs)
+
+        f.delay = delay
         return f
 
 
+_deferred = threading.local()
+
+
+def _start_deferring(sender, **kwargs):
+    _deferred.tasks = []
+
+
+def _run_deferred(sender, **kwargs):
+    deferred_tasks, _deferred.tasks = getattr(_deferred, 'tasks', None), None
+
+    for f, args, kwargs in deferred_tasks or ():
+        f.delay(*args, **kwargs)
+
+
+request_started.connect(_start_deferring, dispatch_uid=__name__)
+request_finished.connect(_run_deferred, dispatch_uid=__name__)
+
+
+def delay_after_request(f, *args, **kwargs):
+    """
+    Delays the task once the current request is done,
+    by then its transaction is committed (ie: ATOMIC_REQUESTS)
+    and the task can see the rows it created. Outside of
+    a request the task is delayed right away
+    """
+    deferred_tasks = getattr(_deferred, 'tasks', None)
+
+    if deferred_tasks is None:
+        return f.delay(*args, **kwargs)
+
+    deferred_tasks.append((f, args, kwargs))
+
+
 @task
-def send_notification():
-    pass
+def send_notification(topic_id):
+    from ..comment.utils import comments_fan_out
+    comments_fan_out(topic_id=topic_id)
+
+
+@task
+def send_pending_notifications():
+    from ..comment.utils import pending_comments_fan_out
+    pending_comments_fan_out()
+
+
+@task
+def topic_viewed(user_id, topic_id, comment_number):
+    from django.contrib.auth import get_user_model
+    from ..topic.models import Topic
+    from ..topic.utils import mark_as_viewed
+    mark_as_viewed(
+        user=get_user_model()(pk=user_id),
+        topic=Topic(pk=topic_id),
+        comment_number=comment_number
+    )
+
+
+@task
+def flush_counters():
+    from .utils import counters
+    counters.flush()
+
+
+@task
+def clean_notification_events():
+    from ..topic.notification.pubsub import DBPubSub
+    DBPubSub.clean()
 
 
 @task
@@ -29,7 +152,8 @@ def backup_database():
 
 @task
 def search_index_update():
-    pass
+    from ..search.utils import update_index
+    update_index()
 
 
 @task
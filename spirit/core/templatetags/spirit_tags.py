@@ -9,6 +9,7 @@ from ...topic.favorite import tags as topic_favorite
 from ...topic.notification import tags as topic_notification
 from ...topic.poll import tags as topic_poll
 from ...topic.private import tags as topic_private
+from ...topic.unread import tags as topic_unread
 from ..tags import avatar
 from ..tags import gravatar
 from ..tags import messages
@@ -28,6 +29,7 @@ __all__ = [
     'topic_favorite',
     'topic_notification',
     'topic_private',
+    'topic_unread',
     'avatar',
     'gravatar',
     'messages',
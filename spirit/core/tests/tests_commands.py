@@ -2,15 +2,25 @@
 
 from __future__ import unicode_literals
 import os
+import tempfile
 
 from django.test import TestCase
 from django.core.management import call_command
+from django.contrib.auth import get_user_model
 from django.utils.six import StringIO
 
 from ..management.commands import spiritmakelocales
 from ..management.commands import spirittxpush
 from ..management.commands import spiritinstall
 from ..management.commands import spiritupgrade
+from ..management.commands import spiritflushcounters
+from ..management.commands import spiritupdateindex
+from ...topic.models import Topic
+from ...comment.models import Comment, CommentFanOut, MOVED
+from ...comment.poll.models import CommentPoll, CommentPollVote
+from . import utils
+
+User = get_user_model()
 
 
 class CommandsTests(TestCase):
@@ -85,7 +95,8 @@ class CommandsTests(TestCase):
 
     def test_command_spiritupgrade(self):
         """
-        Should run migrations, rebuild search index and collect statics
+        Should run migrations, sync the comments visibility,
+        rebuild search index and collect statics
         """
         command_list = []
 
@@ -101,6 +112,205 @@ class CommandsTests(TestCase):
             out_put_err = err.getvalue().strip().splitlines()
             self.assertEqual(out_put[-1], "ok")
             self.assertEqual(out_put_err, [])
-            self.assertEqual(command_list, ["migrate", "rebuild_index", "collectstatic"])
+            self.assertEqual(command_list, ["migrate", "spiritsyncvisibility", "spiritupdateindex", "collectstatic"])
         finally:
             spiritupgrade.call = org_call
+
+    def test_command_spiritflushcounters(self):
+        """
+        Should flush the buffered counters
+        """
+        org_flush, spiritflushcounters.counters.flush = spiritflushcounters.counters.flush, lambda: 3
+        try:
+            out = StringIO()
+            err = StringIO()
+            call_command('spiritflushcounters', stdout=out, stderr=err)
+            out_put = out.getvalue().strip().splitlines()
+            out_put_err = err.getvalue().strip().splitlines()
+            self.assertEqual(out_put[-1], "3 counters updated")
+            self.assertEqual(out_put_err, [])
+        finally:
+            spiritflushcounters.counters.flush = org_flush
+
+    def test_command_spiritsendnotifications(self):
+        """
+        Should send the pending notifications
+        """
+        topic = utils.create_topic(utils.create_category())
+        CommentFanOut.create(comment=utils.create_comment(topic=topic))
+        out = StringIO()
+        err = StringIO()
+        call_command('spiritsendnotifications', stdout=out, stderr=err)
+        out_put = out.getvalue().strip().splitlines()
+        self.assertEqual(out_put[-1], "1 topics notified")
+        self.assertEqual(err.getvalue(), "")
+        self.assertFalse(CommentFanOut.objects.exists())
+
+    def test_command_spiritupdateindex(self):
+        """
+        Should index the queued topics
+        """
+        calls = []
+
+        def update_index_mock(**kwargs):
+            calls.append(kwargs)
+            return 5
+
+        org_update, spiritupdateindex.update_index = spiritupdateindex.update_index, update_index_mock
+        try:
+            out = StringIO()
+            err = StringIO()
+            call_command('spiritupdateindex', batch_size=10, stdout=out, stderr=err)
+            out_put = out.getvalue().strip().splitlines()
+            out_put_err = err.getvalue().strip().splitlines()
+            self.assertEqual(out_put[-1], "5 topics indexed")
+            self.assertEqual(out_put_err, [])
+            self.assertEqual(calls, [{'batch_size': 10, 'using': 'default'}])
+        finally:
+            spiritupdateindex.update_index = org_update
+
+    def test_command_spiritupdateindex_rebuild(self):
+        """
+        Should rebuild the whole index
+        """
+        calls = []
+
+        def rebuild_index_mock(**kwargs):
+            calls.append(kwargs)
+            return 7
+
+        org_rebuild, spiritupdateindex.rebuild_index = spiritupdateindex.rebuild_index, rebuild_index_mock
+        try:
+            out = StringIO()
+            call_command('spiritupdateindex', rebuild=True, stdout=out)
+            self.assertEqual(out.getvalue().strip().splitlines()[-1], "7 topics indexed")
+            self.assertEqual(calls, [{'batch_size': None, 'using': 'default'}])
+        finally:
+            spiritupdateindex.rebuild_index = org_rebuild
+
+    def test_command_spiritbenchmarkmarkdown(self):
+        """
+        Should render the latest comments
+        """
+        out = StringIO()
+        call_command('spiritbenchmarkmarkdown', stdout=out)
+        self.assertEqual(out.getvalue().strip(), "There are no comments to render")
+
+        category = utils.create_category()
+        topic = utils.create_topic(category)
+        utils.create_comment(topic=topic, comment="**foo** :airplane:")
+        utils.create_comment(topic=topic, comment="bar")
+        out = StringIO()
+        call_command('spiritbenchmarkmarkdown', limit=1, repeat=1, stdout=out)
+        out_put = out.getvalue().strip().splitlines()
+        self.assertEqual(out_put[0], "1 comments rendered")
+        self.assertTrue(out_put[1].startswith("new renderer: "))
+        self.assertTrue(out_put[2].startswith("reused renderer: "))
+        self.assertTrue(out_put[3].startswith("speedup: "))
+
+    def test_command_spiritbenchmarkmarkdown_emojis(self):
+        """
+        Should render generated emoji-heavy comments
+        """
+        out = StringIO()
+        call_command('spiritbenchmarkmarkdown', emojis=True, limit=2, repeat=1, stdout=out)
+        out_put = out.getvalue().strip().splitlines()
+        self.assertEqual(out_put[0], "2 comments rendered")
+        self.assertTrue(out_put[1].startswith("new renderer: "))
+
+    def test_command_spiritbenchmarkpollvotes(self):
+        """
+        Should vote on a throwaway poll and check the vote counts
+        """
+        category = utils.create_category()
+        topic = utils.create_topic(category)
+        utils.create_comment(topic=topic)
+        users_count = User.objects.count()
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            'spiritbenchmarkpollvotes', voters=2, votes=3, threads=1, stdout=out, stderr=err)
+        out_put = out.getvalue().strip().splitlines()
+        self.assertEqual(out_put[0], "6 votes by 2 voters in 1 threads")
+        self.assertTrue(out_put[1].endswith(" votes/s"))
+        self.assertEqual(out_put[2], "vote counts are consistent")
+        self.assertEqual(err.getvalue(), "")
+        self.assertFalse(CommentPoll.objects.exists())
+        self.assertFalse(CommentPollVote.objects.exists())
+        self.assertEqual(list(Topic.objects.all()), [topic, ])
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(User.objects.count(), users_count)
+
+    def test_command_spiritsyncvisibility(self):
+        """
+        Should update the comments visibility in chunks
+        """
+        category = utils.create_category()
+        topic = utils.create_topic(category)
+        comments = [utils.create_comment(topic=topic) for _ in range(3)]
+        Comment.objects.all().update(is_visible=False)
+
+        out = StringIO()
+        err = StringIO()
+        call_command('spiritsyncvisibility', chunk_size=2, stdout=out, stderr=err)
+        out_put = out.getvalue().strip().splitlines()
+        self.assertEqual(out_put[-1], "3 comments updated")
+        self.assertEqual(err.getvalue(), "")
+        self.assertEqual(
+            list(Comment.objects.visible().order_by('pk')),
+            comments
+        )
+
+    def test_command_spiritrendercomments(self):
+        """
+        Should render the stored html of the comments again
+        """
+        category = utils.create_category()
+        topic = utils.create_topic(category)
+        comment_a = utils.create_comment(topic=topic, comment="**foo**", comment_html="<p>old</p>")
+        comment_b = utils.create_comment(topic=topic, comment="bar", comment_html="<p>bar</p>")
+        action = utils.create_comment(topic=topic, action=MOVED, comment_html="action")
+
+        out = StringIO()
+        call_command('spiritrendercomments', processes=1, dry_run=True, stdout=out)
+        self.assertEqual(
+            out.getvalue().strip().splitlines(),
+            ["2 comments rendered", "1 comments would change", "1 comments unchanged"])
+        self.assertEqual(Comment.objects.get(pk=comment_a.pk).comment_html, "<p>old</p>")
+
+        out = StringIO()
+        call_command('spiritrendercomments', processes=1, chunk_size=1, stdout=out)
+        self.assertEqual(
+            out.getvalue().strip().splitlines(),
+            ["2 comments rendered", "1 comments updated"])
+        self.assertEqual(
+            Comment.objects.get(pk=comment_a.pk).comment_html,
+            "<p><strong>foo</strong></p>")
+        self.assertEqual(Comment.objects.get(pk=comment_b.pk).comment_html, "<p>bar</p>")
+        self.assertEqual(Comment.objects.get(pk=action.pk).comment_html, "action")
+
+    def test_command_spiritrendercomments_checkpoint(self):
+        """
+        Should resume from the checkpoint and remove it when done
+        """
+        category = utils.create_category()
+        topic = utils.create_topic(category)
+        comment_a = utils.create_comment(topic=topic, comment="foo", comment_html="old")
+        comment_b = utils.create_comment(topic=topic, comment="bar", comment_html="old")
+        fd, checkpoint = tempfile.mkstemp()
+        os.close(fd)
+
+        try:
+            with open(checkpoint, 'w') as fh:
+                fh.write('%s' % comment_a.pk)
+
+            out = StringIO()
+            call_command(
+                'spiritrendercomments', processes=1, checkpoint=checkpoint, stdout=out)
+            self.assertEqual(out.getvalue().strip().splitlines()[-1], "1 comments updated")
+            self.assertEqual(Comment.objects.get(pk=comment_a.pk).comment_html, "old")
+            self.assertEqual(Comment.objects.get(pk=comment_b.pk).comment_html, "<p>bar</p>")
+            self.assertFalse(os.path.exists(checkpoint))
+        finally:
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
@@ -10,7 +10,8 @@ from django.conf import settings
 from django.utils import timezone
 
 from ..tests import utils as test_utils
-from ..utils.markdown import Markdown, quotify
+from ..utils.markdown import Markdown, get_markdown, quotify
+from ..utils.markdown.utils import emoji
 
 
 now_fixed = timezone.now()
@@ -60,6 +61,78 @@ class UtilsMarkdownTests(TestCase):
         self.assertDictEqual(md.get_mentions(), {'nitely': self.user,
                                                  'esteban': self.user2})
 
+    def test_markdown_mentions_queries(self):
+        """
+        Should resolve the mentions in a single query, then hit the cache
+        """
+        comment = "@nitely, @esteban, @nitely, @fakeone"
+        md = Markdown(escape=True, hard_wrap=True)
+
+        with self.assertNumQueries(1):
+            comment_md = md.render(comment)
+
+        md = Markdown(escape=True, hard_wrap=True)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(md.render(comment), comment_md)
+
+        self.assertDictEqual(md.get_mentions(), {'nitely': self.user,
+                                                 'esteban': self.user2})
+
+    def test_markdown_mentions_cache_invalidate(self):
+        """
+        Should invalidate the cached mention on user creation and rename
+        """
+        Markdown(escape=True, hard_wrap=True).render("@fakeone, @nitely")
+
+        user = test_utils.create_user(username="fakeone")
+        self.user.username = "nitely2"
+        self.user.save()
+
+        md = Markdown(escape=True, hard_wrap=True)
+        comment_md = md.render("@fakeone, @nitely")
+        self.assertEqual(comment_md, '<p><a class="comment-mention" href="%s">@fakeone</a>, '
+                                     '@nitely</p>' % user.st.get_absolute_url())
+
+    def test_markdown_reuse(self):
+        """
+        Should clear the mentions and polls of the previous render
+        """
+        md = Markdown(escape=True, hard_wrap=True)
+        md.render("@nitely\n\n"
+                  "[poll name=foo]\n"
+                  "1. opt 1\n"
+                  "2. opt 2\n"
+                  "[/poll]")
+        mentions = md.get_mentions()
+        polls = md.get_polls()
+        self.assertEqual(len(polls['polls']), 1)
+
+        comment_md = md.render("@esteban")
+        self.assertEqual(comment_md, '<p><a class="comment-mention" href="%s">@esteban</a></p>'
+                                     % self.user2.st.get_absolute_url())
+        self.assertDictEqual(md.get_mentions(), {'esteban': self.user2})
+        self.assertEqual(md.get_polls(), {'polls': [], 'choices': []})
+        # Previous results are left untouched
+        self.assertDictEqual(mentions, {'nitely': self.user})
+        self.assertEqual(len(polls['polls']), 1)
+
+    def test_get_markdown(self):
+        """
+        Should return the same renderer within a thread
+        """
+        import threading
+
+        md = get_markdown()
+        self.assertIs(get_markdown(), md)
+        self.assertEqual(md.render("foo\nbar"), "<p>foo<br>bar</p>")
+
+        others = []
+        thread = threading.Thread(target=lambda: others.append(get_markdown()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(others[0], md)
+
     def test_markdown_emoji(self):
         """
         markdown emojify
@@ -71,6 +144,21 @@ class UtilsMarkdownTests(TestCase):
                                      '<img class="comment-emoji" src="%(static)sspirit/emojis/8ball.png"> '
                                      ':bademoji: foo:</p>' % {'static': settings.STATIC_URL, })
 
+    def test_markdown_emoji_urls(self):
+        """
+        Should build the emoji urls once, and again when the static url changes
+        """
+        urls = emoji.get_urls()
+        self.assertIs(emoji.get_urls(), urls)
+        self.assertEqual(len(urls), len(emoji.emojis))
+        self.assertEqual(urls['airplane'], '%sspirit/emojis/airplane.png' % settings.STATIC_URL)
+
+        with override_settings(STATIC_URL='/foo/'):
+            comment_md = Markdown(escape=True, hard_wrap=True).render(":airplane:")
+            self.assertEqual(comment_md, '<p><img class="comment-emoji" src="/foo/spirit/emojis/airplane.png"></p>')
+
+        self.assertEqual(emoji.get_urls()['airplane'], '%sspirit/emojis/airplane.png' % settings.STATIC_URL)
+
     @override_settings(LANGUAGE_CODE='en')
     def test_markdown_quote(self):
         """
@@ -400,17 +488,20 @@ class UtilsMarkdownTests(TestCase):
         Should not exceed the limit
         """
         limit = 20  # todo: change to setting
-        comment = "[poll name=foo]\n" \
+        opts = '\n'.join('%s. opt' % x for x in range(limit))
+        comment = "[poll name=foo]\n" + opts + "\n[/poll]\n\n" \
+                  "[poll name=bar]\n" \
                   "1. opt 1\n" \
                   "2. opt 2\n" \
                   "[/poll]"
         md = Markdown(escape=True, hard_wrap=True)
-        polls = md.get_polls()
-        polls['choices'].extend({} for _ in range(limit))
         comment_md = md.render(comment)
-        self.assertEqual(comment_md, '<p>[poll name=foo]<br>1. opt 1<br>2. opt 2<br>[/poll]</p>')
+        self.assertEqual(
+            comment_md,
+            '<poll name=foo>\n<p>[poll name=bar]<br>1. opt 1<br>2. opt 2<br>[/poll]</p>')
         polls = md.get_polls()
         self.assertEqual(len(polls['choices']), limit)
+        self.assertEqual([poll['name'] for poll in polls['polls']], ['foo', ])
 
     def test_markdown_poll_choice_limit_exceeded(self):
         """
@@ -432,14 +523,18 @@ class UtilsMarkdownTests(TestCase):
         comment = "[poll name=foo]\n" \
                   "1. opt 1\n" \
                   "2. opt 2\n" \
+                  "[/poll]\n\n" \
+                  "[poll name=foo]\n" \
+                  "1. opt 3\n" \
+                  "2. opt 4\n" \
                   "[/poll]"
         md = Markdown(escape=True, hard_wrap=True)
-        polls = md.get_polls()
-        polls['polls'].append({'name': 'foo'})
         comment_md = md.render(comment)
-        self.assertEqual(comment_md, '<p>[poll name=foo]<br>1. opt 1<br>2. opt 2<br>[/poll]</p>')
+        self.assertEqual(
+            comment_md,
+            '<poll name=foo>\n<p>[poll name=foo]<br>1. opt 3<br>2. opt 4<br>[/poll]</p>')
         polls = md.get_polls()
-        self.assertEqual(len(polls['choices']), 0)
+        self.assertEqual([choice['description'] for choice in polls['choices']], ['opt 1', 'opt 2'])
         self.assertEqual(len(polls['polls']), 1)
 
     def test_markdown_poll_unique_choice_numbers(self):
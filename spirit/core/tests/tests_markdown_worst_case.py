@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+import random
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..utils.markdown import Markdown
+from ...comment.models import COMMENT_MAX_LEN
+
+SIZES = (COMMENT_MAX_LEN // 10, COMMENT_MAX_LEN // 3, COMMENT_MAX_LEN)
+
+# Render time budget per char, it's generous
+# enough for slow machines. A rule backtracking
+# more than linearly goes over it by orders of
+# magnitude at COMMENT_MAX_LEN
+SECONDS_PER_CHAR = 0.0001
+
+# Inputs made to exercise the backtracking of
+# the custom rules: (prefix, repeated text, suffix)
+WORST_CASES = {
+    'poll_choices': ('[poll name=foo]\n', '1.   foo\n', ''),
+    'poll_choices_blank': ('[poll name=foo]\n', '1.\n \n', ''),
+    'poll_body': ('[poll name=foo]\n', 'foo\n', ''),
+    'poll_params': ('', '[poll\n\n', ''),
+    'image_link': ('http://', '/foo.png?', ' foo'),
+    'image_link_dots': ('http://', '/.', 'foo'),
+    'audio_link': ('http://', '.mp3?', ' foo'),
+    'video_link': ('http://', '.mp4?', ' foo'),
+    'vimeo': ('https://vimeo.com/groups/', 'foo', '\n\nbar'),
+    'text_spaces': ('foo', ' ', 'bar'),
+    'emojis': ('', ':foo', ''),
+    'mentions': ('', '@', ''),
+}
+
+FUZZ_TOKENS = (
+    '[poll name=foo]\n', '[/poll]', '1. ', '# ', ' ', '\n', 'http://',
+    '/', '.', 'png', '?', ':', '@', '*', '_', '`', '[', ']', '(', ')', 'foo')
+FUZZ_SAMPLES = 10
+
+
+def _make(prefix, text, suffix, size):
+    times = (size - len(prefix) - len(suffix)) // len(text) + 1
+    return (prefix + text * times)[:size - len(suffix)] + suffix
+
+
+def _fuzz(rand, size):
+    tokens = []
+    length = 0
+
+    while length < size:
+        token = rand.choice(FUZZ_TOKENS)
+        tokens.append(token)
+        length += len(token)
+
+    return ''.join(tokens)[:size]
+
+
+def _render_time(comment, repeat=3):
+    """Return the best render time"""
+    best = None
+
+    for _ in range(repeat):
+        md = Markdown(escape=True, hard_wrap=True)
+        start = time.time()
+        md.render(comment)
+        elapsed = time.time() - start
+        best = min(best if best is not None else elapsed, elapsed)
+
+    return best
+
+
+class UtilsMarkdownWorstCaseTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def assertRenderTime(self, name, comment):
+        size = len(comment)
+        elapsed = _render_time(comment)
+        self.assertLessEqual(
+            elapsed, size * SECONDS_PER_CHAR,
+            "%s took %.3fs to render %s chars" % (name, elapsed, size))
+
+    def test_markdown_worst_cases(self):
+        """
+        Should render the crafted comments in linear time
+        """
+        for name, (prefix, text, suffix) in sorted(WORST_CASES.items()):
+            for size in SIZES:
+                comment = _make(prefix, text, suffix, size)
+                self.assertEqual(len(comment), size)
+                self.assertRenderTime(name, comment)
+
+    def test_markdown_fuzz(self):
+        """
+        Should render random comments in linear time
+        """
+        rand = random.Random(1)
+
+        for size in SIZES:
+            for i in range(FUZZ_SAMPLES):
+                self.assertRenderTime('fuzz %s' % i, _fuzz(rand, size))
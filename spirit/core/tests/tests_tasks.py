@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import threading
+import logging
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from .. import tasks
+from ..tasks import LocalQueue, delay_after_request
+
+
+class LocalQueueTests(TestCase):
+
+    def test_put(self):
+        """
+        Should run the task right away
+        """
+        res = []
+        LocalQueue().put(res.append, 'foo')
+        self.assertEqual(res, ['foo'])
+
+    @override_settings(ST_TASK_WORKERS=2)
+    def test_put_workers(self):
+        """
+        Should run the task in a worker thread
+        """
+        res = []
+        done = threading.Event()
+
+        def task(value):
+            res.append((value, threading.current_thread()))
+            done.set()
+
+        local_queue = LocalQueue()
+        local_queue.put(task, 'foo')
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(len(local_queue.workers), 2)
+        self.assertEqual(res[0][0], 'foo')
+        self.assertIn(res[0][1], local_queue.workers)
+
+    @override_settings(ST_TASK_WORKERS=1)
+    def test_put_workers_error(self):
+        """
+        Should keep the worker alive on task errors
+        """
+        res = []
+        done = threading.Event()
+
+        def task_error():
+            raise ValueError
+
+        def task():
+            res.append('foo')
+            done.set()
+
+        logging.disable(logging.CRITICAL)
+        try:
+            local_queue = LocalQueue()
+            local_queue.put(task_error)
+            local_queue.put(task)
+            self.assertTrue(done.wait(timeout=5))
+            self.assertEqual(res, ['foo'])
+        finally:
+            logging.disable(logging.NOTSET)
+
+
+class DelayAfterRequestTests(TestCase):
+
+    def setUp(self):
+        self.res = []
+
+        def task(value):
+            self.res.append(value)
+
+        task.delay = task
+        self.task = task
+
+    def test_delay_after_request(self):
+        """
+        Should delay the task once the request is done
+        """
+        # Sending the signals would close the test db connection
+        tasks._start_deferring(sender=None)
+        delay_after_request(self.task, 'foo')
+        delay_after_request(self.task, value='bar')
+        self.assertEqual(self.res, [])
+        tasks._run_deferred(sender=None)
+        self.assertEqual(self.res, ['foo', 'bar'])
+
+        # Not within a request
+        delay_after_request(self.task, 'baz')
+        self.assertEqual(self.res, ['foo', 'bar', 'baz'])
+
+    def test_delay_after_request_outside(self):
+        """
+        Should delay the task right away outside of a request
+        """
+        delay_after_request(self.task, 'foo')
+        self.assertEqual(self.res, ['foo'])
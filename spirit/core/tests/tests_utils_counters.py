@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.cache import cache
+
+from . import utils
+from ..utils import counters
+from ...topic.models import Topic
+from ...comment.models import Comment
+
+
+class UtilsCountersTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = utils.create_category()
+        self.topic = utils.create_topic(category=self.category)
+        self.topic2 = utils.create_topic(category=self.category)
+        self.bucket = 1000
+
+        self._org_get_bucket, counters._get_bucket = counters._get_bucket, lambda: self.bucket
+
+    def tearDown(self):
+        counters._get_bucket = self._org_get_bucket
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=False)
+    def test_incr_unbuffered(self):
+        """
+        Should update the counter right away
+        """
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        counters.incr(Topic, pk=self.topic.pk, field='view_count', delta=2)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 3)
+        self.assertEqual(counters.flush(), 0)
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_incr_buffered(self):
+        """
+        Should save the buffered deltas once the bucket is closed
+        """
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        counters.incr(Topic, pk=self.topic2.pk, field='view_count')
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 0)
+
+        self.bucket += 1
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 0)
+
+        self.bucket += 1
+        # Flush state, savepoint, bucket mark,
+        # one per delta and the savepoint release
+        with self.assertNumQueries(6):
+            self.assertEqual(counters.flush(), 2)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 2)
+        self.assertEqual(Topic.objects.get(pk=self.topic2.pk).view_count, 1)
+
+        self.bucket += 1
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 3)
+
+        # Flushed already
+        self.bucket += 10
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 3)
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_incr_buffered_negative(self):
+        """
+        Should buffer the decrements
+        """
+        Comment.objects.filter(pk=utils.create_comment(topic=self.topic).pk).update(likes_count=5)
+        comment = Comment.objects.get(topic=self.topic)
+        comment.decrease_likes_count()
+        comment.decrease_likes_count()
+        comment.increase_likes_count()
+        self.bucket += 2
+        counters.flush()
+        self.assertEqual(Comment.objects.get(pk=comment.pk).likes_count, 4)
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_flush_saved(self):
+        """
+        Should not save the bucket twice when its deltas were not dropped
+        """
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        self.bucket += 2
+        buffer_cache = counters._get_cache()
+
+        def delete_many_crash(keys):
+            raise ValueError
+
+        buffer_cache.delete_many = delete_many_crash
+        try:
+            self.assertRaises(ValueError, counters.flush)
+        finally:
+            del buffer_cache.delete_many
+
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 1)
+        cache.delete(counters._make_key('flushed'))
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 1)
+
+        # Not pending anymore
+        topic = Topic.objects.get(pk=self.topic.pk)
+        counters.add_pending([topic, ], field='view_count')
+        self.assertEqual(topic.view_count, 1)
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_flush_locked(self):
+        """
+        Should not flush while another process is flushing
+        """
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        self.bucket += 2
+        cache.set(counters._make_key('lock'), 1)
+        self.assertEqual(counters.flush(), 0)
+        cache.delete(counters._make_key('lock'))
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(Topic.objects.get(pk=self.topic.pk).view_count, 1)
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_add_pending(self):
+        """
+        Should add the buffered deltas to the instances
+        """
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        self.bucket += 1
+        counters.incr(Topic, pk=self.topic.pk, field='view_count')
+        counters.incr(Topic, pk=self.topic2.pk, field='view_count', delta=3)
+
+        topics = list(Topic.objects.filter(pk__in=[self.topic.pk, self.topic2.pk]).order_by('pk'))
+        counters.add_pending(topics, field='view_count')
+        self.assertEqual([t.view_count for t in topics], [2, 3])
+
+        # Flushed counters are not pending anymore
+        self.bucket += 2
+        counters.flush()
+        topics = list(Topic.objects.filter(pk__in=[self.topic.pk, self.topic2.pk]).order_by('pk'))
+        counters.add_pending(topics, field='view_count')
+        self.assertEqual([t.view_count for t in topics], [2, 3])
+
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=False)
+    def test_add_pending_unbuffered(self):
+        """
+        Should do nothing
+        """
+        topics = list(Topic.objects.filter(pk=self.topic.pk))
+
+        with self.assertNumQueries(0):
+            counters.add_pending(topics, field='view_count')
+
+        self.assertEqual(topics[0].view_count, 0)
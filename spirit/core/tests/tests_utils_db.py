@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from django.core.cache import cache
+
+from . import utils
+from ..utils import db
+from ...topic.models import Topic
+from ...topic.unread.models import TopicUnread
+
+
+class UtilsDBTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = utils.create_user()
+        self.category = utils.create_category()
+        self.topic = utils.create_topic(category=self.category)
+
+    def test_upsert(self):
+        """
+        Should create the row or update it, in a single query
+        """
+        with self.assertNumQueries(1):
+            db.upsert(TopicUnread, lookup={'user': self.user, 'topic': self.topic}, values={'is_read': False})
+
+        unread = TopicUnread.objects.get(user=self.user, topic=self.topic)
+        self.assertFalse(unread.is_read)
+        self.assertIsNotNone(unread.date)
+
+        with self.assertNumQueries(1):
+            db.upsert(TopicUnread, lookup={'user': self.user, 'topic': self.topic}, values={'is_read': True})
+
+        self.assertTrue(TopicUnread.objects.get(pk=unread.pk).is_read)
+        self.assertEqual(TopicUnread.objects.get(pk=unread.pk).date, unread.date)
+        self.assertEqual(TopicUnread.objects.all().count(), 1)
+
+    def test_upsert_written(self):
+        """
+        Should return 0 when the row is unchanged
+        """
+        lookup = {'user': self.user, 'topic': self.topic}
+        self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': False}), 1)
+        self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': True}), 1)
+        self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': True}), 0)
+
+        org_can_upsert, db._can_upsert = db._can_upsert, lambda connection: False
+        try:
+            self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': True}), 0)
+            self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': False}), 1)
+            TopicUnread.objects.all().delete()
+            self.assertEqual(db.upsert(TopicUnread, lookup=lookup, values={'is_read': False}), 1)
+        finally:
+            db._can_upsert = org_can_upsert
+
+    def test_upsert_fallback(self):
+        """
+        Should create the row or update it when the database has no native upsert
+        """
+        org_can_upsert, db._can_upsert = db._can_upsert, lambda connection: False
+        try:
+            db.upsert(TopicUnread, lookup={'user': self.user, 'topic': self.topic}, values={'is_read': False})
+            unread = TopicUnread.objects.get(user=self.user, topic=self.topic)
+            self.assertFalse(unread.is_read)
+
+            with self.assertNumQueries(1):
+                db.upsert(TopicUnread, lookup={'user': self.user, 'topic': self.topic}, values={'is_read': True})
+
+            self.assertTrue(TopicUnread.objects.get(pk=unread.pk).is_read)
+
+            # Unchanged
+            with self.assertNumQueries(2):
+                db.upsert(TopicUnread, lookup={'user': self.user, 'topic': self.topic}, values={'is_read': True})
+
+            self.assertEqual(TopicUnread.objects.all().count(), 1)
+        finally:
+            db._can_upsert = org_can_upsert
+
+    def test_update_many(self):
+        """
+        Should update the rows sharing the same changes at once
+        """
+        topic2 = utils.create_topic(category=self.category)
+        topic3 = utils.create_topic(category=self.category)
+
+        with self.assertNumQueries(2):
+            db.update_many(Topic, {
+                self.topic.pk: {'is_pinned': True, 'title': 'foo'},
+                topic2.pk: {'title': 'foo', 'is_pinned': True},
+                topic3.pk: {'is_closed': True}
+            })
+
+        self.assertEqual(
+            list(Topic.objects.filter(is_pinned=True, title='foo').order_by('pk')),
+            [self.topic, topic2])
+        self.assertEqual(list(Topic.objects.filter(is_closed=True)), [topic3])
+
+        with self.assertNumQueries(0):
+            db.update_many(Topic, {})
@@ -2,18 +2,24 @@
 
 from __future__ import unicode_literals
 
+import datetime
+
 from django.core.cache import cache
 from django.test import TestCase, RequestFactory
 from django.template import Template, Context
 from django.test.utils import override_settings
 from django.http import Http404
 from django.core.paginator import Page, Paginator
+from django.utils import timezone
 
 from ..tests import utils
 from ...comment.models import Comment
 from ..utils import paginator
 from ..utils.paginator import YTPaginator, InvalidPage, YTPage
-from ..utils.paginator import infinite_paginator, paginate, yt_paginate
+from ..utils.paginator import infinite_paginator, paginate, yt_paginate, keyset_paginate
+from ..utils.paginator import KeysetPaginator, keyset_paginator
+from ..utils.paginator import SeekPaginator, seek_paginate
+from ..utils.paginator.seek_paginator import SeekPage
 from ..tags.paginator import render_paginator
 from ..tags import paginator as ttag_paginator
 
@@ -165,6 +171,269 @@ class UtilsYTPaginatorTests(TestCase):
         self.assertListEqual(list(page.page_range), [1, 2])
 
 
+class UtilsKeysetPaginatorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = utils.create_user()
+        self.topic = utils.create_topic(utils.create_category())
+
+        for _ in range(25):
+            utils.create_comment(user=self.user, topic=self.topic)
+
+        self.queryset = Comment.objects.filter(topic=self.topic)
+        self.ordered = list(self.queryset.order_by('date', 'pk'))
+
+    def test_keyset_paginator_page(self):
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.count, 25)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertListEqual(list(paginator.page(1)), self.ordered[:10])
+        self.assertListEqual(list(paginator.page(2)), self.ordered[10:20])
+        self.assertListEqual(list(paginator.page(3)), self.ordered[20:])
+        self.assertEqual(paginator.page(3).start_index(), 21)
+        self.assertRaises(InvalidPage, lambda: paginator.page(4))
+
+    def test_keyset_paginator_page_desc(self):
+        ordered = list(self.queryset.order_by('-date', '-pk'))
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('-date', '-pk'), uid='foo')
+        self.assertListEqual(list(paginator.page(1)), ordered[:10])
+        self.assertListEqual(list(paginator.page(3)), ordered[20:])
+
+    def test_keyset_paginator_same_date(self):
+        """
+        Should seek by pk when dates are the same
+        """
+        Comment.objects.filter(topic=self.topic).update(date=timezone.now())
+        ordered = list(self.queryset.order_by('date', 'pk'))
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertListEqual(list(paginator.page(2)), ordered[10:20])
+
+    def test_keyset_paginator_index_cached(self):
+        """
+        Should not count the rows once the index is cached
+        """
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+
+        with self.assertNumQueries(2):
+            # Appended rows lookup and page rows
+            page = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(3)
+            self.assertListEqual(list(page), self.ordered[20:])
+
+    def test_keyset_paginator_index_appended(self):
+        """
+        Should extend the index with new rows
+        """
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+
+        for _ in range(10):
+            utils.create_comment(user=self.user, topic=self.topic)
+
+        ordered = list(self.queryset.order_by('date', 'pk'))
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.count, 35)
+        self.assertListEqual(list(paginator.page(3)), ordered[20:30])
+        self.assertListEqual(list(paginator.page(4)), ordered[30:])
+
+    def test_keyset_paginator_index_out_of_order(self):
+        """
+        Should add the rows committed after the
+        ones placed after them within the last page
+        """
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        Comment.objects.filter(pk=comment.pk).update(date=self.ordered[-2].date)
+
+        ordered = list(self.queryset.order_by('date', 'pk'))
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.count, 26)
+        self.assertListEqual(list(paginator.page(3)), ordered[20:])
+
+    def test_keyset_paginator_index_last_page_full(self):
+        """
+        Should start a new page when the
+        last page gets filled out of order
+        """
+        for _ in range(5):
+            utils.create_comment(user=self.user, topic=self.topic)
+
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+        ordered = list(self.queryset.order_by('date', 'pk'))
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        Comment.objects.filter(pk=comment.pk).update(date=ordered[-1].date)
+
+        ordered = list(self.queryset.order_by('date', 'pk'))
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.num_pages, 4)
+        self.assertListEqual(list(paginator.page(3)), ordered[20:30])
+        self.assertListEqual(list(paginator.page(4)), ordered[30:])
+
+    def test_keyset_paginator_index_invalidate(self):
+        """
+        Should rebuild the index when invalidated
+        """
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+        Comment.objects.filter(pk=self.ordered[0].pk).delete()
+
+        keyset_paginator.invalidate('foo')
+        paginator = KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.count, 24)
+        self.assertListEqual(list(paginator.page(2)), self.ordered[11:21])
+
+    def test_keyset_paginator_index_per_page(self):
+        """
+        Should rebuild the index when per_page changes
+        """
+        KeysetPaginator(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo').page(1)
+        paginator = KeysetPaginator(self.queryset, per_page=5, ordering=('date', 'pk'), uid='foo')
+        self.assertEqual(paginator.num_pages, 5)
+        self.assertListEqual(list(paginator.page(2)), self.ordered[5:10])
+
+    def test_keyset_paginate(self):
+        page = keyset_paginate(self.queryset, per_page=10, ordering=('date', 'pk'), uid='foo')
+        self.assertIsInstance(page, Page)
+        self.assertListEqual(list(page), self.ordered[:10])
+
+        page = keyset_paginate(self.queryset, per_page=10, page_number=2, ordering=('date', 'pk'), uid='foo')
+        self.assertListEqual(list(page), self.ordered[10:20])
+
+        # invalid page
+        self.assertRaises(Http404, keyset_paginate,
+                          self.queryset, per_page=10, page_number=99, ordering=('date', 'pk'), uid='foo')
+
+        # empty first page
+        page = keyset_paginate(self.queryset.none(), per_page=10, ordering=('date', 'pk'), uid='bar')
+        self.assertListEqual(list(page), [])
+
+
+class UtilsSeekPaginatorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = utils.create_user()
+        self.topic = utils.create_topic(utils.create_category())
+        date = timezone.now()
+
+        for i in range(45):
+            utils.create_comment(user=self.user, topic=self.topic,
+                                 date=date - datetime.timedelta(minutes=i % 5))
+
+        self.queryset = Comment.objects.filter(topic=self.topic)
+        self.ordered = list(self.queryset.order_by('-date', '-pk'))
+
+    def paginator(self, **kwargs):
+        return SeekPaginator(self.queryset, per_page=10, ordering=('-date', '-pk'), uid='foo', **kwargs)
+
+    @override_settings(ST_YT_PAGINATOR_PAGE_RANGE=1)
+    def test_seek_paginator_page(self):
+        """
+        Should seek from the page anchor
+        """
+        page = self.paginator().page(1)
+        self.assertListEqual(list(page), self.ordered[:10])
+        self.assertEqual(page.num_pages, 3)
+        self.assertEqual(list(page.page_range), [1, 2, 3])
+
+        page = self.paginator().page(4)
+        self.assertListEqual(list(page), self.ordered[30:40])
+        self.assertEqual(page.num_pages, 5)
+        self.assertEqual(list(page.page_range), [3, 4, 5])
+
+        page = self.paginator().page(5)
+        self.assertListEqual(list(page), self.ordered[40:])
+        self.assertRaises(InvalidPage, self.paginator().page, 6)
+
+    @override_settings(ST_YT_PAGINATOR_PAGE_RANGE=1)
+    def test_seek_paginator_window(self):
+        """
+        Should render the page strip from the cached window
+        """
+        with self.assertNumQueries(2):
+            page = self.paginator().page(2)
+            self.assertListEqual(list(page), self.ordered[10:20])
+            self.assertEqual(page.num_pages, 4)
+
+        with self.assertNumQueries(1):
+            page = self.paginator().page(3)
+            self.assertListEqual(list(page), self.ordered[20:30])
+            self.assertEqual(page.num_pages, 5)
+
+        with self.assertNumQueries(1):
+            page = self.paginator().page(5)
+            self.assertListEqual(list(page), self.ordered[40:])
+            self.assertEqual(page.num_pages, 5)
+
+    def test_seek_paginator_cursor(self):
+        """
+        Should go to the next and previous pages
+        """
+        page = self.paginator().page(1)
+        page = self.paginator(cursor=page.next_cursor).page(1)
+        self.assertEqual(page.number, 2)
+        self.assertListEqual(list(page), self.ordered[10:20])
+
+        page = self.paginator(cursor=page.next_cursor).page(1)
+        self.assertEqual(page.number, 3)
+        self.assertListEqual(list(page), self.ordered[20:30])
+
+        page = self.paginator(cursor=page.previous_cursor).page(1)
+        self.assertEqual(page.number, 2)
+        self.assertListEqual(list(page), self.ordered[10:20])
+
+        page = self.paginator(cursor=page.previous_cursor).page(1)
+        self.assertEqual(page.number, 1)
+        self.assertListEqual(list(page), self.ordered[:10])
+
+    def test_seek_paginator_cursor_invalid(self):
+        """
+        Should raise InvalidPage
+        """
+        self.assertRaises(InvalidPage, self.paginator(cursor='foo').page, 1)
+        self.assertRaises(InvalidPage, self.paginator(cursor='W10').page, 1)
+
+        page = self.paginator().page(5)
+        self.assertRaises(InvalidPage, self.paginator(cursor=page.next_cursor).page, 1)
+
+    def test_seek_paginate(self):
+        page = seek_paginate(self.queryset, per_page=10, ordering=('-date', '-pk'), uid='foo')
+        self.assertIsInstance(page, SeekPage)
+        self.assertListEqual(list(page), self.ordered[:10])
+
+        page = seek_paginate(self.queryset, per_page=10, page_number=2, ordering=('-date', '-pk'), uid='foo')
+        self.assertListEqual(list(page), self.ordered[10:20])
+
+        # invalid page and cursor
+        self.assertRaises(Http404, seek_paginate,
+                          self.queryset, per_page=10, page_number=99, ordering=('-date', '-pk'), uid='foo')
+        self.assertRaises(Http404, seek_paginate,
+                          self.queryset, per_page=10, ordering=('-date', '-pk'), uid='foo', cursor='foo')
+
+        # empty first page
+        page = seek_paginate(self.queryset.none(), per_page=10, ordering=('-date', '-pk'), uid='bar')
+        self.assertListEqual(list(page), [])
+        self.assertEqual(page.num_pages, 0)
+
+    def test_render_seek_paginator(self):
+        def mock_render(template, context):
+            return template, context
+
+        req = RequestFactory().get('/?cursor=foo&extra=foo')
+        context = {'request': req, }
+        page = self.paginator().page(1)
+
+        org_render, ttag_paginator.render_to_string = ttag_paginator.render_to_string, mock_render
+        try:
+            template, context2 = render_paginator(context, page)
+            self.assertDictEqual(context2, {"page": page,
+                                            "page_var": 'page',
+                                            "cursor_var": 'cursor',
+                                            "hashtag": '',
+                                            "extra_query": '&extra=foo'})
+            self.assertEqual(template, "spirit/utils/paginator/_seek_paginator.html")
+        finally:
+            ttag_paginator.render_to_string = org_render
+
+
 class UtilsYTPaginatorTemplateTagsTests(TestCase):
 
     def setUp(self):
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .. import tasks
+from ..models import CounterFlush
+
+__all__ = ['incr', 'flush', 'add_pending']
+
+# Deltas are accumulated in the cache within time
+# buckets, a bucket gets flushed once it's closed
+_next_flush = 0
+
+
+def _get_cache():
+    return caches[settings.ST_COUNTER_BUFFER_CACHE]
+
+
+def _make_key(*parts):
+    return ':'.join(
+        [settings.ST_COUNTER_BUFFER_CACHE_PREFIX, ] +
+        [str(part) for part in parts]
+    )
+
+
+def _get_bucket():
+    return int(time.time() // settings.ST_COUNTER_BUFFER_INTERVAL)
+
+
+def _get_max_buckets():
+    return settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT // settings.ST_COUNTER_BUFFER_INTERVAL
+
+
+def _get_target(model, field, pk):
+    return '%s.%s.%s' % (model._meta.app_label, model._meta.model_name, field), pk
+
+
+def _register(cache, bucket, target):
+    # Keeps track of the counters changed in the bucket
+    timeout = settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT
+    count_key = _make_key(bucket, 'count')
+
+    if cache.add(count_key, 1, timeout=timeout):
+        number = 1
+    else:
+        number = cache.incr(count_key)
+
+    cache.set(_make_key(bucket, 'slot', number), target, timeout=timeout)
+
+
+def _flush_maybe():
+    global _next_flush
+
+    now = time.time()
+
+    if now < _next_flush:
+        return
+
+    _next_flush = now + settings.ST_COUNTER_BUFFER_INTERVAL
+    tasks.flush_counters.delay()
+
+
+def incr(model, pk, field, delta=1):
+    """
+    Adds the delta to the counter field of the
+    model instance. The change is buffered when
+    ST_COUNTER_BUFFER_ENABLE is True
+    """
+    if not settings.ST_COUNTER_BUFFER_ENABLE:
+        model.objects\
+            .filter(pk=pk)\
+            .update(**{field: F(field) + delta})
+        return
+
+    cache = _get_cache()
+    bucket = _get_bucket()
+    target = _get_target(model, field, pk)
+    key = _make_key(bucket, 'delta', *target)
+
+    if cache.add(key, delta, timeout=settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT):
+        _register(cache, bucket, target)
+    else:
+        try:
+            cache.incr(key, delta)
+        except ValueError:  # Expired in between
+            cache.set(key, delta, timeout=settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT)
+            _register(cache, bucket, target)
+
+    _flush_maybe()
+
+
+def _save(deltas):
+    # Counters changed by the same
+    # delta are updated at once
+    pks_by_change = defaultdict(list)
+
+    for (field_path, pk), delta in deltas.items():
+        if delta:
+            pks_by_change[(field_path, delta)].append(pk)
+
+    for (field_path, delta), pks in sorted(pks_by_change.items()):
+        label, field = field_path.rsplit('.', 1)
+        apps.get_model(label).objects\
+            .filter(pk__in=pks)\
+            .update(**{field: F(field) + delta})
+
+
+def _flush_bucket(cache, bucket, state):
+    count = cache.get(_make_key(bucket, 'count'))
+
+    if not count:
+        return 0
+
+    slot_keys = [_make_key(bucket, 'slot', number) for number in range(1, count + 1)]
+    targets = set(cache.get_many(slot_keys).values())
+    delta_keys = {_make_key(bucket, 'delta', *target): target for target in targets}
+    deltas = {
+        delta_keys[key]: delta
+        for key, delta in cache.get_many(list(delta_keys.keys())).items()
+    }
+
+    # Pending counts leave the bucket out
+    # from now on, so it's never added twice
+    cache.set(_make_key('flushed'), bucket, timeout=settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT)
+
+    # The bucket is marked as saved within the
+    # same transaction, so it can't be saved twice
+    with transaction.atomic():
+        is_saved = CounterFlush.objects\
+            .filter(pk=state.pk, bucket__lt=bucket)\
+            .update(bucket=bucket)
+
+        if not is_saved:
+            return 0
+
+        _save(deltas)
+
+    state.bucket = bucket
+
+    cache.delete_many(slot_keys + list(delta_keys.keys()) + [_make_key(bucket, 'count'), ])
+    return len(deltas)
+
+
+def flush():
+    """
+    Saves the buffered deltas of the closed buckets.
+    The current and previous buckets may still
+    be receiving deltas, so those are left out.
+    Returns the number of updated counters
+    """
+    cache = _get_cache()
+    lock_key = _make_key('lock')
+
+    if not cache.add(lock_key, 1, timeout=settings.ST_COUNTER_BUFFER_INTERVAL * 10):
+        return 0  # Already flushing
+
+    try:
+        state, _ = CounterFlush.objects.get_or_create(pk=1)
+        last_bucket = _get_bucket() - 2
+        # Older buckets have expired already
+        flushed_bucket = max(state.bucket, last_bucket - _get_max_buckets())
+        flushed_count = 0
+
+        for bucket in range(flushed_bucket + 1, last_bucket + 1):
+            flushed_count += _flush_bucket(cache, bucket, state)
+
+        if state.bucket < last_bucket:
+            CounterFlush.objects\
+                .filter(pk=state.pk, bucket__lt=last_bucket)\
+                .update(bucket=last_bucket)
+
+        cache.set(_make_key('flushed'), last_bucket, timeout=settings.ST_COUNTER_BUFFER_CACHE_TIMEOUT)
+        return flushed_count
+    finally:
+        cache.delete(lock_key)
+
+
+def add_pending(objects, field):
+    """
+    Adds the buffered deltas to the counter
+    field of the model instances, so the displayed
+    count is close to the real one
+    """
+    if not settings.ST_COUNTER_BUFFER_ENABLE:
+        return
+
+    objects = list(objects)
+
+    if not objects:
+        return
+
+    cache = _get_cache()
+    current_bucket = _get_bucket()
+    flushed_bucket = cache.get(_make_key('flushed'))
+
+    if flushed_bucket is None:
+        flushed_bucket = current_bucket - 3
+
+    model = objects[0].__class__
+    keys = {
+        _make_key(bucket, 'delta', *_get_target(model, field, obj.pk)): obj
+        for bucket in range(flushed_bucket + 1, current_bucket + 1)
+        for obj in objects
+    }
+
+    for key, delta in cache.get_many(list(keys.keys())).items():
+        obj = keys[key]
+        setattr(obj, field, getattr(obj, field) + delta)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import sqlite3
+
+from django.db import connections, transaction, IntegrityError, router
+
+__all__ = ['upsert', 'update_many']
+
+
+def _can_upsert(connection):
+    if connection.vendor == 'postgresql':
+        return connection.pg_version >= 90500
+
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 24, 0)
+
+    return False
+
+
+def _upsert_sql(model, lookup, values, connection):
+    qn = connection.ops.quote_name
+    opts = model._meta
+    obj = model(**dict(lookup, **values))
+    fields = [
+        field
+        for field in opts.concrete_fields
+        if not field.primary_key or field.attname in lookup
+    ]
+    params = [
+        field.get_db_prep_save(field.pre_save(obj, True), connection=connection)
+        for field in fields
+    ]
+    lookup_columns = [qn(opts.get_field(name).column) for name in lookup]
+    value_columns = [qn(opts.get_field(name).column) for name in values]
+
+    if connection.vendor == 'postgresql':
+        distinct = 'IS DISTINCT FROM'
+    else:
+        distinct = 'IS NOT'
+
+    sql = (
+        'INSERT INTO %(table)s (%(columns)s) VALUES (%(values)s) '
+        'ON CONFLICT (%(lookup)s) DO UPDATE SET %(updates)s '
+        'WHERE %(changed)s' % {
+            'table': qn(opts.db_table),
+            'columns': ', '.join(qn(field.column) for field in fields),
+            'values': ', '.join(['%s'] * len(fields)),
+            'lookup': ', '.join(lookup_columns),
+            'updates': ', '.join(
+                '%(column)s = excluded.%(column)s' % {'column': column}
+                for column in value_columns
+            ),
+            'changed': ' OR '.join(
+                '%(table)s.%(column)s %(distinct)s excluded.%(column)s' % {
+                    'table': qn(opts.db_table),
+                    'column': column,
+                    'distinct': distinct
+                }
+                for column in value_columns
+            )
+        }
+    )
+    return sql, params
+
+
+def upsert(model, lookup, values):
+    """
+    Creates the row or updates the given values.
+    *lookup* must match a unique constraint.
+
+    On PostgreSQL and SQLite this is a single
+    "INSERT ... ON CONFLICT" that won't write
+    the row if the values are already set.
+    The new row takes the fields default values.
+    Returns 0 when the row was left untouched
+    """
+    connection = connections[router.db_for_write(model)]
+
+    if _can_upsert(connection):
+        sql, params = _upsert_sql(model, lookup, values, connection)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    rows = model.objects.filter(**lookup)
+
+    if rows.exclude(**values).update(**values):
+        return 1
+
+    if rows.exists():
+        return 0
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**dict(lookup, **values))
+    except IntegrityError:  # Created concurrently
+        return rows.update(**values)
+
+    return 1
+
+
+def update_many(model, changes):
+    """
+    Updates the {pk: {field: value}} *changes*.
+    The rows sharing the same changes are
+    updated at once, in a single query
+    """
+    pks_by_values = {}
+
+    for pk, values in changes.items():
+        key = tuple(sorted(values.items()))
+        pks_by_values.setdefault(key, []).append(pk)
+
+    for values, pks in pks_by_values.items():
+        model.objects\
+            .filter(pk__in=pks)\
+            .update(**dict(values))
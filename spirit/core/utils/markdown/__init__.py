@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from .markdown import Markdown
+from .markdown import Markdown, get_markdown
 from .utils.quote import quotify
 
-__all__ = ['Markdown', 'quotify']
\ No newline at end of file
+__all__ = ['Markdown', 'get_markdown', 'quotify']
\ No newline at end of file
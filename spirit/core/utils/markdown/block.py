@@ -9,6 +9,10 @@ import mistune
 
 from .parsers.poll import PollParser
 
+# The links must take the whole line, checking this first
+# makes the rules fail early, without trying each "/" and "."
+URL_LINE = r'^(?=https?://[^\s]+(?:\n|$))'
+
 
 class BlockGrammar(mistune.BlockGrammar):
 
@@ -19,20 +23,23 @@ class BlockGrammar(mistune.BlockGrammar):
     #)
 
     audio_link = re.compile(
-        r'^https?://[^\s]+\.(mp3|ogg|wav)'
+        URL_LINE +
+        r'https?://[^\s]+\.(mp3|ogg|wav)'
         r'(\?[^\s]+)?'
         r'(?:\n+|$)'
     )
 
     image_link = re.compile(
-        r'^https?://[^\s]+/(?P<image_name>[^\s]+)\.'
+        URL_LINE +
+        r'https?://[^\s]+/(?P<image_name>[^\s/]+)\.'
         r'(?P<extension>png|jpg|jpeg|gif|bmp|tif|tiff)'
         r'(\?[^\s]+)?'
         r'(?:\n+|$)'
     )
 
     video_link = re.compile(
-        r'^https?://[^\s]+\.(mov|mp4|webm|ogv)'
+        URL_LINE +
+        r'https?://[^\s]+\.(mov|mp4|webm|ogv)'
         r'(\?[^\s]+)?'
         r'(?:\n+|$)'
     )
@@ -62,7 +69,7 @@ class BlockGrammar(mistune.BlockGrammar):
         r'^https?://(www\.|player\.)?'
         r'vimeo\.com/'
         r'(channels/'
-        r'|groups/[^/]+/videos/'
+        r'|groups/[^/\s]+/videos/'
         r'|album/(\d+)/video/'
         r'|video/)?'
         r'(?P<id>\d+)'
@@ -76,6 +83,10 @@ class BlockGrammar(mistune.BlockGrammar):
     # 1. opt 1
     # 2. opt 2
     # [/poll]
+    #
+    # Each choice takes one line, the choices must not
+    # be matched in more than one way, or a failed match
+    # would backtrack through every combination of them
     poll = re.compile(
         r'^(?:\[poll'
         r'((?:\s+name=(?P<name>[\w\-_]+))'
@@ -83,10 +94,10 @@ class BlockGrammar(mistune.BlockGrammar):
         r'(?:\s+max=(?P<max>\d+))?'
         r'(?:\s+close=(?P<close>\d+)d)?'
         r'(?:\s+mode=(?P<mode>(default|secret)))?'
-        r'|(?P<invalid_params>[^\]]*))'
+        r'|(?P<invalid_params>[^\]\n]*))'
         r'\])\n'
-        r'((?:#\s*(?P<title>[^\n]+\n))?'
-        r'(?P<choices>(?:\d+\.\s*[^\n]+\n){2,})'
+        r'((?:#(?P<title>[^\n]+\n))?'
+        r'(?P<choices>(?:\d+\.[^\n]+\n){2,})'
         r'|(?P<invalid_body>(?:[^\n]+\n)*))'
         r'(?:\[/poll\])'
     )
@@ -108,6 +119,12 @@ class BlockLexer(mistune.BlockLexer):
 
         super(BlockLexer, self).__init__(rules=rules, **kwargs)
 
+        self.reset()
+
+    def reset(self):
+        self.tokens = []
+        self.def_links = {}
+        self.def_footnotes = {}
         self.polls = {'polls': [], 'choices': []}
 
     def parse_audio_link(self, m):
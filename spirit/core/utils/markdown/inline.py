@@ -3,23 +3,19 @@
 from __future__ import unicode_literals
 import re
 import copy
-import os
 
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.contrib.staticfiles.storage import staticfiles_storage
 
 import mistune
 
-from .utils.emoji import emojis
-
-User = get_user_model()
+from .utils import emoji
+from .utils import mention
 
 
 class InlineGrammar(mistune.InlineGrammar):
 
     emoji = re.compile(
-        r'^:(?P<emoji>[A-Za-z0-9_\-\+]+?):'
+        r'^:(?P<emoji>[A-Za-z0-9_\-\+]+):'
     )
 
     mention = re.compile(
@@ -30,9 +26,11 @@ class InlineGrammar(mistune.InlineGrammar):
     # Override
     def hard_wrap(self):
         # Adds ":" and "@" as an invalid text character, so we can match emojis and mentions.
+        # The spaces before a new line are only matched from the first one of them,
+        # otherwise a long run of spaces gets scanned again on every position
         self.linebreak = re.compile(r'^ *\n(?!\s*$)')
         self.text = re.compile(
-            r'^[\s\S]+?(?=[\\<!\[_*`:@~]|https?://| *\n|$)'
+            r'^[\s\S]+?(?=[\\<!\[_*`:@~]|https?://|(?:(?<! )|(?<=^ )) *\n|$)'
         )
 
 
@@ -48,19 +46,45 @@ class InlineLexer(mistune.InlineLexer):
 
         super(InlineLexer, self).__init__(renderer, rules, **kwargs)
 
+        self.reset()
+
+    def reset(self):
+        self.links = {}
+        self.footnotes = {}
+        self.footnote_index = 0
+        self._in_link = False
+        self._in_footnote = False
         self.mentions = {}
         self._mention_count = 0
+        self._mention_users = {}
+
+    def _load_mentions(self, usernames):
+        usernames = [u for u in usernames if u not in self._mention_users]
+
+        if not usernames:
+            return
+
+        users = mention.get_users(usernames)
+
+        for username in usernames:
+            self._mention_users[username] = users.get(username)
+
+    def load_mentions(self, text):
+        """
+        Resolves the mentions in a single query,
+        this must be called before parsing the text
+        """
+        self._load_mentions(mention.get_candidates(
+            text,
+            limit=settings.ST_MENTIONS_PER_COMMENT
+        ))
 
     def output_emoji(self, m):
-        emoji = m.group('emoji')
+        path = emoji.get_urls().get(m.group('emoji'))
 
-        if emoji not in emojis:
+        if path is None:
             return m.group(0)
 
-        image = emoji + '.png'
-        rel_path = os.path.join('spirit', 'emojis', image).replace('\\', '/')
-        path = staticfiles_storage.url(rel_path)
-
         return self.renderer.emoji(path)
 
     def output_mention(self, m):
@@ -68,23 +92,22 @@ class InlineLexer(mistune.InlineLexer):
 
         # Already mentioned?
         if username in self.mentions:
-            user = self.mentions[username]
-            return self.renderer.mention(username, user.st.get_absolute_url())
+            _, url = self._mention_users[username]
+            return self.renderer.mention(username, url)
 
         # Mentions limiter
         if self._mention_count >= settings.ST_MENTIONS_PER_COMMENT:
             return m.group(0)
 
-        # We increase this before doing the query to avoid abuses
         self._mention_count += 1
 
-        # New mention
-        try:
-            user = User.objects\
-                .select_related('st')\
-                .get(username=username)
-        except User.DoesNotExist:
+        # New mention, it should've been loaded already
+        self._load_mentions([username])
+        user_and_url = self._mention_users[username]
+
+        if user_and_url is None:
             return m.group(0)
 
+        user, url = user_and_url
         self.mentions[username] = user
-        return self.renderer.mention(username, user.st.get_absolute_url())
+        return self.renderer.mention(username, url)
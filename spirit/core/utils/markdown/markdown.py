@@ -2,6 +2,8 @@
 
 from __future__ import unicode_literals
 
+import threading
+
 import mistune
 
 from .block import BlockLexer
@@ -23,7 +25,19 @@ class Markdown(mistune.Markdown):
 
         super(Markdown, self).__init__(renderer=renderer, **kwargs)
 
+    def reset(self):
+        """
+        Clear the state left by the previous render,
+        the grammars and options are kept
+        """
+        self.tokens = []
+        self.footnotes = []
+        self.block.reset()
+        self.inline.reset()
+
     def render(self, text):
+        self.reset()
+        self.inline.load_mentions(text)
         return super(Markdown, self).render(text).strip()
 
     def get_mentions(self):
@@ -54,3 +68,19 @@ class Markdown(mistune.Markdown):
             return self.renderer.poll_raw(poll_txt=self.token['raw'])
         else:
             return self.renderer.poll(name=name)
+
+
+_local = threading.local()
+
+
+def get_markdown():
+    """
+    Return the comments renderer of the current
+    thread. It's built once and reused, since
+    building it compiles the grammars
+    """
+    try:
+        return _local.markdown
+    except AttributeError:
+        _local.markdown = Markdown(escape=True, hard_wrap=True)
+        return _local.markdown
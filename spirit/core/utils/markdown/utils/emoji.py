@@ -2,6 +2,10 @@
 
 from __future__ import unicode_literals
 
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
 
 emojis = {
     "+1", "-1", "100", "1234", "8ball", "a", "ab", "abc", "abcd", "accept", "aerial_tramway", "airplane",
@@ -114,3 +118,29 @@ emojis = {
     "wink", "wolf", "woman", "womans_clothes", "womans_hat", "womens", "worried", "wrench", "x", "yellow_heart",
     "yen", "yum", "zap", "zero", "zzz",
 }
+
+_urls = None
+
+
+def get_urls():
+    """
+    Return the {emoji: url} of every emoji, the urls
+    are built once since the manifest storage does
+    some hashing work on each lookup
+    """
+    global _urls
+
+    if _urls is None:
+        _urls = {
+            emoji: staticfiles_storage.url('spirit/emojis/%s.png' % emoji)
+            for emoji in emojis}
+
+    return _urls
+
+
+@receiver(setting_changed)
+def _reset_urls(setting, **kwargs):
+    global _urls
+
+    if setting in ('STATIC_URL', 'STATICFILES_STORAGE'):
+        _urls = None
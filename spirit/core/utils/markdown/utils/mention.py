@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import re
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+__all__ = ['get_candidates', 'get_users', 'invalidate']
+
+
+# Unanchored version of InlineGrammar.mention
+CANDIDATE = re.compile(r'@(?P<username>[\w.@+-]+)', flags=re.UNICODE)
+
+_NOT_FOUND = ()
+
+
+def _make_cache_key(username):
+    key_hash = hashlib.sha1(username.encode('utf-8')).hexdigest()
+    return '%s:%s' % (settings.ST_MENTIONS_CACHE_PREFIX, key_hash)
+
+
+def _get_cache():
+    return caches[settings.ST_MENTIONS_CACHE]
+
+
+def invalidate(username):
+    """
+    Must be called when a user
+    gets created, renamed or deleted
+    """
+    _get_cache().delete(_make_cache_key(username))
+
+
+def get_candidates(text, limit):
+    """
+    Returns the first *limit* distinct
+    usernames mentioned in the text
+    """
+    usernames = []
+
+    for m in CANDIDATE.finditer(text):
+        username = m.group('username')
+
+        if username in usernames:
+            continue
+
+        if len(usernames) >= limit:
+            break
+
+        usernames.append(username)
+
+    return usernames
+
+
+def get_users(usernames):
+    """
+    Returns a dict of {username: (user, profile url)}
+    for the existing users. Cached users are not
+    fetched, the rest are fetched in a single query
+
+    Users taken from the cache only contain
+    the *pk* and the *username* fields
+    """
+    cache = _get_cache()
+    keys = {_make_cache_key(username): username for username in usernames}
+    cached = cache.get_many(list(keys.keys()))
+    users = {}
+
+    for key, value in cached.items():
+        if value == _NOT_FOUND:
+            continue
+
+        username = keys[key]
+        pk, url = value
+        users[username] = (User(pk=pk, username=username), url)
+
+    missing = [
+        username
+        for key, username in keys.items()
+        if key not in cached
+    ]
+
+    if not missing:
+        return users
+
+    fetched = User.objects\
+        .select_related('st')\
+        .filter(username__in=missing)
+    fetched = {
+        user.username: (user, user.st.get_absolute_url())
+        for user in fetched
+    }
+    users.update(fetched)
+
+    # Not found users are cached as well
+    values = {_make_cache_key(username): _NOT_FOUND for username in missing}
+    values.update({
+        _make_cache_key(username): (user.pk, url)
+        for username, (user, url) in fetched.items()
+    })
+    cache.set_many(values, timeout=settings.ST_MENTIONS_CACHE_TIMEOUT)
+
+    return users
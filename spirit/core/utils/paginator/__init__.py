@@ -7,6 +7,8 @@ from django.http import Http404
 from django.utils.http import urlencode
 
 from .yt_paginator import YTPaginator, YTPage
+from .keyset_paginator import KeysetPaginator
+from .seek_paginator import SeekPaginator
 
 
 def get_page_number(obj_number, per_page):
@@ -28,9 +30,9 @@ def get_url(url, obj_number, per_page, page_var):
     return "".join((url, '?', data, '#c', str(obj_number)))
 
 
-def _paginate(paginator_class, object_list, per_page=15, page_number=None):
+def _paginate(paginator_class, object_list, per_page=15, page_number=None, **kwargs):
     page_number = page_number or 1
-    paginator = paginator_class(object_list, per_page)
+    paginator = paginator_class(object_list, per_page, **kwargs)
 
     try:
         return paginator.page(page_number)
@@ -43,4 +45,12 @@ def paginate(*args, **kwargs):
 
 
 def yt_paginate(*args, **kwargs):
-    return _paginate(YTPaginator, *args, **kwargs)
\ No newline at end of file
+    return _paginate(YTPaginator, *args, **kwargs)
+
+
+def keyset_paginate(*args, **kwargs):
+    return _paginate(KeysetPaginator, *args, **kwargs)
+
+
+def seek_paginate(*args, **kwargs):
+    return _paginate(SeekPaginator, *args, **kwargs)
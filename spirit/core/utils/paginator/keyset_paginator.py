@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.paginator import Paginator, Page
+from django.core.cache import caches
+from django.db.models import Q
+from django.conf import settings
+
+
+def _make_cache_key(uid):
+    key_hash = hashlib.sha1(uid.encode('utf-8')).hexdigest()
+    return '%s:%s' % (settings.ST_PAGINATOR_CACHE_PREFIX, key_hash)
+
+
+def _get_cache():
+    return caches[settings.ST_PAGINATOR_CACHE]
+
+
+def seek(object_list, ordering, key, inclusive=True, reverse=False):
+    """
+    Filters the rows placed after the given key,
+    or before it when *reverse* is True. The key
+    contains a value per ordering field
+    """
+    # Builds the WHERE clause: (a > x) OR (a = x AND b > y) ...
+    fields = [f.lstrip('-') for f in ordering]
+    query = Q()
+
+    for i, order in enumerate(ordering):
+        lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+        filters = dict(zip(fields[:i], key[:i]))
+        filters['%s__%s' % (fields[i], lookup)] = key[i]
+        query |= Q(**filters)
+
+    if inclusive:
+        query |= Q(**dict(zip(fields, key)))
+
+    return object_list.filter(query)
+
+
+def invalidate(uid):
+    """
+    Drops the cached index of page boundaries,
+    this must be called when rows are inserted
+    in the middle of the list or moved out of it
+    """
+    _get_cache().delete(_make_cache_key(uid))
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginates an ordered queryset by seeking on
+    the order fields instead of doing an OFFSET.
+
+    The first key of every page is kept in a cached
+    index, so ?page=N maps to a "WHERE key >= anchor"
+    query and the count comes from the index. The last
+    page is scanned again on every request, so new rows
+    landing there are added to the index incrementally,
+    even if they were committed out of order. Anything
+    else requires calling invalidate().
+
+    The ordering must be unique, hence it should
+    end with the primary key. ie: ('date', 'pk')
+    """
+
+    def __init__(self, object_list, per_page, ordering, uid, **kwargs):
+        super(KeysetPaginator, self).__init__(
+            object_list.order_by(*ordering),
+            per_page,
+            **kwargs
+        )
+        self.ordering = ordering
+        self.fields = [f.lstrip('-') for f in ordering]
+        self.uid = uid
+        self._index = None
+
+    def _seek(self, key, inclusive=True):
+        return seek(self.object_list, self.ordering, key, inclusive=inclusive)
+
+    def _update_index(self, index):
+        # Rows may get committed after the ones
+        # placed after them (ie: concurrent posts),
+        # so the last page is scanned from its anchor
+        rows = self.object_list
+        old_index = dict(index, anchors=list(index['anchors']))
+
+        if index['anchors']:
+            rows = self._seek(index['anchors'].pop())
+            index['count'] = len(index['anchors']) * self.per_page
+
+        rows = rows\
+            .prefetch_related(None)\
+            .values_list(*self.fields)
+
+        for key in rows.iterator():
+            if not index['count'] % self.per_page:
+                index['anchors'].append(key)
+
+            index['count'] += 1
+
+        return index != old_index
+
+    def _get_index(self):
+        if self._index is not None:
+            return self._index
+
+        cache = _get_cache()
+        cache_key = _make_cache_key(self.uid)
+        index = cache.get(cache_key)
+
+        if index is None or index['per_page'] != self.per_page:
+            index = {
+                'per_page': self.per_page,
+                'anchors': [],
+                'count': 0
+            }
+
+        if self._update_index(index):
+            cache.set(cache_key, index, timeout=settings.ST_PAGINATOR_CACHE_TIMEOUT)
+
+        self._index = index
+        return self._index
+
+    def _get_count(self):
+        if self._count is None:
+            self._count = self._get_index()['count']
+
+        return self._count
+    count = property(_get_count)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        anchors = self._get_index()['anchors']
+        object_list = self.object_list
+
+        if anchors:
+            object_list = self._seek(anchors[number - 1])
+
+        return Page(object_list[:self.per_page], number, self)
+
+
+__all__ = ['KeysetPaginator', 'seek', 'invalidate']
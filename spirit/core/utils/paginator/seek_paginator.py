@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import base64
+import hashlib
+import datetime
+
+from django.core.paginator import InvalidPage
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.utils.encoding import force_bytes, force_text
+from django.conf import settings
+
+from .yt_paginator import YTPaginator, YTPage
+from .keyset_paginator import seek
+
+
+def _make_cache_key(uid):
+    key_hash = hashlib.sha1(uid.encode('utf-8')).hexdigest()
+    return '%s:seek:%s' % (settings.ST_PAGINATOR_CACHE_PREFIX, key_hash)
+
+
+def _get_cache():
+    return caches[settings.ST_PAGINATOR_CACHE]
+
+
+class SeekPaginator(YTPaginator):
+    """
+    YTPaginator that seeks on the order fields
+    instead of doing an OFFSET.
+
+    The first key of the pages next to the current
+    one are kept in a short-lived cached window, so
+    ?page=N maps to a "WHERE key >= anchor" query
+    and the page strip is rendered from the window.
+    The previous and next pages are linked
+    through opaque cursors holding the boundary key.
+
+    The first page is always fresh, the other
+    pages may drift while the window lives,
+    just like offsets do as the rows move.
+
+    The ordering must be unique, hence it should
+    end with the primary key. ie: ('-date', '-pk')
+    """
+
+    def __init__(self, object_list, per_page, ordering, uid, cursor=None, **kwargs):
+        super(SeekPaginator, self).__init__(
+            object_list.order_by(*ordering),
+            per_page,
+            **kwargs
+        )
+        self.ordering = ordering
+        self.fields = [f.lstrip('-') for f in ordering]
+        self.uid = uid
+        self.cursor = cursor
+        self.max_pages = settings.ST_YT_PAGINATOR_PAGE_RANGE * 2 + 1
+        self._window = None
+
+    def get_key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def _get_field(self, name):
+        opts = self.object_list.model._meta
+
+        if name == 'pk':
+            return opts.pk
+
+        return opts.get_field(name)
+
+    def encode_cursor(self, number, key, reverse=False):
+        key = [
+            value.isoformat() if isinstance(value, datetime.datetime) else value
+            for value in key
+        ]
+        cursor = base64.urlsafe_b64encode(force_bytes(json.dumps([number, reverse, key])))
+        return force_text(cursor).rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            cursor = force_bytes(cursor)
+            data = base64.urlsafe_b64decode(cursor + b'=' * (-len(cursor) % 4))
+            number, reverse, key = json.loads(force_text(data))
+            number = self.validate_number(number)
+
+            if len(key) != len(self.fields):
+                raise ValueError
+
+            key = tuple(
+                self._get_field(field).to_python(value)
+                for field, value in zip(self.fields, key)
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidPage("That cursor is not valid")
+
+        return number, key, bool(reverse)
+
+    def _get_window(self):
+        if self._window is not None:
+            return self._window
+
+        window = _get_cache().get(_make_cache_key(self.uid))
+
+        if window is None or window['per_page'] != self.per_page:
+            window = {
+                'per_page': self.per_page,
+                'anchors': {},
+                'last_page': None
+            }
+
+        self._window = window
+        return self._window
+
+    def _save_window(self):
+        _get_cache().set(
+            _make_cache_key(self.uid),
+            self._get_window(),
+            timeout=settings.ST_SEEK_PAGINATOR_CACHE_TIMEOUT
+        )
+
+    def _get_last_page(self, number):
+        last_page = number + self.max_pages - 1
+        window_last_page = self._get_window()['last_page']
+
+        if window_last_page is not None:
+            last_page = min(last_page, window_last_page)
+
+        return last_page
+
+    def _is_loaded(self, number):
+        anchors = self._get_window()['anchors']
+        return all(
+            page_number in anchors
+            for page_number in range(number, self._get_last_page(number) + 1)
+        )
+
+    def _load(self, number):
+        # Fetches the keys of the rows in the window
+        # starting at the given page, this will seek
+        # from the closest previous page known. The
+        # window is twice the page strip size, so the
+        # next pages are served from the cache too
+        window = self._get_window()
+        anchors = window['anchors']
+        known = [page_number for page_number in anchors if page_number <= number]
+        start = max(known or [1, ])
+        rows = self.object_list
+
+        if start > 1:
+            rows = seek(rows, self.ordering, anchors[start])
+
+        size = self.per_page * self.max_pages * 2
+        offset = (number - start) * self.per_page
+        limit = offset + size
+        keys = rows\
+            .prefetch_related(None)\
+            .values_list(*self.fields)[offset:limit]
+        keys = list(keys)
+
+        for i, key in enumerate(keys[::self.per_page]):
+            anchors[number + i] = key
+
+        if len(keys) < size:
+            window['last_page'] = number - 1 + (-len(keys) // self.per_page) * -1  # ceil
+            window['anchors'] = {
+                page_number: key
+                for page_number, key in anchors.items()
+                if page_number <= window['last_page']
+            }
+        elif window['last_page'] is not None and window['last_page'] < number + self.max_pages * 2:
+            window['last_page'] = None
+
+        self._save_window()
+
+    def get_num_pages(self, number):
+        """
+        Return the number of pages
+        relative to the given page
+        limited by max_pages
+        """
+        if not self._is_loaded(number):
+            self._load(number)
+
+        return max(0, self._get_last_page(number))
+
+    def _validate_page(self, number, object_list):
+        if not object_list and (number != 1 or not self.allow_empty_first_page):
+            raise InvalidPage("That page contains no results")
+
+    def _cursor_page(self):
+        number, key, reverse = self.decode_cursor(self.cursor)
+
+        if number == 1:
+            # The first page is always fresh
+            object_list = list(self.object_list[:self.per_page])
+        elif reverse:
+            object_list = seek(self.object_list, self.ordering, key, inclusive=False, reverse=True)\
+                .reverse()[:self.per_page]
+            object_list = list(reversed(object_list))
+        else:
+            object_list = seek(self.object_list, self.ordering, key, inclusive=False)[:self.per_page]
+            object_list = list(object_list)
+
+        self._validate_page(number, object_list)
+
+        if object_list:
+            anchors = self._get_window()['anchors']
+            anchor = self.get_key(object_list[0])
+
+            if anchors.get(number) != anchor:
+                anchors[number] = anchor
+                self._save_window()
+
+        return SeekPage(object_list, number, self)
+
+    def page(self, number):
+        """
+        Returns a Page object for the given
+        cursor or 1-based page number
+        """
+        if self.cursor:
+            return self._cursor_page()
+
+        number = self.validate_number(number)
+
+        if number > self.get_num_pages(number):
+            self._validate_page(number, [])
+
+        object_list = self.object_list
+
+        if number > 1:
+            object_list = seek(object_list, self.ordering, self._get_window()['anchors'][number])
+
+        return SeekPage(object_list[:self.per_page], number, self)
+
+
+class SeekPage(YTPage):
+
+    @property
+    def num_pages(self):
+        if self._num_pages is None:
+            self._num_pages = self.paginator.get_num_pages(self.number)
+
+        return self._num_pages
+
+    @property
+    def next_cursor(self):
+        if not len(self):
+            return
+
+        return self.paginator.encode_cursor(
+            self.number + 1,
+            self.paginator.get_key(self[len(self) - 1])
+        )
+
+    @property
+    def previous_cursor(self):
+        if not len(self):
+            return
+
+        return self.paginator.encode_cursor(
+            self.number - 1,
+            self.paginator.get_key(self[0]),
+            reverse=True
+        )
+
+
+__all__ = ['SeekPaginator', 'SeekPage']
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.apps import AppConfig
+
+
+class SpiritSearchConfig(AppConfig):
+
+    name = 'spirit.search'
+    verbose_name = "Spirit Search"
+    label = 'spirit_search'
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery, SearchNode
+from haystack.exceptions import SearchBackendError
+from haystack.inputs import BaseInput
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+
+from ..core.utils.db import upsert
+from .models import SearchDocument
+
+__all__ = ['DatabaseEngine']
+
+FIELDS = (
+    'text',
+    'title',
+    'topic_id',
+    'category_id',
+    'is_removed',
+    'is_category_removed',
+    'is_subcategory_removed'
+)
+
+# Filters matched against the full-text index
+TEXT_FIELDS = ('content', 'text')
+
+FTS_TABLE = 'spirit_search_searchdocument_fts'
+TEXT_VECTOR_COLUMN = 'text_vector'
+
+_has_fts_table = {}
+
+
+def _get_connection():
+    return connections[router.db_for_read(SearchDocument)]
+
+
+def _get_terms(value):
+    if isinstance(value, BaseInput):
+        value = value.query_string
+
+    return re.findall(r'\w+', value, flags=re.UNICODE)
+
+
+def _has_fts(connection):
+    # The FTS5 table is not created when
+    # sqlite was compiled without it
+    if connection.alias not in _has_fts_table:
+        _has_fts_table[connection.alias] = (
+            FTS_TABLE in connection.introspection.table_names())
+
+    return _has_fts_table[connection.alias]
+
+
+def _fulltext_sql(connection):
+    """
+    Return the (where, score) SQL templates matching
+    the terms param, or None if there is no full-text
+    index for the current database
+    """
+    qn = connection.ops.quote_name
+    opts = SearchDocument._meta
+    pk = '%s.%s' % (qn(opts.db_table), qn(opts.pk.column))
+
+    if connection.vendor == 'postgresql':
+        # Kept up to date by a trigger, see the migration
+        vector = '%s.%s' % (qn(opts.db_table), qn(TEXT_VECTOR_COLUMN))
+        query = "plainto_tsquery('%s', %%s)" % settings.ST_SEARCH_DATABASE_LANGUAGE
+        return (
+            '%s @@ %s' % (vector, query),
+            'ts_rank(%s, %s)' % (vector, query))
+
+    if connection.vendor == 'sqlite' and _has_fts(connection):
+        return (
+            '%s IN (SELECT rowid FROM %s WHERE %s MATCH %%s)' % (pk, FTS_TABLE, FTS_TABLE),
+            # Lower bm25 rank is better
+            '-(SELECT rank FROM %s WHERE %s MATCH %%s AND rowid = %s)' % (FTS_TABLE, FTS_TABLE, pk))
+
+    return None
+
+
+def _fulltext_param(connection, terms):
+    if connection.vendor == 'sqlite':
+        return ' '.join('"%s"' % term for term in terms)
+
+    return ' '.join(terms)
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Stores the prepared topics and comments in the
+    SearchDocument table. Text is matched through a GIN indexed
+    tsvector column on PostgreSQL and a FTS5 table
+    on SQLite, other databases fallback to LIKE queries
+    """
+
+    def update(self, index, iterable, commit=True):
+        for obj in iterable:
+            data = index.full_prepare(obj)
+            upsert(
+                model=SearchDocument,
+                lookup={'identifier': get_identifier(obj)},
+                values={field: data[field] for field in FIELDS})
+
+    def remove(self, obj_or_string, commit=True):
+        SearchDocument.objects\
+            .filter(identifier=get_identifier(obj_or_string))\
+            .delete()
+
+    def _models_q(self, models):
+        q = Q()
+
+        for model in models:
+            q |= Q(identifier__startswith='%s.' % get_model_ct(model))
+
+        return q
+
+    def clear(self, models=None, commit=True):
+        documents = SearchDocument.objects.all()
+
+        if models is not None:
+            documents = documents.filter(self._models_q(models))
+
+        documents.delete()
+
+    def _build_filter(self, field, filter_type, value):
+        if field not in FIELDS:
+            raise SearchBackendError("The field '%s' is not indexed." % field)
+
+        if isinstance(value, BaseInput):
+            value = value.query_string
+
+        if filter_type == 'contains':
+            if field == 'title':
+                return Q(title__icontains=value)
+
+            return Q(**{field: value})
+
+        if filter_type == 'exact':
+            return Q(**{field: value})
+
+        return Q(**{'%s__%s' % (field, filter_type): value})
+
+    def _build_q(self, node, terms, is_top=True):
+        """
+        Turn the haystack query into a Q, the text
+        terms are collected and matched separately,
+        so they are only supported within AND nodes
+        """
+        is_top = is_top and node.connector == SearchNode.AND and not node.negated
+        q = Q()
+
+        for child in node.children:
+            if isinstance(child, SearchNode):
+                child_q = self._build_q(child, terms, is_top=is_top)
+            else:
+                expression, value = child
+                field, filter_type = node.split_expression(expression)
+
+                if field in TEXT_FIELDS:
+                    if not is_top:
+                        raise SearchBackendError("Text can't be searched within OR/NOT queries.")
+
+                    terms.extend(_get_terms(value))
+                    continue
+
+                child_q = self._build_filter(field, filter_type, value)
+
+            if node.connector == SearchNode.OR:
+                q |= child_q
+            else:
+                q &= child_q
+
+        if node.negated:
+            q = ~q
+
+        return q
+
+    def search(self, query_string, sort_by=None, start_offset=0, end_offset=None,
+               models=None, result_class=None, **kwargs):
+        terms = []
+        documents = SearchDocument.objects.filter(self._build_q(query_string, terms))
+
+        if models:
+            documents = documents.filter(self._models_q(models))
+
+        order_by = list(sort_by or [])
+        score = None
+
+        for field in order_by:
+            if field.lstrip('-') not in FIELDS:
+                raise SearchBackendError("Can't order by the field '%s'." % field)
+
+        if terms:
+            connection = _get_connection()
+            fulltext = _fulltext_sql(connection)
+
+            if fulltext is None:
+                for term in terms:
+                    documents = documents.filter(text__icontains=term)
+            else:
+                where, score = fulltext
+                param = _fulltext_param(connection, terms)
+                documents = documents.extra(where=[where, ], params=[param, ])
+
+        hits = documents.count()
+
+        if score is None:
+            documents = documents\
+                .order_by(*(order_by + ['-topic_id', '-pk']))\
+                .values_list('identifier', 'topic_id')
+            rows = [
+                (identifier, topic_id, 0)
+                for identifier, topic_id in documents[start_offset:end_offset]]
+        else:
+            documents = documents\
+                .extra(select={'score': score}, select_params=[param, ])\
+                .order_by(*((order_by or ['-score', ]) + ['-topic_id', '-pk']))\
+                .values_list('identifier', 'topic_id', 'score')
+            rows = list(documents[start_offset:end_offset])
+
+        # The topic id is set as in
+        # the results of other backends
+        result_class = result_class or SearchResult
+        results = [
+            result_class(*identifier.split('.'), score=rank, topic_id=topic_id)
+            for identifier, topic_id, rank in rows]
+
+        return {'results': results, 'hits': hits}
+
+
+class DatabaseSearchQuery(BaseSearchQuery):
+
+    def build_query_fragment(self, field, filter_type, value):
+        # Only used to display the query
+        if isinstance(value, BaseInput):
+            value = value.query_string
+
+        return '%s__%s=%s' % (field, filter_type, value)
+
+    def run(self, spelling_query=None, **kwargs):
+        # The backend needs the query tree
+        # rather than the built query string
+        search_kwargs = self.build_params(spelling_query=spelling_query)
+        search_kwargs.update(kwargs)
+        results = self.backend.search(self.query_filter, **search_kwargs)
+        self._results = results.get('results', [])
+        self._hit_count = results.get('hits', 0)
+
+
+class DatabaseEngine(BaseEngine):
+    backend = DatabaseSearchBackend
+    query = DatabaseSearchQuery
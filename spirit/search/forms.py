@@ -11,13 +11,14 @@ from haystack.forms import SearchForm
 from haystack.query import EmptySearchQuerySet
 
 from ..topic.models import Topic
+from ..comment.models import Comment
 from ..category.models import Category
 
 
 class BaseSearchForm(SearchForm):
 
     def clean_q(self):
-        q = self.cleaned_data['q']
+        q = ' '.join(self.cleaned_data['q'].split())
 
         if len(q) < settings.ST_SEARCH_QUERY_MIN_LEN:
             raise forms.ValidationError(_("Your search must contain at least %(length)s characters.")
@@ -25,6 +26,10 @@ class BaseSearchForm(SearchForm):
 
         return q
 
+    def get_cache_key(self):
+        """Identifies the search, to cache its results"""
+        return self.cleaned_data['q'].lower()
+
 
 class BasicSearchForm(BaseSearchForm):
 
@@ -34,19 +39,20 @@ class BasicSearchForm(BaseSearchForm):
         if isinstance(sqs, EmptySearchQuerySet):
             return sqs
 
-        topics = sqs.models(Topic)
+        topics = sqs.models(Topic, Comment)
         return topics.filter(is_removed=False, is_category_removed=False, is_subcategory_removed=False)
 
 
 class AdvancedSearchForm(BaseSearchForm):
 
-    category = forms.ModelMultipleChoiceField(queryset=Category.objects.visible(),
+    category = forms.ModelMultipleChoiceField(queryset=Category.objects.none(),
                                               required=False,
                                               label=_('Filter by'),
                                               widget=forms.CheckboxSelectMultiple)
 
     def __init__(self, *args, **kwargs):
         super(AdvancedSearchForm, self).__init__(*args, **kwargs)
+        self.fields['category'].queryset = Category.objects.visible()
         self.fields['category'].label_from_instance = lambda obj: smart_text(obj.title)
 
     def search(self):
@@ -55,10 +61,15 @@ class AdvancedSearchForm(BaseSearchForm):
         if isinstance(sqs, EmptySearchQuerySet):
             return sqs
 
-        topics = sqs.models(Topic)
+        topics = sqs.models(Topic, Comment)
         categories = self.cleaned_data['category']
 
         if categories:
             topics = topics.filter(category_id__in=[c.pk for c in categories])
 
         return topics.filter(is_removed=False, is_category_removed=False, is_subcategory_removed=False)
+
+    def get_cache_key(self):
+        return '%s:%s' % (
+            super(AdvancedSearchForm, self).get_cache_key(),
+            ','.join(sorted(str(c.pk) for c in self.cleaned_data['category'])))
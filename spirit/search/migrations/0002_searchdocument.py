@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction
+from django.db.utils import DatabaseError
+from django.conf import settings
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX spirit_search_searchdocument_fts "
+            "ON spirit_search_searchdocument "
+            "USING GIN (to_tsvector('%s', text))" % settings.ST_SEARCH_DATABASE_LANGUAGE)
+    elif vendor == 'sqlite':
+        # The backend searches through LIKE when
+        # sqlite was not compiled with FTS5
+        try:
+            with transaction.atomic():
+                schema_editor.execute(
+                    "CREATE VIRTUAL TABLE spirit_search_searchdocument_fts "
+                    "USING fts5(text, content='spirit_search_searchdocument', content_rowid='topic_id')")
+        except DatabaseError:
+            return
+
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_ai "
+            "AFTER INSERT ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(rowid, text) VALUES (new.topic_id, new.text); "
+            "END")
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_ad "
+            "AFTER DELETE ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(spirit_search_searchdocument_fts, rowid, text) "
+            "VALUES ('delete', old.topic_id, old.text); "
+            "END")
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_au "
+            "AFTER UPDATE ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(spirit_search_searchdocument_fts, rowid, text) "
+            "VALUES ('delete', old.topic_id, old.text); "
+            "INSERT INTO spirit_search_searchdocument_fts(rowid, text) VALUES (new.topic_id, new.text); "
+            "END")
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS spirit_search_searchdocument_fts")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS spirit_search_searchdocument_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_topic', '0001_initial'),
+        ('spirit_search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('topic', models.OneToOneField(primary_key=True, related_name='+', serialize=False, to='spirit_topic.Topic')),
+                ('text', models.TextField()),
+                ('title', models.CharField(max_length=255)),
+                ('category_id', models.PositiveIntegerField()),
+                ('is_removed', models.BooleanField(default=False)),
+                ('is_category_removed', models.BooleanField(default=False)),
+                ('is_subcategory_removed', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'search document',
+                'verbose_name_plural': 'search documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_topic', '0001_initial'),
+        ('spirit_search', '0002_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicTitleWord',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('word', models.CharField(max_length=50, db_index=True)),
+                ('topic', models.ForeignKey(related_name='+', to='spirit_topic.Topic')),
+            ],
+            options={
+                'verbose_name': 'topic title word',
+                'verbose_name_plural': 'topics title words',
+            },
+        ),
+    ]
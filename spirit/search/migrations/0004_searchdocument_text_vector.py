@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.conf import settings
+
+
+def create_text_vector(apps, schema_editor):
+    # The tsvector is stored so it's not built again
+    # for every matching row when ranking the results
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        "ALTER TABLE spirit_search_searchdocument ADD COLUMN text_vector tsvector")
+    schema_editor.execute(
+        "CREATE FUNCTION spirit_search_searchdocument_tsv() RETURNS trigger AS $$ BEGIN "
+        "new.text_vector := to_tsvector('%s', new.text); "
+        "RETURN new; "
+        "END $$ LANGUAGE plpgsql" % settings.ST_SEARCH_DATABASE_LANGUAGE)
+    schema_editor.execute(
+        "CREATE TRIGGER spirit_search_searchdocument_tsv "
+        "BEFORE INSERT OR UPDATE OF text ON spirit_search_searchdocument "
+        "FOR EACH ROW EXECUTE PROCEDURE spirit_search_searchdocument_tsv()")
+    schema_editor.execute(
+        "UPDATE spirit_search_searchdocument "
+        "SET text_vector = to_tsvector('%s', text)" % settings.ST_SEARCH_DATABASE_LANGUAGE)
+    schema_editor.execute("DROP INDEX IF EXISTS spirit_search_searchdocument_fts")
+    schema_editor.execute(
+        "CREATE INDEX spirit_search_searchdocument_fts "
+        "ON spirit_search_searchdocument "
+        "USING GIN (text_vector)")
+
+
+def drop_text_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS spirit_search_searchdocument_fts")
+    schema_editor.execute(
+        "DROP TRIGGER IF EXISTS spirit_search_searchdocument_tsv ON spirit_search_searchdocument")
+    schema_editor.execute("DROP FUNCTION IF EXISTS spirit_search_searchdocument_tsv()")
+    schema_editor.execute("ALTER TABLE spirit_search_searchdocument DROP COLUMN text_vector")
+    schema_editor.execute(
+        "CREATE INDEX spirit_search_searchdocument_fts "
+        "ON spirit_search_searchdocument "
+        "USING GIN (to_tsvector('%s', text))" % settings.ST_SEARCH_DATABASE_LANGUAGE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_search', '0003_topictitleword'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_text_vector, drop_text_vector),
+    ]
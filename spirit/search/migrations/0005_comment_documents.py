@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models, transaction
+from django.db.utils import DatabaseError
+from django.conf import settings
+
+BATCH_SIZE = 1000
+
+
+def _create_fulltext_index(schema_editor, rowid):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE spirit_search_searchdocument ADD COLUMN text_vector tsvector")
+        schema_editor.execute(
+            "CREATE OR REPLACE FUNCTION spirit_search_searchdocument_tsv() RETURNS trigger AS $$ BEGIN "
+            "new.text_vector := to_tsvector('%s', new.text); "
+            "RETURN new; "
+            "END $$ LANGUAGE plpgsql" % settings.ST_SEARCH_DATABASE_LANGUAGE)
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_tsv "
+            "BEFORE INSERT OR UPDATE OF text ON spirit_search_searchdocument "
+            "FOR EACH ROW EXECUTE PROCEDURE spirit_search_searchdocument_tsv()")
+        schema_editor.execute(
+            "CREATE INDEX spirit_search_searchdocument_fts "
+            "ON spirit_search_searchdocument "
+            "USING GIN (text_vector)")
+    elif vendor == 'sqlite':
+        # The backend searches through LIKE when
+        # sqlite was not compiled with FTS5
+        try:
+            with transaction.atomic():
+                schema_editor.execute(
+                    "CREATE VIRTUAL TABLE spirit_search_searchdocument_fts "
+                    "USING fts5(text, content='spirit_search_searchdocument', content_rowid='%s')" % rowid)
+        except DatabaseError:
+            return
+
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_ai "
+            "AFTER INSERT ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(rowid, text) VALUES (new.%(rowid)s, new.text); "
+            "END" % {'rowid': rowid})
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_ad "
+            "AFTER DELETE ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(spirit_search_searchdocument_fts, rowid, text) "
+            "VALUES ('delete', old.%(rowid)s, old.text); "
+            "END" % {'rowid': rowid})
+        schema_editor.execute(
+            "CREATE TRIGGER spirit_search_searchdocument_au "
+            "AFTER UPDATE ON spirit_search_searchdocument BEGIN "
+            "INSERT INTO spirit_search_searchdocument_fts(spirit_search_searchdocument_fts, rowid, text) "
+            "VALUES ('delete', old.%(rowid)s, old.text); "
+            "INSERT INTO spirit_search_searchdocument_fts(rowid, text) VALUES (new.%(rowid)s, new.text); "
+            "END" % {'rowid': rowid})
+
+
+def _drop_fulltext_index(schema_editor):
+    # The trigger and the GIN index are
+    # dropped along with the documents table
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS spirit_search_searchdocument_fts")
+
+
+def create_fulltext_index(apps, schema_editor):
+    _create_fulltext_index(schema_editor, rowid='id')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    _drop_fulltext_index(schema_editor)
+
+
+def create_topic_fulltext_index(apps, schema_editor):
+    _create_fulltext_index(schema_editor, rowid='topic_id')
+
+
+def enqueue_topics(apps, schema_editor):
+    # The documents table is re-created empty
+    Topic = apps.get_model('spirit_topic', 'Topic')
+    TopicIndexQueue = apps.get_model('spirit_search', 'TopicIndexQueue')
+    topic_ids = Topic.objects\
+        .order_by('pk')\
+        .values_list('pk', flat=True)\
+        .iterator()
+    batch = []
+
+    for topic_id in topic_ids:
+        batch.append(TopicIndexQueue(topic_id=topic_id))
+
+        if len(batch) == BATCH_SIZE:
+            TopicIndexQueue.objects.bulk_create(batch)
+            batch = []
+
+    TopicIndexQueue.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_topic', '0001_initial'),
+        ('spirit_search', '0004_searchdocument_text_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topicindexqueue',
+            name='comment_id',
+            field=models.PositiveIntegerField(null=True, blank=True),
+        ),
+        migrations.RunPython(drop_fulltext_index, create_topic_fulltext_index),
+        migrations.DeleteModel(
+            name='SearchDocument',
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('identifier', models.CharField(max_length=255, unique=True)),
+                ('text', models.TextField()),
+                ('title', models.CharField(max_length=255)),
+                ('category_id', models.PositiveIntegerField()),
+                ('is_removed', models.BooleanField(default=False)),
+                ('is_category_removed', models.BooleanField(default=False)),
+                ('is_subcategory_removed', models.BooleanField(default=False)),
+                ('topic', models.ForeignKey(related_name='+', to='spirit_topic.Topic')),
+            ],
+            options={
+                'verbose_name': 'search document',
+                'verbose_name_plural': 'search documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(enqueue_topics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import re
+
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+from django.utils import timezone
+
+from ..category.utils import get_tree
+
+WORD_MAX_LEN = 50  # changing this needs migration
+
+
+class TopicIndexQueue(models.Model):
+    """
+    A topic waiting to be (re)indexed along with
+    its comments, or a single comment of the topic
+    when *comment_id* is set. Rows are written by the
+    QueuedSignalProcessor and removed once the
+    topic or comment has been committed to the index
+    """
+    # Not a FK, deleted topics must be unindexed
+    topic_id = models.PositiveIntegerField()
+    comment_id = models.PositiveIntegerField(null=True, blank=True)
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['pk', ]
+        verbose_name = _("topic index queue")
+        verbose_name_plural = _("topics index queue")
+
+    @classmethod
+    def enqueue(cls, topic_ids):
+        cls.objects.bulk_create(
+            [cls(topic_id=topic_id) for topic_id in topic_ids],
+            batch_size=500
+        )
+
+    @classmethod
+    def enqueue_comments(cls, comments):
+        cls.objects.bulk_create(
+            [cls(topic_id=comment.topic_id, comment_id=comment.pk) for comment in comments],
+            batch_size=500
+        )
+
+    @classmethod
+    def enqueue_category(cls, category_id):
+        from ..topic.models import Topic
+
+        topic_ids = Topic.objects\
+            .filter(Q(category_id=category_id) | Q(category__parent_id=category_id))\
+            .values_list('pk', flat=True)
+        cls.enqueue(topic_ids)
+
+
+class SearchDocument(models.Model):
+    """
+    The prepared index data of a topic or
+    a comment, written by the database search
+    backend. Comments carry the fields of their
+    topic. The full-text index is created by the migration
+    """
+    identifier = models.CharField(max_length=255, unique=True)
+    topic = models.ForeignKey('spirit_topic.Topic', related_name='+')
+    text = models.TextField()
+    title = models.CharField(max_length=255)
+    category_id = models.PositiveIntegerField()
+    is_removed = models.BooleanField(default=False)
+    is_category_removed = models.BooleanField(default=False)
+    is_subcategory_removed = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = _("search document")
+        verbose_name_plural = _("search documents")
+
+
+def get_words(text):
+    return [
+        word[:WORD_MAX_LEN]
+        for word in re.findall(r'\w+', text.lower(), flags=re.UNICODE)
+    ]
+
+
+class TopicTitleWord(models.Model):
+    """
+    A word within the title of a visible topic,
+    used to suggest topics by prefix
+    """
+    topic = models.ForeignKey('spirit_topic.Topic', related_name='+')
+    word = models.CharField(max_length=WORD_MAX_LEN, db_index=True)
+
+    class Meta:
+        verbose_name = _("topic title word")
+        verbose_name_plural = _("topics title words")
+
+    @classmethod
+    def update_topics(cls, topic_ids, topics):
+        """
+        Replace the words of the given topic ids,
+        *topics* are the ones that still exist
+        """
+        tree = get_tree()
+        cls.objects\
+            .filter(topic_id__in=list(topic_ids))\
+            .delete()
+        cls.objects.bulk_create(
+            [
+                cls(topic_id=topic.pk, word=word)
+                for topic in topics
+                if (not topic.is_removed and
+                    topic.category_id in tree.unremoved_ids and
+                    topic.category_id in tree.public_ids)
+                for word in set(get_words(topic.title))
+            ],
+            batch_size=500
+        )
@@ -7,12 +7,14 @@ from django.conf import settings
 from haystack import indexes
 
 from ..topic.models import Topic
+from ..comment.models import Comment, COMMENT
 
 
 class TopicIndex(indexes.SearchIndex, indexes.Indexable):
 
     text = indexes.CharField(document=True, use_template=True)
     title = indexes.CharField(model_attr='title')
+    topic_id = indexes.IntegerField(model_attr='pk')
     category_id = indexes.IntegerField(model_attr='category_id')
     is_removed = indexes.BooleanField(model_attr='is_removed')
     is_category_removed = indexes.BooleanField(model_attr='category__is_removed')
@@ -24,4 +26,32 @@ class TopicIndex(indexes.SearchIndex, indexes.Indexable):
     def index_queryset(self, using=None):
         """Used when the entire index for model is updated."""
         topics = super(TopicIndex, self).index_queryset(using=using)
-        return topics.exclude(category_id=settings.ST_TOPIC_PRIVATE_CATEGORY_PK)
\ No newline at end of file
+        return topics\
+            .exclude(category_id=settings.ST_TOPIC_PRIVATE_CATEGORY_PK)\
+            .select_related('category__parent')
+
+
+class CommentIndex(indexes.SearchIndex, indexes.Indexable):
+    """
+    A document per comment, so the replies of long
+    topics are found. The topic fields are copied, so
+    its comments are indexed again when the topic changes
+    """
+    text = indexes.CharField(document=True, model_attr='comment')
+    title = indexes.CharField(model_attr='topic__title')
+    topic_id = indexes.IntegerField(model_attr='topic_id')
+    category_id = indexes.IntegerField(model_attr='topic__category_id')
+    is_removed = indexes.BooleanField(model_attr='topic__is_removed')
+    is_category_removed = indexes.BooleanField(model_attr='topic__category__is_removed')
+    is_subcategory_removed = indexes.BooleanField(model_attr='topic__category__parent__is_removed', default=False)
+
+    def get_model(self):
+        return Comment
+
+    def index_queryset(self, using=None):
+        """Used when the entire index for model is updated."""
+        comments = super(CommentIndex, self).index_queryset(using=using)
+        return comments\
+            .filter(is_removed=False, action=COMMENT)\
+            .exclude(topic__category_id=settings.ST_TOPIC_PRIVATE_CATEGORY_PK)\
+            .select_related('topic__category__parent')
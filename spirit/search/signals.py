@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.db.models.signals import post_save, post_delete
+
+from haystack.signals import BaseSignalProcessor
+
+from ..topic.models import Topic
+from ..topic.signals import topics_updated
+from ..category.models import Category
+from ..comment.models import Comment
+from .models import TopicIndexQueue
+from .utils import index_topics, index_comments
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Records the changed topics and comments in the queue table,
+    instead of updating the index within the request.
+    Run "manage.py spiritupdateindex" to index them
+    """
+
+    def setup(self):
+        post_save.connect(self.handle_topic, sender=Topic)
+        post_delete.connect(self.handle_topic, sender=Topic)
+        post_save.connect(self.handle_category, sender=Category)
+        post_save.connect(self.handle_comment, sender=Comment)
+        post_delete.connect(self.handle_comment, sender=Comment)
+        topics_updated.connect(self.handle_topics)
+
+    def teardown(self):
+        post_save.disconnect(self.handle_topic, sender=Topic)
+        post_delete.disconnect(self.handle_topic, sender=Topic)
+        post_save.disconnect(self.handle_category, sender=Category)
+        post_save.disconnect(self.handle_comment, sender=Comment)
+        post_delete.disconnect(self.handle_comment, sender=Comment)
+        topics_updated.disconnect(self.handle_topics)
+
+    def enqueue(self, topic_ids):
+        TopicIndexQueue.enqueue(topic_ids)
+
+    def enqueue_comments(self, comments):
+        TopicIndexQueue.enqueue_comments(comments)
+
+    def handle_topic(self, sender, instance, **kwargs):
+        self.enqueue([instance.pk, ])
+
+    def handle_topics(self, sender, topic_ids, **kwargs):
+        self.enqueue(topic_ids)
+
+    def handle_comment(self, sender, instance, **kwargs):
+        # Comments are indexed on their own,
+        # replies don't index the whole topic
+        self.enqueue_comments([instance, ])
+
+    def handle_category(self, sender, instance, created, **kwargs):
+        # The removed state of the category is indexed in
+        # its topics, deleting it deletes the topics as well
+        if not created:
+            TopicIndexQueue.enqueue_category(instance.pk)
+
+
+class DatabaseSignalProcessor(QueuedSignalProcessor):
+    """
+    Indexes the changed topics right away, to be used
+    along with the database search backend. The index
+    is written on the same connection as the change,
+    so it's part of its transaction (ie: ATOMIC_REQUESTS).
+    Category changes may touch many topics, those
+    are still queued
+    """
+
+    def enqueue(self, topic_ids):
+        for using in self.connection_router.for_write():
+            index_topics(topic_ids, using=using)
+
+    def enqueue_comments(self, comments):
+        for using in self.connection_router.for_write():
+            index_comments([comment.pk for comment in comments], using=using)
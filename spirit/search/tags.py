@@ -14,7 +14,6 @@ def render_search_form():
 
 @register.assignment_tag()
 def get_topics_from_search_result(results):
-    # TODO: move to view
-    # Since Im only indexing Topics this is ok.
+    # The topics are loaded by SearchView.build_page
     topics = [r.object for r in results]
     return topics
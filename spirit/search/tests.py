@@ -2,21 +2,34 @@
 
 from __future__ import unicode_literals
 
+import json
+
 from django.test import TestCase
 from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.template import Template, Context
 from django.conf import settings
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
-from haystack.query import SearchQuerySet
+from haystack import connections
+from haystack.query import SearchQuerySet, SQ
+from haystack.exceptions import SearchBackendError
 from djconfig.utils import override_djconfig
 
 from ..core.tests import utils
 from ..topic.models import Topic
+from ..comment.models import Comment, MOVED
+from ..category.models import Category
+from ..category.utils import invalidate_tree
 from .forms import BasicSearchForm, AdvancedSearchForm
 from .tags import render_search_form
-from .search_indexes import TopicIndex
+from .search_indexes import TopicIndex, CommentIndex
+from .models import TopicIndexQueue, SearchDocument, TopicTitleWord
+from .utils import update_index, rebuild_index, index_topics, invalidate_results, CachedResults
+from . import utils as utils_module
+from .signals import DatabaseSignalProcessor
 
 HAYSTACK_TEST = {
     'default': {
@@ -54,6 +67,373 @@ class SearchTopicIndexTest(TestCase):
         self.assertEqual([s.object for s in sqs], [topic, ])
 
 
+class SearchIndexQueueTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = utils.create_category()
+
+    def queued(self):
+        return list(TopicIndexQueue.objects.values_list('topic_id', flat=True))
+
+    def test_topic_saved(self):
+        """
+        Should queue created and updated topics
+        """
+        topic = utils.create_topic(self.category)
+        self.assertEqual(self.queued(), [topic.pk])
+        topic.title = 'foo'
+        topic.save()
+        self.assertEqual(self.queued(), [topic.pk, topic.pk])
+
+    def test_topic_deleted(self):
+        """
+        Should queue deleted topics
+        """
+        topic = utils.create_topic(self.category)
+        TopicIndexQueue.objects.all().delete()
+        topic_pk = topic.pk
+        topic.delete()
+        self.assertEqual(self.queued(), [topic_pk])
+
+    def test_topic_moderated(self):
+        """
+        Should queue removed topics
+        """
+        topic = utils.create_topic(self.category)
+        TopicIndexQueue.objects.all().delete()
+        user = utils.create_user()
+        user.st.is_moderator = True
+        user.st.save()
+        utils.login(self, user=user)
+        response = self.client.post(reverse('spirit:topic:moderate:delete', kwargs={'pk': topic.pk, }), {})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.queued(), [topic.pk])
+
+    def test_comment_saved(self):
+        """
+        Should queue the topic of posted and edited comments
+        """
+        topic = utils.create_topic(self.category)
+        TopicIndexQueue.objects.all().delete()
+        comment = utils.create_comment(topic=topic)
+        self.assertEqual(self.queued(), [topic.pk])
+        comment.comment = 'foo'
+        comment.save()
+        self.assertEqual(self.queued(), [topic.pk, topic.pk])
+
+    def test_comment_saved_alone(self):
+        """
+        Should queue the posted, edited and deleted comments alone
+        """
+        topic = utils.create_topic(self.category)
+        TopicIndexQueue.objects.all().delete()
+        comment = utils.create_comment(topic=topic)
+        comment.comment = 'foo'
+        comment.save()
+        comment_pk = comment.pk
+        comment.delete()
+        self.assertEqual(
+            list(TopicIndexQueue.objects.values_list('topic_id', 'comment_id')),
+            [(topic.pk, comment_pk)] * 3)
+
+    def test_comment_moderated(self):
+        """
+        Should queue the topic of removed comments
+        """
+        topic = utils.create_topic(self.category)
+        comment = utils.create_comment(topic=topic)
+        TopicIndexQueue.objects.all().delete()
+        user = utils.create_user()
+        user.st.is_moderator = True
+        user.st.save()
+        utils.login(self, user=user)
+        response = self.client.post(reverse('spirit:comment:delete', kwargs={'pk': comment.pk, }), {})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.queued(), [topic.pk])
+
+    def test_category_updated(self):
+        """
+        Should queue the topics of the category and subcategories
+        """
+        subcategory = utils.create_category(parent=self.category)
+        topic = utils.create_topic(self.category)
+        topic_b = utils.create_topic(subcategory)
+        utils.create_topic(utils.create_category())
+        TopicIndexQueue.objects.all().delete()
+        self.category.is_removed = True
+        self.category.save()
+        self.assertEqual(sorted(self.queued()), [topic.pk, topic_b.pk])
+
+    def test_update_index(self):
+        """
+        Should index the queued topics in batches
+        """
+        call_command("clear_index", verbosity=0, interactive=False)
+        topic = utils.create_topic(self.category, title="spirit queue foo")
+        topic_b = utils.create_topic(self.category, title="spirit queue bar")
+        utils.create_private_topic()
+        self.assertEqual(list(SearchQuerySet().models(Topic)), [])
+        self.assertEqual(update_index(batch_size=1), 3)
+        self.assertEqual(self.queued(), [])
+        self.assertEqual(
+            sorted(s.object.pk for s in SearchQuerySet().models(Topic)),
+            [topic.pk, topic_b.pk])
+
+        topic_b.delete()
+        self.assertEqual(update_index(), 1)
+        self.assertEqual(
+            [s.object for s in SearchQuerySet().models(Topic)],
+            [topic, ])
+
+    def test_update_index_resume(self):
+        """
+        Should keep the rows of the batch that failed
+        """
+        call_command("clear_index", verbosity=0, interactive=False)
+        utils.create_topic(self.category)
+        org_update, TopicIndex.index_queryset = TopicIndex.index_queryset, None
+        try:
+            self.assertRaises(TypeError, update_index)
+        finally:
+            TopicIndex.index_queryset = org_update
+
+        self.assertEqual(len(self.queued()), 1)
+        self.assertEqual(update_index(), 1)
+        self.assertEqual(self.queued(), [])
+
+    def test_update_index_locked(self):
+        """
+        Should not index while another update is running
+        """
+        utils.create_topic(self.category)
+        cache.set('%s:lock' % settings.ST_SEARCH_CACHE_PREFIX, 1)
+        self.assertEqual(update_index(), 0)
+        self.assertEqual(len(self.queued()), 1)
+        self.assertEqual(rebuild_index(), 0)
+        self.assertEqual(len(self.queued()), 1)
+
+        cache.delete('%s:lock' % settings.ST_SEARCH_CACHE_PREFIX)
+        self.assertEqual(update_index(), 1)
+        self.assertEqual(self.queued(), [])
+        self.assertIsNone(cache.get('%s:lock' % settings.ST_SEARCH_CACHE_PREFIX))
+
+
+class SearchCommentIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = utils.create_category()
+        self.topic = utils.create_topic(self.category, title="spirit title")
+        self.comment = utils.create_comment(topic=self.topic, comment="first reply foo")
+        utils.create_comment(topic=self.topic, comment="removed reply bar", is_removed=True)
+        utils.create_comment(topic=self.topic, comment="second reply baz")
+
+    def search(self, q):
+        topic_ids = [
+            int(s.topic_id)
+            for s in SearchQuerySet().models(Topic, Comment).filter(content=q)]
+        return [Topic.objects.get(pk=pk) for pk in sorted(set(topic_ids))]
+
+    def test_prepare(self):
+        """
+        Should index the comment text along with the topic fields
+        """
+        data = CommentIndex().full_prepare(self.comment)
+        self.assertEqual(data['text'], "first reply foo")
+        self.assertEqual(data['title'], "spirit title")
+        self.assertEqual(data['topic_id'], self.topic.pk)
+        self.assertEqual(data['category_id'], self.category.pk)
+        self.assertFalse(data['is_removed'])
+        self.assertEqual(TopicIndex().full_prepare(self.topic)['text'], "spirit title")
+
+    def test_index_queryset(self):
+        """
+        Should exclude the removed comments and the comments of private topics
+        """
+        utils.create_comment(topic=utils.create_private_topic().topic)
+        utils.create_comment(topic=self.topic, action=MOVED)
+        self.assertEqual(
+            sorted(c.comment for c in CommentIndex().index_queryset()),
+            ["first reply foo", "second reply baz"])
+
+    def test_index_topics(self):
+        """
+        Should index the comments along with the topic, removed comments are unindexed
+        """
+        call_command("clear_index", verbosity=0, interactive=False)
+        index_topics([self.topic.pk, ])
+        self.assertEqual(self.search("foo"), [self.topic])
+        self.assertEqual(self.search("bar"), [])
+
+        Comment.objects.filter(pk=self.comment.pk).update(is_removed=True)
+        index_topics([self.topic.pk, ])
+        self.assertEqual(self.search("foo"), [])
+        self.assertEqual(self.search("baz"), [self.topic])
+
+        Topic.objects.filter(pk=self.topic.pk).update(
+            category_id=settings.ST_TOPIC_PRIVATE_CATEGORY_PK)
+        index_topics([self.topic.pk, ])
+        self.assertEqual(self.search("baz"), [])
+        self.assertEqual(self.search("title"), [])
+
+    def test_index_comments_long_topic(self):
+        """
+        Should index the replies of long topics alone
+        """
+        rebuild_index()
+
+        for _ in range(20):
+            utils.create_comment(topic=self.topic)
+
+        comment = utils.create_comment(topic=self.topic, comment="late reply qux")
+        self.assertEqual(self.search("qux"), [])
+        self.assertEqual(update_index(), 1)
+        self.assertEqual(self.search("qux"), [self.topic])
+
+        comment.delete()
+        self.assertEqual(update_index(), 1)
+        self.assertEqual(self.search("qux"), [])
+
+    def test_rebuild_index(self):
+        """
+        Should index the comments text of every topic in batches
+        """
+        topic_b = utils.create_topic(self.category, title="another title")
+        utils.create_comment(topic=topic_b, comment="second reply qux")
+        utils.create_private_topic()
+        self.assertEqual(rebuild_index(batch_size=1), 2)
+        self.assertEqual(TopicIndexQueue.objects.count(), 0)
+        self.assertEqual(self.search("baz"), [self.topic])
+        self.assertEqual(self.search("qux"), [topic_b])
+        self.assertEqual(self.search("bar"), [])
+        self.assertEqual(sorted(t.pk for t in self.search("second")), [self.topic.pk, topic_b.pk])
+
+    def test_rebuild_index_stale(self):
+        """
+        Should keep the index while rebuilding, then remove the stale topics
+        """
+        topic_b = utils.create_topic(self.category, title="stale title")
+        utils.create_comment(topic=topic_b, comment="stale reply qux")
+        rebuild_index()
+        Topic.objects.filter(pk=topic_b.pk).update(
+            category_id=settings.ST_TOPIC_PRIVATE_CATEGORY_PK)
+
+        org_remove, indexed = utils_module._remove_stale, []
+
+        def remove_stale_mock(*args, **kwargs):
+            indexed.extend(int(s.pk) for s in SearchQuerySet().models(Topic).filter(content="title"))
+            return org_remove(*args, **kwargs)
+
+        utils_module._remove_stale = remove_stale_mock
+        try:
+            self.assertEqual(rebuild_index(batch_size=1), 1)
+        finally:
+            utils_module._remove_stale = org_remove
+
+        self.assertEqual(sorted(indexed), [self.topic.pk, topic_b.pk])
+        self.assertEqual(self.search("title"), [self.topic])
+        self.assertEqual(self.search("qux"), [])
+        self.assertFalse(TopicTitleWord.objects.filter(topic=topic_b).exists())
+
+
+class SearchDatabaseBackendTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = utils.create_category()
+        self.topic = utils.create_topic(self.category, title="spirit search test foo")
+        self.topic2 = utils.create_topic(self.category, title="foo")
+        self.comment = utils.create_comment(topic=self.topic2, comment="a reply bar")
+        rebuild_index(using='db')
+
+    def search(self, q):
+        return SearchQuerySet(using='db').auto_query(q).models(Topic)
+
+    def search_topics(self, q):
+        sqs = SearchQuerySet(using='db').auto_query(q).models(Topic, Comment)
+        return [Topic.objects.get(pk=s.topic_id) for s in sqs]
+
+    def test_update(self):
+        """
+        Should store the prepared topics and comments
+        """
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        document = SearchDocument.objects.get(identifier='spirit_topic.topic.%s' % self.topic2.pk)
+        self.assertEqual(document.text, "foo")
+        self.assertEqual(document.title, "foo")
+        self.assertEqual(document.topic_id, self.topic2.pk)
+        self.assertEqual(document.category_id, self.category.pk)
+        self.assertFalse(document.is_removed)
+        document = SearchDocument.objects.get(identifier='spirit_comment.comment.%s' % self.comment.pk)
+        self.assertEqual(document.text, "a reply bar")
+        self.assertEqual(document.title, "foo")
+        self.assertEqual(document.topic_id, self.topic2.pk)
+
+    def test_search(self):
+        """
+        Should match every term, best match first
+        """
+        self.assertEqual([s.object for s in self.search("spirit search")], [self.topic, ])
+        self.assertEqual(list(self.search("bar")), [])
+        self.assertEqual(self.search_topics("bar"), [self.topic2, ])
+        self.assertEqual([s.object for s in self.search("foo")], [self.topic2, self.topic])
+        self.assertEqual(len(self.search("foo")), 2)
+        self.assertEqual([s.object for s in self.search("foo")[1:2]], [self.topic, ])
+        self.assertEqual(list(self.search("qux")), [])
+
+    def test_search_filter(self):
+        """
+        Should filter by the indexed fields
+        """
+        Topic.objects.filter(pk=self.topic.pk).update(is_removed=True)
+        index_topics([self.topic.pk, ], using='db')
+        sqs = self.search("foo")
+        self.assertEqual([s.object for s in sqs.filter(is_removed=False)], [self.topic2, ])
+        self.assertEqual(list(sqs.filter(category_id__in=[self.category.pk + 1, ])), [])
+        self.assertEqual(len(sqs.filter(SQ(is_removed=True) | SQ(title="foo"))), 2)
+        self.assertRaises(
+            SearchBackendError, len, sqs.filter(SQ(is_removed=True) | SQ(content="foo")))
+
+    def test_search_form(self):
+        """
+        Should work with the search forms
+        """
+        form = AdvancedSearchForm(
+            data={'q': 'spirit search', 'category': [self.category.pk, ]},
+            searchqueryset=SearchQuerySet(using='db'))
+        self.assertTrue(form.is_valid())
+        self.assertEqual([s.object for s in form.search()], [self.topic, ])
+
+    def test_remove(self):
+        """
+        Should remove the private and deleted topics
+        """
+        private = utils.create_private_topic().topic
+        index_topics([private.pk, self.topic.pk], using='db')
+        self.assertFalse(SearchDocument.objects.filter(topic=private).exists())
+        connections['db'].get_backend().remove(self.topic)
+        self.assertEqual([s.object for s in self.search("foo")], [self.topic2, ])
+        connections['db'].get_backend().clear()
+        self.assertEqual(SearchDocument.objects.count(), 0)
+
+    def test_signal_processor(self):
+        """
+        Should index the topic along with the comment
+        """
+        class RouterMock(object):
+            def for_write(self, **hints):
+                return ['db', ]
+
+        processor = DatabaseSignalProcessor(connections, RouterMock())
+        try:
+            utils.create_comment(topic=self.topic, comment="new reply qux")
+        finally:
+            processor.teardown()
+
+        self.assertEqual(self.search_topics("qux"), [self.topic, ])
+
+
 class SearchViewTest(TestCase):
 
     def setUp(self):
@@ -103,6 +483,147 @@ class SearchViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual([s.object for s in response.context['page']], [self.topic2, ])
 
+    def test_advanced_search_topics_queries(self):
+        """
+        Should load the topics of a page at once
+        """
+        utils.login(self)
+        data = {'q': 'foo', }
+
+        def count_queries(per_page):
+            # djconfig only provides a decorator
+            @override_djconfig(topics_per_page=per_page)
+            def search():
+                invalidate_results()
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse('spirit:search:search'), data)
+                    self.assertEqual(len(response.context['page']), per_page)
+
+                return len(queries)
+
+            return search()
+
+        count_queries(per_page=1)  # Warm up the caches
+        self.assertEqual(count_queries(per_page=1), count_queries(per_page=2))
+
+    def test_advanced_search_comments(self):
+        """
+        Should list the topic of the matching comments once
+        """
+        utils.login(self)
+        utils.create_comment(topic=self.topic, comment="a reply qux")
+        utils.create_comment(topic=self.topic, comment="another reply qux")
+        utils.create_comment(topic=self.topic2, comment="bar")
+        call_command("rebuild_index", verbosity=0, interactive=False)
+        response = self.client.get(reverse('spirit:search:search'), {'q': 'qux'})
+        self.assertEqual([s.object for s in response.context['page']], [self.topic, ])
+
+        response = self.client.get(reverse('spirit:search:search'), {'q': 'reply'})
+        self.assertEqual([s.object for s in response.context['page']], [self.topic, ])
+
+    @override_settings(ST_SEARCH_CACHE_MAX_RESULTS=1)
+    def test_advanced_search_cached_batches(self):
+        """
+        Should read the results in batches, up to the requested topics
+        """
+        for _ in range(3):
+            utils.create_comment(topic=self.topic, comment="foo reply")
+
+        call_command("rebuild_index", verbosity=0, interactive=False)
+        form = AdvancedSearchForm(data={'q': 'foo'})
+        self.assertTrue(form.is_valid())
+        results = CachedResults(form.search(), key=form.get_cache_key())
+        self.assertEqual(len(results[:1]), 1)
+        self.assertEqual(results._offset, 1)
+        self.assertEqual(
+            sorted(int(r.pk) for r in results[:10]),
+            [self.topic.pk, self.topic2.pk])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results)
+
+        cached = CachedResults(form.search(), key=form.get_cache_key())
+        self.assertEqual(
+            sorted(int(r.pk) for r in cached[:10]),
+            [self.topic.pk, self.topic2.pk])
+
+    def test_advanced_search_deleted_topic(self):
+        """
+        Should leave out the results of deleted topics
+        """
+        utils.login(self)
+        Topic.objects.filter(pk=self.topic2.pk).delete()
+        data = {'q': 'foo', }
+        response = self.client.get(reverse('spirit:search:search'), data)
+        self.assertEqual([s.object for s in response.context['page']], [self.topic, ])
+
+    def test_advanced_search_cached(self):
+        """
+        Should cache the results until the index gets updated
+        """
+        utils.login(self)
+        data = {'q': 'Spirit  search', }
+        response = self.client.get(reverse('spirit:search:search'), data)
+        self.assertEqual([s.object for s in response.context['page']], [self.topic, ])
+
+        call_command("clear_index", verbosity=0, interactive=False)
+        data = {'q': 'spirit search', }
+        response = self.client.get(reverse('spirit:search:search'), data)
+        self.assertEqual([s.object for s in response.context['page']], [self.topic, ])
+
+        invalidate_results()
+        response = self.client.get(reverse('spirit:search:search'), data)
+        self.assertEqual(list(response.context['page']), [])
+
+    def test_suggest(self):
+        """
+        Should suggest the topics by title prefix
+        """
+        rebuild_index()
+        utils.login(self)
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'spi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content.decode('utf-8')),
+            {'suggestions': [{'title': self.topic.title, 'url': self.topic.get_absolute_url()}]})
+
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'foo'})
+        self.assertEqual(
+            [s['title'] for s in json.loads(response.content.decode('utf-8'))['suggestions']],
+            [self.topic2.title, self.topic.title])
+
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'test fo'})
+        self.assertEqual(len(json.loads(response.content.decode('utf-8'))['suggestions']), 1)
+
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'fo'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'suggestions': []})
+
+    def test_suggest_removed(self):
+        """
+        Should not suggest removed topics
+        """
+        Topic.objects.filter(pk=self.topic.pk).update(is_removed=True)
+        rebuild_index()
+        self.assertEqual(
+            sorted(TopicTitleWord.objects.values_list('word', flat=True)),
+            ['foo', ])
+
+    def test_suggest_category_changed(self):
+        """
+        Should not suggest the topics of removed and private categories
+        """
+        rebuild_index()
+        utils.login(self)
+        Category.objects.filter(pk=self.category.pk).update(is_removed=True)
+        invalidate_tree()
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'foo'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'suggestions': []})
+
+        Category.objects.filter(pk=self.category.pk).update(is_removed=False, is_private=True)
+        invalidate_tree()
+        response = self.client.get(reverse('spirit:search:suggest'), {'q': 'foo'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'suggestions': []})
+
     def test_advanced_search_in_category(self):
         """
         search by topic in category
@@ -135,6 +656,12 @@ class SearchFormTest(TestCase):
         form = BasicSearchForm(data)
         self.assertEqual(form.is_valid(), False)
 
+    def test_search_normalized(self):
+        form = BasicSearchForm({'q': '  foo \t Bar  ', })
+        self.assertEqual(form.is_valid(), True)
+        self.assertEqual(form.cleaned_data['q'], 'foo Bar')
+        self.assertEqual(form.get_cache_key(), 'foo bar')
+
     def test_advanced_search(self):
         data = {'q': 'foobar', }
         form = AdvancedSearchForm(data)
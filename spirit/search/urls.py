@@ -14,4 +14,5 @@ urlpatterns = [
         template='spirit/search/search.html',
         form_class=AdvancedSearchForm)
     ), name='search'),
+    url(r'^suggest/$', views.suggest, name='suggest'),
 ]
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import uuid
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from haystack import connections
+from haystack.models import SearchResult
+from haystack.query import SearchQuerySet
+from haystack.utils import get_model_ct
+
+from ..topic.models import Topic
+from ..comment.models import Comment, COMMENT
+from .models import TopicIndexQueue, TopicTitleWord
+
+__all__ = [
+    'index_topics',
+    'index_comments',
+    'update_index',
+    'rebuild_index',
+    'invalidate_results',
+    'CachedResults'
+]
+
+
+def _get_cache():
+    return caches[settings.ST_SEARCH_CACHE]
+
+
+def _get_version_key():
+    return '%s:version' % settings.ST_SEARCH_CACHE_PREFIX
+
+
+def _get_version():
+    cache = _get_cache()
+    version = cache.get(_get_version_key())
+
+    if version is None:
+        cache.add(_get_version_key(), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_get_version_key())
+
+    return version
+
+
+def invalidate_results():
+    """
+    Must be called after committing to the
+    index, the cached results are discarded
+    """
+    _get_cache().set(_get_version_key(), uuid.uuid4().hex, timeout=None)
+
+
+def _get_lock_key():
+    return '%s:lock' % settings.ST_SEARCH_CACHE_PREFIX
+
+
+def _lock():
+    return _get_cache().add(_get_lock_key(), 1, timeout=settings.ST_SEARCH_INDEX_LOCK_TIMEOUT)
+
+
+def _touch_lock():
+    # Keeps the lock of long runs, while the
+    # lock of a dead process expires soon
+    _get_cache().set(_get_lock_key(), 1, timeout=settings.ST_SEARCH_INDEX_LOCK_TIMEOUT)
+
+
+def _unlock():
+    _get_cache().delete(_get_lock_key())
+
+
+def _get_identifier(model, pk):
+    return '%s.%s' % (get_model_ct(model), pk)
+
+
+def _get_index(connection, model):
+    return connection.get_unified_index().get_index(model)
+
+
+def _iter_batches(queryset, batch_size):
+    # Rows are read in pk ranges, so the memory
+    # use does not grow with the size of the forum
+    queryset = queryset.order_by('pk')
+    last_pk = 0
+
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+
+        if not batch:
+            break
+
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def index_topics(topic_ids, using='default'):
+    """
+    Index the given topics along with their comments,
+    the deleted and private topics are removed from
+    the index, as well as the removed comments.
+    Returns the number of topics
+    """
+    connection = connections[using]
+    topic_index = _get_index(connection, Topic)
+    comment_index = _get_index(connection, Comment)
+    backend = connection.get_backend()
+    topic_ids = set(topic_ids)
+    topics = list(
+        topic_index.index_queryset(using=using)
+        .filter(pk__in=topic_ids))
+    indexed_ids = set(topic.pk for topic in topics)
+
+    if topics:
+        backend.update(topic_index, topics)
+
+    for topic_id in topic_ids - indexed_ids:
+        backend.remove(_get_identifier(Topic, topic_id))
+
+    # The topic fields are copied to the comments
+    comments = comment_index.index_queryset(using=using)\
+        .filter(topic_id__in=indexed_ids)
+
+    for batch in _iter_batches(comments, batch_size=settings.ST_SEARCH_INDEX_BATCH_SIZE):
+        backend.update(comment_index, batch)
+
+    # The deleted comments are unindexed on delete
+    removed_ids = Comment.objects\
+        .filter(Q(topic_id__in=topic_ids - indexed_ids) | Q(is_removed=True, topic_id__in=indexed_ids))\
+        .filter(action=COMMENT)\
+        .values_list('pk', flat=True)
+
+    for comment_id in removed_ids.iterator():
+        backend.remove(_get_identifier(Comment, comment_id))
+
+    TopicTitleWord.update_topics(topic_ids, topics)
+    invalidate_results()
+    return len(topic_ids)
+
+
+def index_comments(comment_ids, using='default'):
+    """
+    Index the given comments, the deleted, removed
+    and private ones are removed from the index.
+    Returns the number of comments
+    """
+    connection = connections[using]
+    index = _get_index(connection, Comment)
+    backend = connection.get_backend()
+    comment_ids = set(comment_ids)
+    comments = list(
+        index.index_queryset(using=using)
+        .filter(pk__in=comment_ids))
+
+    if comments:
+        backend.update(index, comments)
+
+    for comment_id in comment_ids - set(comment.pk for comment in comments):
+        backend.remove(_get_identifier(Comment, comment_id))
+
+    invalidate_results()
+    return len(comment_ids)
+
+
+def update_index(batch_size=None, using='default'):
+    """
+    Commit the queued topics and comments to the
+    index, in batches of ST_SEARCH_INDEX_BATCH_SIZE.
+    The queue rows are removed after the batch is
+    committed, so the work is resumed where it was
+    left if the process dies. Nothing is done while
+    another update or rebuild is running.
+    Returns the number of topics indexed
+    """
+    if not _lock():
+        return 0  # Already indexing
+
+    try:
+        return _update_index(batch_size=batch_size, using=using)
+    finally:
+        _unlock()
+
+
+def _update_index(batch_size, using):
+    batch_size = batch_size or settings.ST_SEARCH_INDEX_BATCH_SIZE
+    count = 0
+
+    while True:
+        queue = list(
+            TopicIndexQueue.objects
+            .order_by('pk')
+            .values_list('pk', 'topic_id', 'comment_id')[:batch_size])
+
+        if not queue:
+            break
+
+        # The comments of a queued topic get indexed along
+        topic_ids = set(topic_id for _, topic_id, comment_id in queue if comment_id is None)
+        comment_ids = set(
+            comment_id
+            for _, topic_id, comment_id in queue
+            if comment_id is not None and topic_id not in topic_ids)
+        index_topics(topic_ids, using=using)
+        index_comments(comment_ids, using=using)
+        count += len(set(topic_id for _, topic_id, _ in queue))
+        TopicIndexQueue.objects\
+            .filter(pk__in=[pk for pk, _, _ in queue])\
+            .delete()
+        _touch_lock()
+
+    return count
+
+
+def _remove_stale(connection, batch_size, using):
+    # The indexed topics and comments that are gone or not
+    # to be indexed anymore (ie: private, removed). The index
+    # is read in ranges of topics, so the reads don't get
+    # slower past the first results of a large index
+    backend = connection.get_backend()
+    last_topic_id = Topic.objects\
+        .order_by('-pk')\
+        .values_list('pk', flat=True)\
+        .first() or 0
+    stale = []
+
+    for first_topic_id in range(0, last_topic_id + 1, batch_size):
+        for model in (Topic, Comment):
+            results = SearchQuerySet(using=using)\
+                .models(model)\
+                .filter(topic_id__gte=first_topic_id)
+
+            # The last range takes the topics deleted past the last one
+            if first_topic_id + batch_size <= last_topic_id:
+                results = results.filter(topic_id__lt=first_topic_id + batch_size)
+
+            start = 0
+
+            while True:
+                pks = [int(result.pk) for result in results[start:start + batch_size]]
+
+                if not pks:
+                    break
+
+                indexed_pks = _get_index(connection, model)\
+                    .index_queryset(using=using)\
+                    .filter(pk__in=pks)\
+                    .values_list('pk', flat=True)
+                stale.extend(
+                    (model, pk)
+                    for pk in set(pks) - set(indexed_pks))
+                start += batch_size
+
+        _touch_lock()
+
+    for model, pk in stale:
+        backend.remove(_get_identifier(model, pk))
+
+    TopicTitleWord.update_topics([pk for model, pk in stale if model is Topic], [])
+
+
+def rebuild_index(batch_size=None, using='default'):
+    """
+    Index every topic and comment, then remove the
+    stale ones from the index. The index is not
+    cleared, so the search keeps working during
+    the rebuild. Topics and comments are streamed in
+    pk ranges of ST_SEARCH_INDEX_BATCH_SIZE, so the
+    memory use does not grow with the size of the forum.
+    Nothing is done while another update or
+    rebuild is running. Returns the number of
+    topics indexed
+    """
+    if not _lock():
+        return 0  # Already indexing
+
+    try:
+        return _rebuild_index(batch_size=batch_size, using=using)
+    finally:
+        _unlock()
+
+
+def _rebuild_index(batch_size, using):
+    batch_size = batch_size or settings.ST_SEARCH_INDEX_BATCH_SIZE
+    connection = connections[using]
+    topic_index = _get_index(connection, Topic)
+    comment_index = _get_index(connection, Comment)
+    backend = connection.get_backend()
+    # Changes queued from now on are kept
+    last_queued = TopicIndexQueue.objects\
+        .order_by('-pk')\
+        .values_list('pk', flat=True)\
+        .first()
+    count = 0
+
+    for batch in _iter_batches(topic_index.index_queryset(using=using), batch_size):
+        backend.update(topic_index, batch)
+        TopicTitleWord.update_topics([topic.pk for topic in batch], batch)
+        count += len(batch)
+        _touch_lock()
+
+    for batch in _iter_batches(comment_index.index_queryset(using=using), batch_size):
+        backend.update(comment_index, batch)
+        _touch_lock()
+
+    _remove_stale(connection, batch_size=batch_size, using=using)
+
+    if last_queued is not None:
+        TopicIndexQueue.objects\
+            .filter(pk__lte=last_queued)\
+            .delete()
+
+    invalidate_results()
+    return count
+
+
+def _make_result(pk):
+    return SearchResult(Topic._meta.app_label, Topic._meta.model_name, pk, 0)
+
+
+class CachedResults(object):
+    """
+    Lists the topics of the search results, a topic
+    is listed once, where its first matching document
+    (the topic or one of its comments) is. The results
+    are read ST_SEARCH_CACHE_MAX_RESULTS at a time,
+    only as far as the requested slice, and the topic
+    ids read so far are cached.
+    *key* must identify the search (ie: query and filters)
+    """
+
+    def __init__(self, results, key):
+        self.results = results
+        self.key = '%s:%s:%s' % (
+            settings.ST_SEARCH_CACHE_PREFIX,
+            _get_version(),
+            hashlib.md5(key.encode('utf-8')).hexdigest())
+        self._ids = None
+        self._offset = 0
+        self._is_done = False
+
+    def _load(self, stop=None):
+        """
+        Read the results until there are
+        *stop* topics, or all of them
+        """
+        if self._ids is None:
+            cached = _get_cache().get(self.key) or ([], 0, False)
+            self._ids, self._offset, self._is_done = cached
+
+        if self._is_done or (stop is not None and len(self._ids) >= stop):
+            return
+
+        ids = list(self._ids)
+        seen_ids = set(ids)
+        batch_size = settings.ST_SEARCH_CACHE_MAX_RESULTS
+
+        while not self._is_done and (stop is None or len(ids) < stop):
+            results = self.results[self._offset:self._offset + batch_size]
+
+            # Haystack leaves None in place of the
+            # results it could not load (load_all)
+            for r in results:
+                if r is None or int(r.topic_id) in seen_ids:
+                    continue
+
+                ids.append(int(r.topic_id))
+                seen_ids.add(int(r.topic_id))
+
+            self._offset += len(results)
+            self._is_done = len(results) < batch_size
+
+        self._ids = ids
+        _get_cache().set(
+            self.key,
+            (self._ids, self._offset, self._is_done),
+            timeout=settings.ST_SEARCH_CACHE_TIMEOUT)
+
+    def __len__(self):
+        self._load()
+        return len(self._ids)
+
+    def __bool__(self):
+        self._load(stop=1)
+        return bool(self._ids)
+
+    __nonzero__ = __bool__  # Python 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = index.stop
+        elif index >= 0:
+            stop = index + 1
+        else:
+            stop = None
+
+        # Negative indexes need all the topics
+        if stop is not None and stop < 0:
+            stop = None
+
+        self._load(stop=stop)
+
+        if isinstance(index, slice):
+            return [_make_result(pk) for pk in self._ids[index]]
+
+        return _make_result(self._ids[index])
@@ -2,14 +2,51 @@
 
 from __future__ import unicode_literals
 
+from django.contrib.auth.decorators import login_required
+from django.conf import settings
+
 from haystack.views import SearchView as BaseSearchView
 from djconfig import config
 
+from ..core.utils import json_response
 from ..core.utils.paginator import yt_paginate
+from ..topic.models import Topic
+from .forms import BasicSearchForm
+from .models import TopicTitleWord, get_words
+from .utils import CachedResults
 
 
 class SearchView(BaseSearchView):
 
+    def get_results(self):
+        results = super(SearchView, self).get_results()
+
+        if not self.form.is_valid():
+            return results
+
+        return CachedResults(results, key=self.form.get_cache_key())
+
+    def load_topics(self, results):
+        """
+        Set the topic of every result, the topics are
+        loaded at once. Results of topics that no
+        longer exist are left out
+        """
+        # Haystack leaves None in place of the
+        # results it could not load (load_all)
+        results = [r for r in results if r is not None]
+        topics = Topic.objects\
+            .select_related('category__parent')\
+            .with_bookmarks(user=self.request.user)\
+            .in_bulk([int(r.pk) for r in results])
+
+        results = [r for r in results if int(r.pk) in topics]
+
+        for r in results:
+            r.object = topics[int(r.pk)]
+
+        return results
+
     def build_page(self):
         paginator = None
         page = yt_paginate(
@@ -17,4 +54,40 @@ class SearchView(BaseSearchView):
             per_page=config.topics_per_page,
             page_number=self.request.GET.get('page', 1)
         )
+        page.object_list = self.load_topics(page.object_list)
         return paginator, page
+
+
+@login_required
+def suggest(request):
+    form = BasicSearchForm(data=request.GET)
+
+    if not form.is_valid():
+        return json_response({'suggestions': [], })
+
+    words = get_words(form.cleaned_data['q'])
+    # The words are only rebuilt when the topic gets
+    # indexed, a category may be removed or made
+    # private since then
+    topics = Topic.objects.visible()
+
+    if not words:
+        topics = topics.none()
+
+    # Whole words but the last one, which is a prefix
+    for word in words[:-1]:
+        topics = topics.filter(
+            pk__in=TopicTitleWord.objects.filter(word=word).values('topic_id'))
+
+    for word in words[-1:]:
+        topics = topics.filter(
+            pk__in=TopicTitleWord.objects.filter(word__startswith=word).values('topic_id'))
+
+    topics = topics\
+        .only('pk', 'title', 'slug', 'category_id')\
+        .order_by('-last_active', '-pk')[:settings.ST_SEARCH_SUGGESTIONS]
+    suggestions = [
+        {'title': topic.title, 'url': topic.get_absolute_url()}
+        for topic in topics]
+
+    return json_response({'suggestions': suggestions, })
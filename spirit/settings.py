@@ -9,17 +9,94 @@ import os
 ST_TOPIC_PRIVATE_CATEGORY_PK = 1
 ST_UNCATEGORIZED_CATEGORY_PK = 2
 
+ST_TOPIC_UNREAD_CACHE_PREFIX = 'stu'
+ST_TOPIC_UNREAD_CACHE = 'default'
+ST_TOPIC_UNREAD_CACHE_TIMEOUT = 60 * 60 * 24
+
+ST_TOPIC_NOTIFICATION_CACHE_PREFIX = 'stn'
+ST_TOPIC_NOTIFICATION_CACHE = 'default'
+ST_TOPIC_NOTIFICATION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Wakes up the clients waiting for notifications. The
+# CachePubSub checks the cache instead of the database,
+# the cache must be shared by all processes (ie: memcached)
+# and can't be the DatabaseCache. The DBPubSub expired
+# events are removed by the clean_notification_events task
+ST_NOTIFICATION_PUBSUB = 'spirit.topic.notification.pubsub.DBPubSub'
+ST_NOTIFICATION_PUBSUB_INTERVAL = 1  # Seconds
+ST_NOTIFICATION_PUBSUB_CACHE_PREFIX = 'snp'
+ST_NOTIFICATION_PUBSUB_CACHE = 'default'
+ST_NOTIFICATION_PUBSUB_CACHE_TIMEOUT = 60 * 60 * 24
+ST_NOTIFICATION_PUBSUB_DB_INTERVAL = 2
+ST_NOTIFICATION_PUBSUB_DB_RETENTION = 60 * 5
+ST_NOTIFICATION_POLL_TIMEOUT = 25
+
+ST_CATEGORY_CACHE_PREFIX = 'sct'
+ST_CATEGORY_CACHE = 'default'
+
 ST_RATELIMIT_ENABLE = True
 ST_RATELIMIT_CACHE_PREFIX = 'srl'
 ST_RATELIMIT_CACHE = 'default'
 
 ST_NOTIFICATIONS_PER_PAGE = 20
 
+# Threads running the background tasks when celery
+# is not configured, zero means run them right away.
+# Run "manage.py spiritsendnotifications" periodically
+# to send the notifications left pending by a crash
+ST_TASK_WORKERS = 0
+
+# Save the bookmark and read state of viewed
+# topics within a task, see ST_TASK_WORKERS
+ST_TOPIC_VIEWED_DEFER = False
+
 ST_MENTIONS_PER_COMMENT = 30
+ST_MENTIONS_CACHE_PREFIX = 'smt'
+ST_MENTIONS_CACHE = 'default'
+ST_MENTIONS_CACHE_TIMEOUT = 60 * 60 * 24
 
 ST_YT_PAGINATOR_PAGE_RANGE = 3
 
+ST_PAGINATOR_CACHE_PREFIX = 'spg'
+ST_PAGINATOR_CACHE = 'default'
+ST_PAGINATOR_CACHE_TIMEOUT = 60 * 60
+# Lifetime of the page anchors of the
+# active topics and category listings
+ST_SEEK_PAGINATOR_CACHE_TIMEOUT = 60
+
+# Buffer the view and like counts in the cache, the cache
+# must be shared by all processes and support atomic
+# increments (ie: memcached). Run "manage.py spiritflushcounters"
+# periodically or let the ST_TASK_WORKERS flush them
+ST_COUNTER_BUFFER_ENABLE = False
+ST_COUNTER_BUFFER_CACHE_PREFIX = 'scb'
+ST_COUNTER_BUFFER_CACHE = 'default'
+ST_COUNTER_BUFFER_CACHE_TIMEOUT = 60 * 60 * 24
+ST_COUNTER_BUFFER_INTERVAL = 60  # Seconds
+
+ST_COMMENT_RENDER_CACHE_PREFIX = 'scr'
+ST_COMMENT_RENDER_CACHE = 'default'
+ST_COMMENT_RENDER_CACHE_TIMEOUT = 60 * 60
+
 ST_SEARCH_QUERY_MIN_LEN = 3
+ST_SEARCH_SUGGESTIONS = 10
+# Topic ids of the recent searches, the cache is
+# invalidated by the index updates. The results are
+# read ST_SEARCH_CACHE_MAX_RESULTS at a time
+ST_SEARCH_CACHE_PREFIX = 'sse'
+ST_SEARCH_CACHE = 'default'
+ST_SEARCH_CACHE_TIMEOUT = 60
+ST_SEARCH_CACHE_MAX_RESULTS = 300
+# Topics and comments committed to the index
+# per batch by "manage.py spiritupdateindex"
+ST_SEARCH_INDEX_BATCH_SIZE = 1000
+# Index updates and rebuilds don't run concurrently, the
+# lock of a process that died is released after this time
+ST_SEARCH_INDEX_LOCK_TIMEOUT = 60 * 5  # Seconds
+# PostgreSQL text search configuration of the
+# database search backend, changing it requires
+# to re-create the index (see the migration)
+ST_SEARCH_DATABASE_LANGUAGE = 'english'
 
 ST_USER_LAST_SEEN_THRESHOLD_MINUTES = 1
 
@@ -159,3 +236,16 @@ HAYSTACK_CONNECTIONS = {
         'PATH': os.path.join(os.path.dirname(__file__), 'search/whoosh_index'),
     },
 }
+
+# Changed topics are queued, run "manage.py spiritupdateindex"
+# periodically (ie: cron) to get them indexed
+HAYSTACK_SIGNAL_PROCESSOR = 'spirit.search.signals.QueuedSignalProcessor'
+
+# To search within the database (PostgreSQL or SQLite) instead,
+# updating the index along with the topics, set:
+# HAYSTACK_CONNECTIONS = {
+#     'default': {
+#         'ENGINE': 'spirit.search.backends.DatabaseEngine',
+#     },
+# }
+# HAYSTACK_SIGNAL_PROCESSOR = 'spirit.search.signals.DatabaseSignalProcessor'
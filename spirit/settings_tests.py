@@ -49,6 +49,12 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
 
+HAYSTACK_CONNECTIONS.update({
+    'db': {
+        'ENGINE': 'spirit.search.backends.DatabaseEngine',
+    },
+})
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Keep templates in memory
@@ -7,26 +7,25 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q, Prefetch
 
 from ..comment.bookmark.models import CommentBookmark
+from ..category.utils import get_tree
 
 
 class TopicQuerySet(models.QuerySet):
 
     def unremoved(self):
-        return self.filter(Q(category__parent=None) | Q(category__parent__is_removed=False),
-                           category__is_removed=False,
-                           is_removed=False)
+        return self.filter(category_id__in=get_tree().unremoved_ids, is_removed=False)
 
     def public(self):
-        return self.filter(category__is_private=False)
+        return self.filter(category_id__in=get_tree().public_ids)
 
     def visible(self):
-        return self.unremoved().public()
+        return self.filter(category_id__in=get_tree().visible_ids, is_removed=False)
 
     def opened(self):
         return self.filter(is_closed=False)
 
     def global_(self):
-        return self.filter(category__is_global=True)
+        return self.filter(category_id__in=get_tree().global_ids)
 
     def for_category(self, category):
         if category.is_subcategory:
@@ -11,6 +11,7 @@ from django.db.models import F
 
 from .managers import TopicQuerySet
 from ..core.utils.models import AutoSlugField
+from ..core.utils import counters
 
 
 class Topic(models.Model):
@@ -73,14 +74,12 @@ class Topic(models.Model):
         return self.new_comments_count > 0
 
     def increase_view_count(self):
-        Topic.objects\
-            .filter(pk=self.pk)\
-            .update(view_count=F('view_count') + 1)
+        counters.incr(Topic, pk=self.pk, field='view_count')
 
-    def increase_comment_count(self):
+    def increase_comment_count(self, count=1):
         Topic.objects\
             .filter(pk=self.pk)\
-            .update(comment_count=F('comment_count') + 1, last_active=timezone.now())
+            .update(comment_count=F('comment_count') + count, last_active=timezone.now())
 
     def decrease_comment_count(self):
         # todo: update last_active to last() comment
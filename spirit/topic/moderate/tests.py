@@ -27,12 +27,14 @@ class TopicViewTest(TestCase):
 
         category = utils.create_category()
         topic = utils.create_topic(category)
+        comment = utils.create_comment(topic=topic)
         form_data = {}
         response = self.client.post(reverse('spirit:topic:moderate:delete', kwargs={'pk': topic.pk, }),
                                     form_data)
         expected_url = topic.get_absolute_url()
         self.assertRedirects(response, expected_url, status_code=302)
         self.assertTrue(Topic.objects.get(pk=topic.pk).is_removed)
+        self.assertFalse(Comment.objects.get(pk=comment.pk).is_visible)
 
     def test_topic_moderate_undelete(self):
         """
@@ -44,12 +46,14 @@ class TopicViewTest(TestCase):
 
         category = utils.create_category()
         topic = utils.create_topic(category, is_removed=True)
+        comment = utils.create_comment(topic=topic)
         form_data = {}
         response = self.client.post(reverse('spirit:topic:moderate:undelete', kwargs={'pk': topic.pk, }),
                                     form_data)
         expected_url = topic.get_absolute_url()
         self.assertRedirects(response, expected_url, status_code=302)
         self.assertFalse(Topic.objects.get(pk=topic.pk).is_removed)
+        self.assertTrue(Comment.objects.get(pk=comment.pk).is_visible)
 
     def test_topic_moderate_lock(self):
         """
@@ -9,6 +9,7 @@ from django.utils.decorators import method_decorator
 from ...core.utils.decorators import moderator_required
 from ...comment.models import Comment, CLOSED, UNCLOSED, PINNED, UNPINNED
 from ..models import Topic
+from ..signals import topics_updated
 
 
 class BaseView(View):
@@ -50,15 +51,27 @@ class BaseView(View):
         return super(BaseView, self).dispatch(*args, **kwargs)
 
 
-class DeleteView(BaseView):
+class RemoveBaseView(BaseView):
 
     field_name = 'is_removed'
+
+    def update(self, pk):
+        count = super(RemoveBaseView, self).update(pk)
+
+        if count:
+            Comment.sync_visibility(Comment.objects.filter(topic_id=pk))
+            topics_updated.send(sender=Topic, topic_ids=[pk, ])
+
+        return count
+
+
+class DeleteView(RemoveBaseView):
+
     to_value = True
 
 
-class UnDeleteView(BaseView):
+class UnDeleteView(RemoveBaseView):
 
-    field_name = 'is_removed'
     to_value = False
 
 
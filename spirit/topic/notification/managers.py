@@ -5,6 +5,8 @@ from __future__ import unicode_literals
 from django.db import models
 from django.db.models import Q
 
+from . import utils
+
 
 class TopicNotificationQuerySet(models.QuerySet):
 
@@ -27,5 +29,13 @@ class TopicNotificationQuerySet(models.QuerySet):
 
     def read(self, user):
         # returns updated rows count (int)
-        return self.filter(user=user)\
+        count = self.filter(user=user)\
             .update(is_read=True)
+
+        # The queryset may not cover all the user notifications
+        if self.model.objects.filter(user=user, is_read=False).exists():
+            utils.invalidate_unread_count(user_ids=[user.pk, ])
+        else:
+            utils.reset_unread_count(user_id=user.pk)
+
+        return count
@@ -9,6 +9,8 @@ from django.utils import timezone
 from django.db import IntegrityError, transaction
 
 from .managers import TopicNotificationQuerySet
+from .pubsub import get_pubsub
+from . import utils
 
 
 UNDEFINED, MENTION, COMMENT = range(3)
@@ -54,19 +56,30 @@ class TopicNotification(models.Model):
     def is_comment(self):
         return self.action == COMMENT
 
+    @classmethod
+    def _notified(cls, user_ids):
+        if not user_ids:
+            return
+
+        utils.incr_unread_count(user_ids=user_ids)
+        get_pubsub().publish(user_ids=user_ids)
+
     @classmethod
     def mark_as_read(cls, user, topic):
         if not user.is_authenticated():
             return
 
-        cls.objects\
-            .filter(user=user, topic=topic)\
+        count = cls.objects\
+            .filter(user=user, topic=topic, is_read=False)\
             .update(is_read=True)
 
+        if count:
+            utils.decr_unread_count(user_ids=[user.pk, ], delta=count)
+
     @classmethod
     def create_maybe(cls, user, comment, is_read=True, action=COMMENT):
         # Create a dummy notification
-        return cls.objects.get_or_create(
+        notification, created = cls.objects.get_or_create(
             user=user,
             topic=comment.topic,
             defaults={
@@ -77,43 +90,155 @@ class TopicNotification(models.Model):
             }
         )
 
+        if created and not is_read:
+            cls._notified(user_ids=[user.pk, ])
+
+        return notification, created
+
     @classmethod
     def notify_new_comment(cls, comment):
-        cls.objects\
+        # The notified ids are needed to count the notification
+        # and wake them up, the rows are then updated by pk
+        notifications = cls.objects\
             .filter(topic=comment.topic, is_active=True, is_read=True)\
             .exclude(user=comment.user)\
+            .values_list('pk', 'user_id')
+        notifications = list(notifications)
+
+        if not notifications:
+            return
+
+        cls.objects\
+            .filter(pk__in=[pk for pk, _ in notifications], is_read=True)\
             .update(comment=comment, is_read=False, action=COMMENT, date=timezone.now())
+        cls._notified(user_ids=[user_id for _, user_id in notifications])
 
     @classmethod
-    def notify_new_mentions(cls, comment, mentions):
-        if not mentions:
+    def notify_new_comments(cls, comments, new_posters=()):
+        """
+        Same as calling notify_new_comment() for each
+        comment of a burst, but in one or two queries.
+        *new_posters* are the users whose notification got
+        created right before their first comment of the burst
+        """
+        last_comment = comments[-1]
+        cls.notify_new_comment(comment=last_comment)
+
+        # The last poster gets notified of the last comment
+        # by others, unless it was posted before they subscribed
+        positions = [
+            position
+            for position, comment in enumerate(comments)
+            if comment.user_id != last_comment.user_id
+        ]
+
+        if not positions:
             return
 
-        # TODO: refactor
-        for username, user in mentions.items():
+        if last_comment.user_id in new_posters:
+            first_position = next(
+                position
+                for position, comment in enumerate(comments)
+                if comment.user_id == last_comment.user_id
+            )
+
+            if positions[-1] < first_position:
+                return
+
+        comment = comments[positions[-1]]
+        count = cls.objects\
+            .filter(user_id=last_comment.user_id, topic=comment.topic, is_active=True, is_read=True)\
+            .update(comment=comment, is_read=False, action=COMMENT, date=timezone.now())
+
+        if count:
+            cls._notified(user_ids=[last_comment.user_id, ])
+
+    @classmethod
+    def _create_many(cls, user_ids, comment, action):
+        notifications = [
+            cls(user_id=user_id,
+                topic_id=comment.topic_id,
+                comment=comment,
+                action=action,
+                is_active=True)
+            for user_id in user_ids
+        ]
+
+        try:
+            with transaction.atomic():
+                return cls.objects.bulk_create(notifications)
+        except IntegrityError:
+            pass
+
+        # Some were created concurrently
+        created = []
+
+        for notification in notifications:
             try:
                 with transaction.atomic():
-                    cls.objects.create(
-                        user=user,
-                        topic=comment.topic,
-                        comment=comment,
-                        action=MENTION,
-                        is_active=True
-                    )
+                    notification.save()
             except IntegrityError:
-                pass
+                continue
 
-        cls.objects\
-            .filter(user__in=mentions.values(), topic=comment.topic, is_read=True)\
-            .update(comment=comment, is_read=False, action=MENTION, date=timezone.now())
+            created.append(notification)
+
+        return created
+
+    @classmethod
+    def bulk_upsert(cls, users, comment, action):
+        """
+        Creates the notifications of the given users
+        for the comment's topic, existing ones are
+        marked as unread. This takes three queries
+        """
+        user_ids = {user.pk for user in users}
+
+        if not user_ids:
+            return []
+
+        existing = cls.objects\
+            .filter(user_id__in=user_ids, topic_id=comment.topic_id)\
+            .values_list('user_id', 'is_read')
+        existing = dict(existing)
+        new_ids = user_ids - set(existing.keys())
+        created = cls._create_many(
+            user_ids=sorted(new_ids),
+            comment=comment,
+            action=action
+        )
+        created_ids = {notification.user_id for notification in created}
+        existing_ids = set(existing.keys()) | (new_ids - created_ids)
+
+        if existing_ids:
+            cls.objects\
+                .filter(user_id__in=existing_ids, topic_id=comment.topic_id, is_read=True)\
+                .update(comment=comment, is_read=False, action=action, date=timezone.now())
+
+        # Rows created concurrently are not counted
+        read_ids = {user_id for user_id, is_read in existing.items() if is_read}
+        cls._notified(user_ids=created_ids | read_ids)
+        return created
+
+    @classmethod
+    def notify_new_mentions(cls, comment, mentions):
+        if not mentions:
+            return
+
+        cls.bulk_upsert(users=mentions.values(), comment=comment, action=MENTION)
 
     @classmethod
     def bulk_create(cls, users, comment):
-        return cls.objects.bulk_create([
-            cls(user=user,
-                topic=comment.topic,
-                comment=comment,
-                action=COMMENT,
-                is_active=True)
-            for user in users
-        ])
+        return cls.bulk_upsert(users=users, comment=comment, action=COMMENT)
+
+
+class TopicNotificationEvent(models.Model):
+    """
+    A user got a new notification, this
+    is written by the DBPubSub only
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+')
+    date = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = _("topic notification event")
+        verbose_name_plural = _("topics notification events")
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import time
+import random
+import datetime
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from ...core import tasks
+
+__all__ = ['CachePubSub', 'LocalPubSub', 'DBPubSub', 'get_pubsub']
+
+# Event ids must fit in a javascript number
+MAX_EVENT_ID = 2 ** 52
+
+
+def _get_cache():
+    return caches[settings.ST_NOTIFICATION_PUBSUB_CACHE]
+
+
+def _make_last_id_key(user_id):
+    return '%s:last:%s' % (settings.ST_NOTIFICATION_PUBSUB_CACHE_PREFIX, user_id)
+
+
+class CachePubSub(object):
+    """
+    Keeps the last event id of every user in the
+    ST_NOTIFICATION_PUBSUB_CACHE, shared by every
+    process. Waiters check it every
+    ST_NOTIFICATION_PUBSUB_INTERVAL seconds, and
+    right away on events published by their process.
+    The DatabaseCache is refused, every waiter
+    would query the database on each check
+    """
+
+    def __init__(self):
+        if isinstance(_get_cache(), DatabaseCache):
+            raise ImproperlyConfigured(
+                'The CachePubSub can not use the DatabaseCache, '
+                'use the DBPubSub instead')
+
+        self.condition = threading.Condition()
+
+    def publish(self, user_ids):
+        # Random ids don't need a shared counter,
+        # any different id counts as new
+        last_id = random.randint(1, MAX_EVENT_ID)
+        _get_cache().set_many(
+            {_make_last_id_key(user_id): last_id for user_id in user_ids},
+            timeout=settings.ST_NOTIFICATION_PUBSUB_CACHE_TIMEOUT
+        )
+
+        with self.condition:
+            self.condition.notify_all()
+
+    def get_last_id(self, user_id):
+        return _get_cache().get(_make_last_id_key(user_id), 0)
+
+    def wait(self, user_id, last_id, timeout):
+        deadline = time.time() + timeout
+
+        while True:
+            current_id = self.get_last_id(user_id)
+
+            if current_id != last_id:
+                return current_id
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                return current_id
+
+            with self.condition:
+                self.condition.wait(min(remaining, settings.ST_NOTIFICATION_PUBSUB_INTERVAL))
+
+
+class LocalPubSub(object):
+    """
+    Keeps the last event id of every user in memory.
+    Waiters are woken up right away, but only
+    within the process that published the event,
+    so it's only fit for single process setups
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.last_ids = {}
+        self.counter = 0
+
+    def publish(self, user_ids):
+        with self.condition:
+            for user_id in user_ids:
+                self.counter += 1
+                self.last_ids[user_id] = self.counter
+
+            self.condition.notify_all()
+
+    def get_last_id(self, user_id):
+        return self.last_ids.get(user_id, 0)
+
+    def wait(self, user_id, last_id, timeout):
+        # The ids may restart, so any
+        # different id counts as new
+        deadline = time.time() + timeout
+
+        with self.condition:
+            while self.get_last_id(user_id) == last_id:
+                remaining = deadline - time.time()
+
+                if remaining <= 0:
+                    break
+
+                self.condition.wait(remaining)
+
+            return self.get_last_id(user_id)
+
+
+class DBPubSub(object):
+    """
+    Stores the events in a table, so they are seen
+    by every process. Waiters check for new events
+    every ST_NOTIFICATION_PUBSUB_DB_INTERVAL seconds.
+    The expired events are removed by a task, delayed
+    once every ST_NOTIFICATION_PUBSUB_DB_RETENTION seconds
+    """
+
+    def __init__(self):
+        self.next_clean = 0
+
+    def _clean_maybe(self):
+        now = time.time()
+
+        if now < self.next_clean:
+            return
+
+        self.next_clean = now + settings.ST_NOTIFICATION_PUBSUB_DB_RETENTION
+        tasks.clean_notification_events.delay()
+
+    @staticmethod
+    def clean():
+        """
+        Removes the expired events
+        """
+        from .models import TopicNotificationEvent  # Avoid circular import
+
+        expired = timezone.now() - datetime.timedelta(
+            seconds=settings.ST_NOTIFICATION_PUBSUB_DB_RETENTION)
+        TopicNotificationEvent.objects\
+            .filter(date__lt=expired)\
+            .delete()
+
+    def publish(self, user_ids):
+        from .models import TopicNotificationEvent  # Avoid circular import
+
+        TopicNotificationEvent.objects.bulk_create([
+            TopicNotificationEvent(user_id=user_id)
+            for user_id in user_ids
+        ])
+
+        self._clean_maybe()
+
+    def get_last_id(self, user_id):
+        from .models import TopicNotificationEvent  # Avoid circular import
+
+        last_id = TopicNotificationEvent.objects\
+            .filter(user_id=user_id)\
+            .order_by('-pk')\
+            .values_list('pk', flat=True)\
+            .first()
+        return last_id or 0
+
+    def wait(self, user_id, last_id, timeout):
+        deadline = time.time() + timeout
+
+        while True:
+            current_id = self.get_last_id(user_id)
+
+            if current_id != last_id:
+                return current_id
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                return current_id
+
+            time.sleep(min(remaining, settings.ST_NOTIFICATION_PUBSUB_DB_INTERVAL))
+
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+def get_pubsub():
+    """
+    Returns the ST_NOTIFICATION_PUBSUB instance
+    """
+    global _pubsub
+
+    with _pubsub_lock:
+        if _pubsub is None or _pubsub.__class__ is not import_string(settings.ST_NOTIFICATION_PUBSUB):
+            _pubsub = import_string(settings.ST_NOTIFICATION_PUBSUB)()
+
+    return _pubsub
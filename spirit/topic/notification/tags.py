@@ -5,11 +5,12 @@ from __future__ import unicode_literals
 from ...core.tags.registry import register
 from .models import TopicNotification
 from .forms import NotificationForm
+from .utils import get_unread_count
 
 
 @register.assignment_tag()
 def has_topic_notifications(user):
-    return TopicNotification.objects.for_access(user=user).unread().exists()
+    return get_unread_count(user=user) > 0
 
 
 @register.inclusion_tag('spirit/topic/notification/_form.html')
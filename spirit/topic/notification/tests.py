@@ -3,20 +3,25 @@
 from __future__ import unicode_literals
 import json
 import datetime
+import threading
 
 from django.test import TestCase, RequestFactory
 from django.test.utils import override_settings
 from django.core.urlresolvers import reverse
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.template import Template, Context
 from django.utils import timezone
 
 from djconfig.utils import override_djconfig
 
 from ...core.tests import utils
-from .models import TopicNotification, COMMENT, MENTION
+from .models import TopicNotification, TopicNotificationEvent, COMMENT, MENTION
+from .pubsub import CachePubSub, LocalPubSub, DBPubSub, get_pubsub
 from .forms import NotificationCreationForm, NotificationForm
 from .tags import render_notification_form, has_topic_notifications
+from .utils import get_unread_count
+from . import utils as notification_utils
 
 
 @override_settings(ST_NOTIFICATIONS_PER_PAGE=1)
@@ -170,6 +175,55 @@ class TopicNotificationViewTest(TestCase):
         self.assertDictEqual(res['n'][0], expected)
         self.assertFalse(TopicNotification.objects.get(pk=self.topic_notification.pk).is_read)
 
+    def test_topic_notification_unread_count(self):
+        """
+        Should return the count, or 304 when unchanged
+        """
+        utils.login(self)
+        response = self.client.get(reverse('spirit:topic:notification:unread-count'))
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'count': 1, })
+        etag = response['ETag']
+
+        response = self.client.get(reverse('spirit:topic:notification:unread-count'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        TopicNotification.mark_as_read(user=self.user, topic=self.topic)
+        response = self.client.get(reverse('spirit:topic:notification:unread-count'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'count': 0, })
+
+    @override_settings(ST_NOTIFICATION_POLL_TIMEOUT=1)
+    def test_topic_notification_poll(self):
+        """
+        Should return the last event and the count
+        """
+        utils.login(self)
+        TopicNotification.mark_as_read(user=self.user, topic=self.topic)
+        response = self.client.get(reverse('spirit:topic:notification:poll'))
+        res = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(res['count'], 0)
+        last_id = res['last']
+
+        comment = utils.create_comment(topic=self.topic)
+        TopicNotification.notify_new_comment(comment)
+        response = self.client.get(reverse('spirit:topic:notification:poll') + '?last=%s' % last_id)
+        res = json.loads(response.content.decode('utf-8'))
+        self.assertNotEqual(res['last'], last_id)
+        self.assertEqual(res['count'], 1)
+
+    @override_settings(ST_NOTIFICATION_POLL_TIMEOUT=0)
+    def test_topic_notification_poll_timeout(self):
+        """
+        Should return the same event when there are no new ones
+        """
+        utils.login(self)
+        response = self.client.get(reverse('spirit:topic:notification:poll') + '?last=foo')
+        last_id = json.loads(response.content.decode('utf-8'))['last']
+        response = self.client.get(reverse('spirit:topic:notification:poll') + '?last=%s' % last_id)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['last'], last_id)
+
     def test_topic_notification_ajax_limit(self):
         """
         get first N notifications
@@ -396,6 +450,57 @@ class TopicNotificationModelsTest(TestCase):
         notification = TopicNotification.objects.get(user=private.user, topic=private.topic)
         self.assertTrue(notification.is_read)
 
+    def test_topic_notification_unread_count(self):
+        """
+        Should keep the cached count up to date
+        """
+        user = self.user2
+        self.assertEqual(get_unread_count(user), 0)
+
+        comment = utils.create_comment(topic=self.topic)
+        TopicNotification.notify_new_comment(comment)
+        self.assertEqual(get_unread_count(user), 1)
+
+        # Already unread
+        TopicNotification.notify_new_comment(comment)
+        TopicNotification.notify_new_mentions(comment, mentions={user.username: user})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(user), 1)
+
+        # Notified users get their count incremented
+        topic = utils.create_topic(self.category)
+        comment = utils.create_comment(topic=topic)
+        TopicNotification.notify_new_mentions(comment, mentions={user.username: user})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(user), 2)
+
+        TopicNotification.mark_as_read(user=user, topic=topic)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(user), 1)
+
+        # Not all the notifications got read
+        TopicNotification.objects.filter(topic=topic).read(user=user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_unread_count(user), 1)
+
+        TopicNotification.objects.read(user=user)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(user), 0)
+
+    def test_topic_notification_unread_count_not_cached(self):
+        """
+        Should not increment the counts not computed yet
+        """
+        comment = utils.create_comment(topic=self.topic)
+        TopicNotification.notify_new_comment(comment)
+        self.assertIsNone(cache.get(notification_utils._make_count_key(self.user2.pk)))
+        self.assertEqual(get_unread_count(self.user2), 1)
+
     def test_topic_notification_create_maybe(self):
         """
         Should create a notification if does not exists
@@ -476,6 +581,48 @@ class TopicNotificationModelsTest(TestCase):
         self.assertEqual(TopicNotification.objects.get(pk=self.topic_notification.pk).action, MENTION)
         self.assertFalse(TopicNotification.objects.get(pk=self.topic_notification.pk).is_read)
 
+    def test_topic_notification_notify_new_mentions_queries(self):
+        """
+        Should take a constant number of queries
+        """
+        users = [utils.create_user() for _ in range(5)]
+        mentions = {user.username: user for user in users}
+        mentions[self.user.username] = self.user
+        comment = utils.create_comment(topic=self.topic)
+
+        with self.assertNumQueries(6):  # 3 + savepoint + pubsub event
+            TopicNotification.notify_new_mentions(comment=comment, mentions=mentions)
+
+        self.assertEqual(
+            TopicNotification.objects.filter(comment=comment, action=MENTION, is_read=False).count(), 6)
+        self.assertEqual(TopicNotification.objects.get(pk=self.topic_notification.pk).comment, comment)
+
+    def test_topic_notification_bulk_upsert(self):
+        """
+        Should create the missing notifications and mark the existing ones as unread
+        """
+        user = utils.create_user()
+        comment = utils.create_comment(topic=self.topic)
+        TopicNotification.objects.filter(pk=self.topic_notification2.pk).update(is_read=False)
+        created = TopicNotification.bulk_upsert(
+            users=[self.user, self.user2, user], comment=comment, action=COMMENT)
+        self.assertEqual([n.user for n in created], [user])
+
+        notification = TopicNotification.objects.get(user=user, topic=self.topic)
+        self.assertTrue(notification.is_active)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment)
+
+        notification = TopicNotification.objects.get(pk=self.topic_notification.pk)
+        self.assertFalse(notification.is_read)
+        self.assertEqual(notification.comment, comment)
+
+        # Already unread
+        notification = TopicNotification.objects.get(pk=self.topic_notification2.pk)
+        self.assertEqual(notification.comment, self.comment)
+
+        self.assertEqual(TopicNotification.bulk_upsert(users=[], comment=comment, action=COMMENT), [])
+
 
 class TopicNotificationTemplateTagsTest(TestCase):
 
@@ -504,7 +651,7 @@ class TopicNotificationTemplateTagsTest(TestCase):
         out = template.render(context)
         self.assertEqual(out, "True")
 
-        TopicNotification.objects.all().update(is_read=True)
+        TopicNotification.objects.read(user=self.user)
         out = template.render(context)
         self.assertEqual(out, "False")
 
@@ -557,3 +704,125 @@ class TopicNotificationTemplateTagsTest(TestCase):
         topic2 = utils.create_topic(self.category)
         context = render_notification_form(self.user, topic2)
         self.assertIsNone(context['notification'])
+
+
+class TopicNotificationPubSubTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = utils.create_user()
+        self.user2 = utils.create_user()
+
+    def test_cache_pubsub(self):
+        """
+        Should wake up the waiters
+        """
+        pubsub = CachePubSub()
+        self.assertEqual(pubsub.get_last_id(self.user.pk), 0)
+        self.assertEqual(pubsub.wait(self.user.pk, last_id=0, timeout=0), 0)
+
+        timer = threading.Timer(0.1, pubsub.publish, kwargs={'user_ids': [self.user.pk, ]})
+        timer.start()
+        try:
+            last_id = pubsub.wait(self.user.pk, last_id=0, timeout=10)
+        finally:
+            timer.cancel()
+
+        self.assertNotEqual(last_id, 0)
+        self.assertEqual(pubsub.get_last_id(self.user2.pk), 0)
+
+        # Events published by another process
+        self.assertEqual(CachePubSub().get_last_id(self.user.pk), last_id)
+
+    @override_settings(ST_NOTIFICATION_PUBSUB_INTERVAL=0.01)
+    def test_cache_pubsub_other_process(self):
+        """
+        Should see the events published by other processes
+        """
+        pubsub = CachePubSub()
+        timer = threading.Timer(0.1, CachePubSub().publish, kwargs={'user_ids': [self.user.pk, ]})
+        timer.start()
+        try:
+            last_id = pubsub.wait(self.user.pk, last_id=0, timeout=10)
+        finally:
+            timer.cancel()
+
+        self.assertNotEqual(last_id, 0)
+
+    def test_local_pubsub(self):
+        """
+        Should wake up the waiters
+        """
+        pubsub = LocalPubSub()
+        self.assertEqual(pubsub.get_last_id(self.user.pk), 0)
+        self.assertEqual(pubsub.wait(self.user.pk, last_id=0, timeout=0), 0)
+
+        timer = threading.Timer(0.1, pubsub.publish, kwargs={'user_ids': [self.user.pk, ]})
+        timer.start()
+        try:
+            last_id = pubsub.wait(self.user.pk, last_id=0, timeout=10)
+        finally:
+            timer.cancel()
+
+        self.assertEqual(last_id, 1)
+        self.assertEqual(pubsub.get_last_id(self.user2.pk), 0)
+
+        # Ids of a restarted process
+        self.assertEqual(pubsub.wait(self.user.pk, last_id=99, timeout=10), 1)
+
+    @override_settings(ST_NOTIFICATION_PUBSUB_DB_INTERVAL=0.01)
+    def test_db_pubsub(self):
+        """
+        Should store the events
+        """
+        pubsub = DBPubSub()
+        self.assertEqual(pubsub.get_last_id(self.user.pk), 0)
+        self.assertEqual(pubsub.wait(self.user.pk, last_id=0, timeout=0.05), 0)
+
+        pubsub.publish(user_ids=[self.user.pk, self.user2.pk])
+        last_id = pubsub.get_last_id(self.user.pk)
+        self.assertNotEqual(last_id, 0)
+        self.assertEqual(pubsub.wait(self.user.pk, last_id=0, timeout=10), last_id)
+        self.assertEqual(TopicNotificationEvent.objects.count(), 2)
+
+    def test_db_pubsub_clean(self):
+        """
+        Should remove the expired events once in a while
+        """
+        pubsub = DBPubSub()
+        pubsub.publish(user_ids=[self.user.pk, self.user2.pk])
+        TopicNotificationEvent.objects.all().update(date=timezone.now() - datetime.timedelta(days=1))
+
+        # Not on every publish
+        pubsub.publish(user_ids=[self.user.pk, ])
+        self.assertEqual(TopicNotificationEvent.objects.count(), 3)
+
+        pubsub.next_clean = 0
+        pubsub.publish(user_ids=[self.user.pk, ])
+        self.assertEqual(TopicNotificationEvent.objects.count(), 2)
+
+        TopicNotificationEvent.objects.all().update(date=timezone.now() - datetime.timedelta(days=1))
+        DBPubSub.clean()
+        self.assertEqual(TopicNotificationEvent.objects.count(), 0)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'spirit_cache'}})
+    def test_cache_pubsub_db_cache(self):
+        """
+        Should refuse the DatabaseCache
+        """
+        self.assertRaises(ImproperlyConfigured, CachePubSub)
+
+    @override_settings(ST_NOTIFICATION_PUBSUB='spirit.topic.notification.pubsub.DBPubSub')
+    def test_get_pubsub(self):
+        """
+        Should publish the new notifications
+        """
+        self.assertIsInstance(get_pubsub(), DBPubSub)
+        category = utils.create_category()
+        comment = utils.create_comment(topic=utils.create_topic(category))
+        TopicNotification.notify_new_mentions(comment, mentions={self.user.username: self.user})
+        self.assertEqual(
+            list(TopicNotificationEvent.objects.values_list('user_id', flat=True)),
+            [self.user.pk, ]
+        )
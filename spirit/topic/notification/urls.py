@@ -11,6 +11,8 @@ urlpatterns = [
     url(r'^$', views.index, name='index'),
     url(r'^unread/$', views.index_unread, name='index-unread'),
     url(r'^ajax/$', views.index_ajax, name='index-ajax'),
+    url(r'^unread/count/$', views.unread_count, name='unread-count'),
+    url(r'^poll/$', views.poll, name='poll'),
     url(r'^(?P<topic_id>\d+)/create/$', views.create, name='create'),
     url(r'^(?P<pk>\d+)/update/$', views.update, name='update'),
 ]
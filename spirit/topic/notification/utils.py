@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.core.cache import caches
+
+__all__ = [
+    'get_unread_count',
+    'invalidate_unread_count',
+    'incr_unread_count',
+    'decr_unread_count',
+    'reset_unread_count'
+]
+
+
+def _make_count_key(user_id):
+    return '%s:count:%s' % (settings.ST_TOPIC_NOTIFICATION_CACHE_PREFIX, user_id)
+
+
+def _get_cache():
+    return caches[settings.ST_TOPIC_NOTIFICATION_CACHE]
+
+
+def get_unread_count(user):
+    """
+    Returns the number of unread notifications
+    of the user. The count is computed once and
+    then kept up to date by the notification
+    model, until it expires
+    """
+    from .models import TopicNotification  # Avoid circular import
+
+    cache = _get_cache()
+    key = _make_count_key(user.pk)
+    count = cache.get(key)
+
+    if count is None:
+        count = TopicNotification.objects\
+            .for_access(user=user)\
+            .unread()\
+            .count()
+        cache.add(key, count, timeout=settings.ST_TOPIC_NOTIFICATION_CACHE_TIMEOUT)
+
+    # Decrements may go below zero
+    # on backends other than memcached
+    return max(count, 0)
+
+
+def invalidate_unread_count(user_ids):
+    """
+    Drops the counts of the users, they
+    get computed again on their next access
+    """
+    _get_cache().delete_many([_make_count_key(user_id) for user_id in user_ids])
+
+
+def incr_unread_count(user_ids):
+    """
+    Adds a notification to the counts of the
+    users. Only the cached counts are incremented,
+    the rest get computed on their next access
+    """
+    cache = _get_cache()
+    keys = [_make_count_key(user_id) for user_id in user_ids]
+
+    for key in cache.get_many(keys):
+        try:
+            cache.incr(key)
+        except ValueError:  # Expired in between
+            continue
+
+
+def decr_unread_count(user_ids, delta=1):
+    cache = _get_cache()
+
+    for user_id in user_ids:
+        try:
+            cache.decr(_make_count_key(user_id), delta)
+        except ValueError:  # Not computed yet
+            continue
+
+
+def reset_unread_count(user_id):
+    _get_cache().set(
+        _make_count_key(user_id),
+        0,
+        timeout=settings.ST_TOPIC_NOTIFICATION_CACHE_TIMEOUT
+    )
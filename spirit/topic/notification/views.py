@@ -5,10 +5,11 @@ import json
 
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, etag
 from django.http import Http404, HttpResponse
 from django.conf import settings
 from django.contrib import messages
+from django.db import connection
 from django.utils.html import escape
 
 from djconfig import config
@@ -19,6 +20,8 @@ from ...core.utils.paginator.infinite_paginator import paginate
 from ...topic.models import Topic
 from .models import TopicNotification
 from .forms import NotificationForm, NotificationCreationForm
+from .utils import get_unread_count
+from .pubsub import get_pubsub
 
 
 @require_POST
@@ -76,6 +79,57 @@ def index_ajax(request):
     return HttpResponse(json.dumps({'n': notifications, }), content_type="application/json")
 
 
+def _unread_count_etag(request):
+    if not request.user.is_authenticated():
+        return
+
+    return '%s-%s' % (request.user.pk, get_unread_count(user=request.user))
+
+
+@login_required
+@etag(_unread_count_etag)
+def unread_count(request):
+    # Cheap enough to be polled, the
+    # count comes from the cache
+    count = get_unread_count(user=request.user)
+    return HttpResponse(json.dumps({'count': count, }), content_type="application/json")
+
+
+@login_required
+def poll(request):
+    """
+    Long-poll for new notifications. The response
+    is sent once there is a notification newer than
+    *last* or when ST_NOTIFICATION_POLL_TIMEOUT
+    is reached. Without *last* it returns right away.
+    This holds a thread while waiting
+    """
+    pubsub = get_pubsub()
+
+    try:
+        last_id = int(request.GET['last'])
+    except (KeyError, ValueError):
+        last_id = pubsub.get_last_id(user_id=request.user.pk)
+    else:
+        # Idle clients should not hold a
+        # database connection while waiting
+        if not connection.in_atomic_block:
+            connection.close()
+
+        last_id = pubsub.wait(
+            user_id=request.user.pk,
+            last_id=last_id,
+            timeout=settings.ST_NOTIFICATION_POLL_TIMEOUT
+        )
+
+    data = {
+        'last': last_id,
+        'count': get_unread_count(user=request.user)
+    }
+
+    return HttpResponse(json.dumps(data), content_type="application/json")
+
+
 @login_required
 def index_unread(request):
     notifications = TopicNotification.objects\
@@ -14,10 +14,11 @@ from django.conf import settings
 from djconfig import config
 
 from ...core import utils
-from ...core.utils.paginator import paginate, yt_paginate
+from ...core.utils import counters
+from ...core.utils.paginator import keyset_paginate, yt_paginate
 from ...core.utils.ratelimit.decorators import ratelimit
 from ...comment.forms import CommentForm
-from ...comment.utils import comment_posted
+from ...comment.utils import comment_posted, get_comments_page_index_uid
 from ...comment.models import Comment
 from ..models import Topic
 from ..utils import topic_viewed
@@ -83,14 +84,16 @@ def detail(request, topic_id, slug):
     comments = Comment.objects\
         .for_topic(topic=topic)\
         .with_likes(user=request.user)\
-        .with_polls(user=request.user)\
-        .order_by('date')
+        .with_polls(user=request.user)
 
-    comments = paginate(
+    comments = keyset_paginate(
         comments,
         per_page=config.comments_per_page,
-        page_number=request.GET.get('page', 1)
+        page_number=request.GET.get('page', 1),
+        ordering=('date', 'pk'),
+        uid=get_comments_page_index_uid(topic.pk)
     )
+    counters.add_pending(comments, field='likes_count')
 
     context = {
         'topic': topic,
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from django.dispatch import Signal
+
+# Sent after updating topics through a
+# queryset, which skips the model signals
+topics_updated = Signal(providing_args=['topic_ids'])
@@ -8,11 +8,13 @@ from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
+from django.test.utils import override_settings
 
 from djconfig.utils import override_djconfig
 
 from ..core.tests import utils
 from . import utils as utils_topic
+from ..core import tasks
 from ..comment.models import MOVED
 from .models import Topic
 from .forms import TopicForm
@@ -184,6 +186,50 @@ class TopicViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(list(response.context['comments']), [comment1, comment2])
 
+    @override_settings(ST_COUNTER_BUFFER_ENABLE=True)
+    def test_topic_detail_view_buffered_likes(self):
+        """
+        should display the buffered likes count
+        """
+        utils.login(self)
+        category = utils.create_category()
+        topic = utils.create_topic(category=category)
+        comment = utils.create_comment(topic=topic)
+        comment.increase_likes_count()
+        self.assertEqual(Comment.objects.get(pk=comment.pk).likes_count, 0)
+
+        response = self.client.get(reverse('spirit:topic:detail', kwargs={'pk': topic.pk, 'slug': topic.slug}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['comments'][0].likes_count, 1)
+
+    @override_djconfig(comments_per_page=2)
+    def test_topic_detail_view_paginate_seek(self):
+        """
+        should display topic with comments, page 2
+        """
+        utils.login(self)
+        category = utils.create_category()
+
+        topic = utils.create_topic(category=category)
+
+        utils.create_comment(topic=topic)  # comment1
+        utils.create_comment(topic=topic)  # comment2
+        comment3 = utils.create_comment(topic=topic)
+
+        url = reverse('spirit:topic:detail', kwargs={'pk': topic.pk, 'slug': topic.slug})
+        response = self.client.get(url, {'page': 2, })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['comments']), [comment3, ])
+        self.assertEqual(response.context['comments'].start_index(), 3)
+
+        # new comments are appended to the page index
+        comment4 = utils.create_comment(topic=topic)
+        response = self.client.get(url, {'page': 2, })
+        self.assertEqual(list(response.context['comments']), [comment3, comment4])
+
+        response = self.client.get(url, {'page': 3, })
+        self.assertEqual(response.status_code, 404)
+
     def test_topic_detail_viewed(self):
         """
         Calls utils.topic_viewed
@@ -319,6 +365,16 @@ class TopicViewTest(TestCase):
         response = self.client.get(reverse('spirit:topic:index-active'))
         self.assertEqual(list(response.context['topics']), [topic_b, ])
 
+        response = self.client.get(reverse('spirit:topic:index-active') + '?page=2')
+        self.assertEqual(list(response.context['topics']), [topic_a, ])
+
+        cursor = response.context['topics'].previous_cursor
+        response = self.client.get(reverse('spirit:topic:index-active') + '?cursor=' + cursor)
+        self.assertEqual(list(response.context['topics']), [topic_b, ])
+
+        response = self.client.get(reverse('spirit:topic:index-active') + '?cursor=foo')
+        self.assertEqual(response.status_code, 404)
+
 
 class TopicFormTest(TestCase):
 
@@ -399,6 +455,46 @@ class TopicUtilsTest(TestCase):
         self.assertTrue(TopicUnread.objects.get(pk=unread.pk).is_read)
         self.assertEqual(Topic.objects.get(pk=topic.pk).view_count, 1)
 
+    def test_topic_viewed_queries(self):
+        """
+        Should take one query per write
+        """
+        req = RequestFactory().get('/?page=1')
+        req.user = self.user
+        category = utils.create_category()
+        topic = utils.create_topic(category=category, user=self.user)
+
+        with self.assertNumQueries(4):
+            utils_topic.topic_viewed(req, topic)
+
+        self.assertEqual(len(CommentBookmark.objects.filter(user=self.user, topic=topic)), 1)
+        self.assertTrue(TopicUnread.objects.get(user=self.user, topic=topic).is_read)
+
+    @override_settings(ST_TOPIC_VIEWED_DEFER=True)
+    def test_topic_viewed_defer(self):
+        """
+        Should mark the topic as viewed within a task
+        """
+        req = RequestFactory().get('/?page=1')
+        req.user = self.user
+        category = utils.create_category()
+        topic = utils.create_topic(category=category, user=self.user)
+        calls = []
+
+        org_delay, tasks.topic_viewed.delay = tasks.topic_viewed.delay, lambda **kwargs: calls.append(kwargs)
+        try:
+            utils_topic.topic_viewed(req, topic)
+        finally:
+            tasks.topic_viewed.delay = org_delay
+
+        self.assertEqual(calls, [{'user_id': self.user.pk, 'topic_id': topic.pk, 'comment_number': 1}])
+        self.assertFalse(TopicUnread.objects.filter(user=self.user, topic=topic).exists())
+        self.assertEqual(Topic.objects.get(pk=topic.pk).view_count, 1)
+
+        tasks.topic_viewed(**calls[0])
+        self.assertEqual(len(CommentBookmark.objects.filter(user=self.user, topic=topic)), 1)
+        self.assertTrue(TopicUnread.objects.get(user=self.user, topic=topic).is_read)
+
 
 class TopicModelsTest(TestCase):
 
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spirit_topic_unread', '0002_auto_20150828_2003'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='topicunread',
+            index_together=set([('user', 'is_read', 'date')]),
+        ),
+    ]
@@ -5,8 +5,20 @@ from __future__ import unicode_literals
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from django.conf import settings
+from django.core.cache import caches
 from django.utils import timezone
 
+from ...core.utils.db import upsert
+from ..models import Topic
+
+
+def _make_count_key(user_id):
+    return '%s:count:%s' % (settings.ST_TOPIC_UNREAD_CACHE_PREFIX, user_id)
+
+
+def _get_cache():
+    return caches[settings.ST_TOPIC_UNREAD_CACHE]
+
 
 class TopicUnread(models.Model):
 
@@ -18,6 +30,7 @@ class TopicUnread(models.Model):
 
     class Meta:
         unique_together = ('user', 'topic')
+        index_together = [('user', 'is_read', 'date')]
         ordering = ['-date', '-pk']
         verbose_name = _("topic unread")
         verbose_name_plural = _("topics unread")
@@ -30,15 +43,77 @@ class TopicUnread(models.Model):
         if not user.is_authenticated():
             return
 
-        return cls.objects.update_or_create(
+        written = upsert(
+            cls,
+            lookup={'user': user, 'topic': topic},
+            values={'is_read': True, }
+        )
+
+        if written:
+            cls.invalidate_unread_count(user_ids=[user.pk, ])
+
+    @classmethod
+    def get_unread(cls, user):
+        """
+        Returns the unread rows of the user, the topics
+        the user can no longer access (ie: removed or
+        made private) are left out
+        """
+        return cls.objects.filter(
             user=user,
-            topic=topic,
-            defaults={'is_read': True, }
+            is_read=False,
+            topic__in=Topic.objects.for_access(user=user)
+        )
+
+    @classmethod
+    def get_unread_count(cls, user):
+        """
+        Returns the number of unread topics of the
+        user. The count is cached until one of
+        the user topics gets read or unread, or
+        the user visits the unread topics page
+        """
+        cache = _get_cache()
+        key = _make_count_key(user.pk)
+        count = cache.get(key)
+
+        if count is None:
+            count = cls.get_unread(user=user).count()
+            cache.set(key, count, timeout=settings.ST_TOPIC_UNREAD_CACHE_TIMEOUT)
+
+        return count
+
+    @classmethod
+    def invalidate_unread_count(cls, user_ids):
+        _get_cache().delete_many([_make_count_key(user_id) for user_id in user_ids])
+
+    @classmethod
+    def _unread(cls, unread):
+        # Only the users with the topic read
+        # so far have their count changed
+        user_ids = list(
+            unread
+            .filter(is_read=True)
+            .values_list('user_id', flat=True)
         )
+        unread.update(is_read=False, date=timezone.now())
+        cls.invalidate_unread_count(user_ids=user_ids)
 
     @classmethod
     def unread_new_comment(cls, comment):
-        cls.objects\
+        unread = cls.objects\
             .filter(topic=comment.topic)\
-            .exclude(user=comment.user)\
-            .update(is_read=False, date=timezone.now())
+            .exclude(user=comment.user)
+        cls._unread(unread)
+
+    @classmethod
+    def unread_new_comments(cls, comments):
+        # Posters have comments by others to read,
+        # unless they are the only poster of the burst
+        posters = {comment.user_id for comment in comments}
+        unread = cls.objects.filter(topic=comments[-1].topic)
+
+        if len(posters) == 1:
+            unread = unread.exclude(user_id=posters.pop())
+
+        cls._unread(unread)
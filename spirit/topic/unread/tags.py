@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+from ...core.tags.registry import register
+from .models import TopicUnread
+
+
+@register.assignment_tag()
+def get_topics_unread_count(user):
+    return TopicUnread.get_unread_count(user=user)
@@ -6,8 +6,11 @@ from django.core.cache import cache
 from django.test import TestCase, RequestFactory
 from django.core.urlresolvers import reverse
 
+from djconfig.utils import override_djconfig
+
 from ...core.tests import utils
 from .models import TopicUnread
+from ..models import Topic
 from ...comment.bookmark.models import CommentBookmark
 
 
@@ -37,11 +40,26 @@ class TopicUnreadViewTest(TestCase):
 
         utils.login(self)
         response = self.client.get(reverse('spirit:topic:unread:index'))
-        self.assertEqual(list(response.context['page']), [self.topic2, self.topic])
+        self.assertEqual(response.context['topics'], [self.topic2, self.topic])
+
+    @override_djconfig(topics_per_page=1)
+    def test_topic_unread_list_paginate(self):
+        """
+        topic unread list paginated
+        """
+        TopicUnread.objects.filter(pk__in=[self.topic_unread.pk, self.topic_unread2.pk])\
+            .update(is_read=False)
 
-        # fake next page
-        response = self.client.get(reverse('spirit:topic:unread:index') + "?topic_id=" + str(self.topic2.pk))
-        self.assertEqual(list(response.context['page']), [self.topic, ])
+        utils.login(self)
+        response = self.client.get(reverse('spirit:topic:unread:index'))
+        self.assertEqual(response.context['topics'], [self.topic2, ])
+
+        cursor = response.context['page'].next_cursor
+        response = self.client.get(reverse('spirit:topic:unread:index') + "?cursor=" + cursor)
+        self.assertEqual(response.context['topics'], [self.topic, ])
+
+        response = self.client.get(reverse('spirit:topic:unread:index') + "?page=2")
+        self.assertEqual(response.context['topics'], [self.topic, ])
 
     def test_topic_unread_list_show_private_topic(self):
         """
@@ -54,7 +72,7 @@ class TopicUnreadViewTest(TestCase):
 
         utils.login(self)
         response = self.client.get(reverse('spirit:topic:unread:index'))
-        self.assertEqual(list(response.context['page']), [topic_a.topic, ])
+        self.assertEqual(response.context['topics'], [topic_a.topic, ])
 
     def test_topic_unread_list_dont_show_removed_or_no_access(self):
         """
@@ -79,15 +97,35 @@ class TopicUnreadViewTest(TestCase):
 
         utils.login(self)
         response = self.client.get(reverse('spirit:topic:unread:index'))
-        self.assertEqual(list(response.context['page']), [])
+        self.assertEqual(response.context['topics'], [])
+
+    @override_djconfig(topics_per_page=1)
+    def test_topic_unread_list_no_access_after_unread(self):
+        """
+        Should leave out the topics removed or made
+        private after they were unread, pages and
+        the count should not include them
+        """
+        TopicUnread.objects\
+            .filter(pk__in=[self.topic_unread.pk, self.topic_unread2.pk, self.topic_unread4.pk])\
+            .update(is_read=False)
+        self.assertEqual(TopicUnread.get_unread_count(user=self.user), 3)
+
+        Topic.objects.filter(pk=self.topic4.pk).update(is_removed=True)
+        private = utils.create_category(is_private=True)
+        Topic.objects.filter(pk=self.topic2.pk).update(category=private)
+
+        utils.login(self)
+        response = self.client.get(reverse('spirit:topic:unread:index'))
+        self.assertEqual(response.context['topics'], [self.topic, ])
+        self.assertEqual(TopicUnread.get_unread_count(user=self.user), 1)
 
-    def test_topic_unread_list_invalid_topic_id(self):
+    def test_topic_unread_list_invalid_cursor(self):
         """
-        invalid topic id
+        invalid cursor
         """
         utils.login(self)
-        last_pk = TopicUnread.objects.order_by("pk").last().pk
-        response = self.client.get(reverse('spirit:topic:unread:index') + "?topic_id=" + str(last_pk + 1))
+        response = self.client.get(reverse('spirit:topic:unread:index') + "?cursor=foo")
         self.assertEqual(response.status_code, 404)
 
     def test_topic_unread_list_empty_first_page(self):
@@ -97,14 +135,14 @@ class TopicUnreadViewTest(TestCase):
         utils.login(self)
         response = self.client.get(reverse('spirit:topic:unread:index'))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(list(response.context['page']), [])
+        self.assertEqual(response.context['topics'], [])
 
     def test_topic_unread_list_empty_page(self):
         """
         empty page, other than the first one
         """
         utils.login(self)
-        response = self.client.get(reverse('spirit:topic:unread:index') + "?topic_id=" + str(self.topic.pk))
+        response = self.client.get(reverse('spirit:topic:unread:index') + "?page=2")
         self.assertEqual(response.status_code, 404)
 
     def test_topic_unread_list_bookmarks(self):
@@ -118,8 +156,8 @@ class TopicUnreadViewTest(TestCase):
 
         utils.login(self)
         response = self.client.get(reverse('spirit:topic:unread:index'))
-        self.assertEqual(list(response.context['page']), [self.topic2, self.topic])
-        self.assertEqual(response.context['page'][0].bookmark, bookmark)
+        self.assertEqual(response.context['topics'], [self.topic2, self.topic])
+        self.assertEqual(response.context['topics'][0].bookmark, bookmark)
 
 
 class TopicUnreadModelsTest(TestCase):
@@ -157,3 +195,25 @@ class TopicUnreadModelsTest(TestCase):
         TopicUnread.unread_new_comment(comment=comment)
         self.assertTrue(TopicUnread.objects.get(user=self.user, topic=self.topic).is_read)
         self.assertFalse(TopicUnread.objects.get(user=self.user2, topic=self.topic).is_read)
+
+    def test_topic_unread_count(self):
+        """
+        Should cache the count until a topic gets read or unread
+        """
+        self.assertEqual(TopicUnread.get_unread_count(user=self.user2), 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TopicUnread.get_unread_count(user=self.user2), 0)
+
+        comment = utils.create_comment(user=self.user, topic=self.topic)
+        TopicUnread.unread_new_comment(comment=comment)
+        self.assertEqual(TopicUnread.get_unread_count(user=self.user2), 1)
+
+        # Already unread
+        TopicUnread.unread_new_comment(comment=comment)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(TopicUnread.get_unread_count(user=self.user2), 1)
+
+        TopicUnread.create_or_mark_as_read(user=self.user2, topic=self.topic)
+        self.assertEqual(TopicUnread.get_unread_count(user=self.user2), 0)
@@ -3,11 +3,13 @@
 from __future__ import unicode_literals
 
 from django.shortcuts import render
-
 from django.contrib.auth.decorators import login_required
 
-from ...core.utils.paginator.infinite_paginator import paginate
+from djconfig import config
+
+from ...core.utils.paginator import seek_paginate
 from ..models import Topic
+from .models import TopicUnread
 
 
 @login_required
@@ -15,20 +17,32 @@ def index(request):
     # TODO: add button to clean up read topics? or read all?
     # redirect to first page if empty
 
+    # The topics may have become inaccessible
+    # since the count was cached, it's refreshed
+    # so the user is not stuck with a stale one
+    TopicUnread.invalidate_unread_count(user_ids=[request.user.pk, ])
+
+    page = seek_paginate(
+        TopicUnread.get_unread(user=request.user),
+        per_page=config.topics_per_page,
+        page_number=request.GET.get('page', 1),
+        ordering=('-date', '-pk'),
+        uid='topic_unread:%s' % request.user.pk,
+        cursor=request.GET.get('cursor')
+    )
+
+    # Topics that became inaccessible
+    # in between are left out
     topics = Topic.objects\
         .for_access(user=request.user)\
-        .for_unread(user=request.user)\
-        .with_bookmarks(user=request.user)
-
-    page = paginate(request, query_set=topics, lookup_field="last_active", page_var='topic_id')
-    next_page_pk = None
-
-    if page:
-        next_page_pk = page[-1].pk
+        .with_bookmarks(user=request.user)\
+        .select_related('category')\
+        .in_bulk([u.topic_id for u in page])
+    topics = [topics[u.topic_id] for u in page if u.topic_id in topics]
 
     context = {
         'page': page,
-        'next_page_pk': next_page_pk
+        'topics': topics
     }
 
     return render(request, 'spirit/topic/unread/index.html', context)
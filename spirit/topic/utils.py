@@ -2,16 +2,15 @@
 
 from __future__ import unicode_literals
 
+from django.conf import settings
+
+from ..core import tasks
 from ..comment.bookmark.models import CommentBookmark
 from .notification.models import TopicNotification
 from .unread.models import TopicUnread
 
 
-def topic_viewed(request, topic):
-    # Todo test detail views
-    user = request.user
-    comment_number = CommentBookmark.page_to_comment_number(request.GET.get('page', 1))
-
+def mark_as_viewed(user, topic, comment_number):
     CommentBookmark.update_or_create(
         user=user,
         topic=topic,
@@ -19,4 +18,22 @@ def topic_viewed(request, topic):
     )
     TopicNotification.mark_as_read(user=user, topic=topic)
     TopicUnread.create_or_mark_as_read(user=user, topic=topic)
-    topic.increase_view_count()
\ No newline at end of file
+
+
+def topic_viewed(request, topic):
+    # Todo test detail views
+    user = request.user
+    comment_number = CommentBookmark.page_to_comment_number(request.GET.get('page', 1))
+    topic.increase_view_count()
+
+    if not user.is_authenticated():
+        return
+
+    if settings.ST_TOPIC_VIEWED_DEFER:
+        tasks.topic_viewed.delay(
+            user_id=user.pk,
+            topic_id=topic.pk,
+            comment_number=comment_number
+        )
+    else:
+        mark_as_viewed(user=user, topic=topic, comment_number=comment_number)
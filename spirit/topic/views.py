@@ -8,12 +8,13 @@ from django.http import HttpResponsePermanentRedirect
 
 from djconfig import config
 
-from ..core.utils.paginator import paginate, yt_paginate
+from ..core.utils import counters
+from ..core.utils.paginator import keyset_paginate, seek_paginate
 from ..core.utils.ratelimit.decorators import ratelimit
 from ..category.models import Category
 from ..comment.models import MOVED
 from ..comment.forms import CommentForm
-from ..comment.utils import comment_posted
+from ..comment.utils import comment_posted, get_comments_page_index_uid
 from ..comment.models import Comment
 from .models import Topic
 from .forms import TopicForm
@@ -62,6 +63,7 @@ def update(request, pk):
             topic = form.save()
 
             if topic.category_id != category_id:
+                Comment.sync_visibility(Comment.objects.filter(topic=topic))
                 Comment.create_moderation_action(user=request.user, topic=topic, action=MOVED)
 
             return redirect(request.POST.get('next', topic.get_absolute_url()))
@@ -84,14 +86,16 @@ def detail(request, pk, slug):
     comments = Comment.objects\
         .for_topic(topic=topic)\
         .with_likes(user=request.user)\
-        .with_polls(user=request.user)\
-        .order_by('date')
+        .with_polls(user=request.user)
 
-    comments = paginate(
+    comments = keyset_paginate(
         comments,
         per_page=config.comments_per_page,
-        page_number=request.GET.get('page', 1)
+        page_number=request.GET.get('page', 1),
+        ordering=('date', 'pk'),
+        uid=get_comments_page_index_uid(topic.pk)
     )
+    counters.add_pending(comments, field='likes_count')
 
     context = {
         'topic': topic,
@@ -110,13 +114,15 @@ def index_active(request):
         .visible()\
         .global_()\
         .with_bookmarks(user=request.user)\
-        .order_by('-is_globally_pinned', '-last_active')\
         .select_related('category')
 
-    topics = yt_paginate(
+    topics = seek_paginate(
         topics,
         per_page=config.topics_per_page,
-        page_number=request.GET.get('page', 1)
+        page_number=request.GET.get('page', 1),
+        ordering=('-is_globally_pinned', '-last_active', '-pk'),
+        uid='topic:active',
+        cursor=request.GET.get('cursor')
     )
 
     context = {
@@ -2,10 +2,11 @@
 
 from __future__ import unicode_literals
 
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.contrib.auth import get_user_model
 
 from .models import UserProfile
+from ..core.utils.markdown.utils import mention
 
 User = get_user_model()
 
@@ -18,4 +19,29 @@ def update_or_create_user_profile(sender, instance, created, **kwargs):
     else:
         user.st.save()
 
-post_save.connect(update_or_create_user_profile, sender=User, dispatch_uid=__name__)
\ No newline at end of file
+post_save.connect(update_or_create_user_profile, sender=User, dispatch_uid=__name__)
+
+
+def invalidate_mention_on_rename(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk:
+        return
+
+    if update_fields is not None and 'username' not in update_fields:
+        return
+
+    username = User.objects\
+        .filter(pk=instance.pk)\
+        .values_list('username', flat=True)\
+        .first()
+
+    if username is not None and username != instance.username:
+        mention.invalidate(username)
+
+
+def invalidate_mention(sender, instance, **kwargs):
+    mention.invalidate(instance.username)
+
+
+pre_save.connect(invalidate_mention_on_rename, sender=User, dispatch_uid=__name__ + '.mention')
+post_save.connect(invalidate_mention, sender=User, dispatch_uid=__name__ + '.mention')
+post_delete.connect(invalidate_mention, sender=User, dispatch_uid=__name__ + '.mention')